@@ -0,0 +1 @@
+"""Offline benchmarks for the scraper: python -m benchmarks.bench_parse / bench_scrape"""
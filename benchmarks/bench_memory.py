@@ -0,0 +1,108 @@
+"""Memory held by scraped results: a list of record dicts vs RecordStore.
+
+Builds the same synthetic records (realistic field lengths and value
+repetition, a fresh string object per value as the parser produces) into
+each container and measures what stays allocated with tracemalloc, plus
+the time to fill it and to export it to CSV.
+
+    python -m benchmarks.bench_memory --records 50000 [--output memory.json]
+"""
+import argparse
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from wheelers.export import export_csv
+from wheelers.records import ERROR_FIELDS, STORE_FIELDS, RecordStore
+
+from .common import write_results
+
+WORDS = ("the", "history", "of", "war", "garden", "secret", "river", "night", "city", "world",
+         "children", "guide", "complete", "stories", "new", "little", "great", "life")
+# (field, number of distinct values) for the fields that repeat across books
+REPEATED = {
+    "author": 20000, "illustrator": 2000, "publisher": 400, "published": 3000,
+    "language": 12, "series": 5000, "interest_age": 20, "ar_level": 80,
+    "premiers_reading_challenge": 2, "imprint": 800, "publication_country": 30,
+    "edition": 8, "page_count": 900, "dimensions": 300, "weight": 900, "dewey_code": 5000,
+    "reading_age": 20, "library_of_congress": 3000, "nbs_text": 200, "onix_text": 200,
+    "price": 600, "categories": 2000, "alternate_edition": 8,
+    "alternate_isbn_pub_date": 3000, "alternate_isbn_price": 600,
+}
+
+
+def make_records(count, seed=1):
+    """Yield `count` synthetic scraped records"""
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1, 9, 0, 0)
+    for n in range(count):
+        isbn = f"978{n:010d}"
+        record = {
+            "isbn": isbn,
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(2, 8))).title(),
+            "full_description": " ".join(rng.choices(WORDS, k=rng.randint(40, 160))),
+            "image_url": f"https://www.wheelersbooks.com.au/images/{isbn}.jpg",
+            "local_image_path": None,
+            "published_imported": None,
+            "replaced_by": None,
+            "alternate_isbn": f"979{n:010d}" if n % 3 else None,
+            "all_alternates": None,
+            "scraped_at": (started + timedelta(microseconds=n * 180_000)).isoformat(),
+        }
+        for field, distinct in REPEATED.items():
+            # A new string object per record, as every parsed page yields
+            record[field] = f"{field}-{rng.randrange(distinct)}"
+        yield {field: record.get(field) for field in STORE_FIELDS if field not in ERROR_FIELDS}
+
+
+def fill(container_type, count):
+    container = [] if container_type == "list_of_dicts" else RecordStore()
+    for record in make_records(count):
+        container.append(record)
+    return container
+
+
+def measure(container_type, count):
+    """Bytes held, fill time and CSV export time for count records in a new container"""
+    # Timed without tracemalloc, which slows every allocation down
+    started = time.perf_counter()
+    container = fill(container_type, count)
+    fill_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    export_csv(container, os.devnull)
+    export_seconds = time.perf_counter() - started
+    del container
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    container = fill(container_type, count)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del container
+    return {
+        "case": container_type,
+        "records": count,
+        "megabytes": round(held / 1024 ** 2, 1),
+        "bytes_per_record": round(held / count),
+        "fill_seconds": round(fill_seconds, 3),
+        "export_csv_seconds": round(export_seconds, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark memory held by scraped results.")
+    parser.add_argument("--records", type=int, default=50000,
+                        help="records per container (default: 50000)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = [measure("list_of_dicts", args.records), measure("record_store", args.records)]
+    results[1]["saving"] = f"{1 - results[1]['megabytes'] / results[0]['megabytes']:.0%}"
+    write_results("memory", {"records": args.records}, results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""Microbenchmarks for product page parsing on the recorded fixtures.
+
+    python -m benchmarks.bench_parse [--number 50] [--repeat 5] [--output parse.json]
+"""
+import argparse
+import os
+import statistics
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+
+from wheelers import parser as page_parser
+from wheelers.fields import FIELD_PRESETS, compile_fields
+from wheelers.parser import (
+    PRODUCT_URL,
+    LabelIndex,
+    parse_product_bytes,
+    parse_product_page,
+    plan_strainer,
+)
+
+from .common import write_results
+from .server import load_fixtures
+
+
+def html_parsers():
+    parsers = ["html.parser"]
+    if page_parser.default_html_parser() == "lxml":
+        parsers.insert(0, "lxml")
+    return parsers
+
+
+def strained_soup(html):
+    """The tree a scrape of every field parses, with the same strainer"""
+    return BeautifulSoup(html, page_parser.HTML_PARSER,
+                         parse_only=plan_strainer(compile_fields(None)))
+
+
+def cases(fixtures):
+    """(name, fixture, callable) for every measured operation"""
+    pages = [("product", fixtures["product"])]
+    pages += [(f"alternate_{i}", entry) for i, entry in enumerate(fixtures["alternates"])]
+    for fixture, entry in pages:
+        html = entry["body"].decode("utf-8")
+        url = PRODUCT_URL + entry["isbn"]
+        yield "parse_product_page", fixture, lambda html=html, url=url: parse_product_page(html, url)
+        price_only = compile_fields(FIELD_PRESETS["Price only"])
+        yield "parse_price_only", fixture, lambda html=html, url=url: parse_product_page(
+            html, url, price_only)
+        yield "strained_soup", fixture, lambda html=html: strained_soup(html)
+        yield "full_page_soup", fixture, lambda html=html: BeautifulSoup(
+            html, page_parser.HTML_PARSER)
+        soup = strained_soup(html)
+        yield "label_index", fixture, lambda soup=soup: LabelIndex(soup).get("Publisher:")
+
+
+def run(number, repeat):
+    fixtures = load_fixtures()
+    results = []
+    default_parser = page_parser.HTML_PARSER
+    try:
+        for html_parser in html_parsers():
+            page_parser.HTML_PARSER = html_parser
+            for name, fixture, func in cases(fixtures):
+                timings = [t / number for t in timeit.repeat(func, number=number, repeat=repeat)]
+                best = min(timings)
+                results.append({
+                    "case": name,
+                    "fixture": fixture,
+                    "html_parser": html_parser,
+                    "best_us": round(best * 1e6, 1),
+                    "median_us": round(statistics.median(timings) * 1e6, 1),
+                    "per_second": round(1 / best, 1),
+                })
+    finally:
+        page_parser.HTML_PARSER = default_parser
+    return results
+
+
+def run_pool(pages, process_counts):
+    """Pages/second through parse_product_bytes with several process pool sizes"""
+    fixture = load_fixtures()["product"]
+    url = PRODUCT_URL + fixture["isbn"]
+    results = []
+    for processes in process_counts:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            # Warm up: start every worker process before timing
+            list(pool.map(parse_product_bytes, [fixture["body"]] * processes,
+                          ["utf-8"] * processes, [url] * processes))
+            started = time.perf_counter()
+            list(pool.map(parse_product_bytes, [fixture["body"]] * pages,
+                          ["utf-8"] * pages, [url] * pages, chunksize=4))
+            elapsed = time.perf_counter() - started
+        results.append({
+            "case": "parse_pool",
+            "fixture": "product",
+            "processes": processes,
+            "pages": pages,
+            "seconds": round(elapsed, 3),
+            "per_second": round(pages / elapsed, 1),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark product page parsing.")
+    parser.add_argument("--number", type=int, default=50, help="calls per timing (default: 50)")
+    parser.add_argument("--repeat", type=int, default=5, help="timings per case (default: 5)")
+    parser.add_argument("--processes", default="",
+                        help="comma-separated process pool sizes to measure parse throughput "
+                             f"with, e.g. 1,2,4,{os.cpu_count()} (default: none)")
+    parser.add_argument("--pages", type=int, default=400,
+                        help="pages parsed per pool size (default: 400)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    results = run(args.number, args.repeat)
+    if args.processes:
+        results += run_pool(args.pages, [int(n) for n in args.processes.split(",")])
+    write_results("parse", {"number": args.number, "repeat": args.repeat,
+                            "processes": args.processes, "pages": args.pages},
+                  results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""End-to-end throughput of WheelersScraper.scrape against the local stand-in site.
+
+Runs the same pipeline the GUI and the command line use (fetch, parse,
+alternates, optional images) over generated ISBNs at several worker counts.
+
+    python -m benchmarks.bench_scrape --isbns 200 --concurrency 1,4,8,16 --latency-ms 50
+"""
+import argparse
+import tempfile
+import time
+
+from wheelers.core import WheelersScraper
+from wheelers.throttle import RetryPolicy
+
+from .common import write_results
+from .server import StandInSite, make_isbns, start_server
+
+
+def run_level(base_url, site, isbns, workers, args):
+    """Scrape isbns with `workers` workers and return the measurements"""
+    requests_before = site.stats()
+    with tempfile.TemporaryDirectory() as images_folder:
+        scraper = WheelersScraper(
+            workers=workers,
+            requests_per_second=args.rps,
+            download_images=args.images,
+            images_folder=images_folder,
+            fetch_all_alternates=args.all_alternates,
+            parse_workers=args.parse_workers,
+            product_url=f"{base_url}/product/",
+        )
+        scraper.http.retry = RetryPolicy(base_delay=args.retry_base_delay)
+        started = time.perf_counter()
+        try:
+            for _ in scraper.scrape(isbns):
+                pass
+        finally:
+            scraper.close()
+        elapsed = time.perf_counter() - started
+
+    summary = scraper.summary()
+    server = {key: value - requests_before[key] for key, value in site.stats().items()}
+    stages = scraper.metrics.snapshot()["stages"]
+    return {
+        "workers": workers,
+        "isbns": len(isbns),
+        "errors": summary["errors"],
+        "seconds": round(elapsed, 3),
+        "isbns_per_second": round(len(isbns) / elapsed, 2),
+        "requests": server["requests"],
+        "retries": summary["http"]["retries"],
+        "throttled": server["throttled"],
+        "stages": {stage: {key: stats[key] for key in ("count", "mean", "p50", "p90", "max")}
+                   for stage, stats in stages.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end scraping throughput.")
+    parser.add_argument("--isbns", type=int, default=200, help="ISBNs per level (default: 200)")
+    parser.add_argument("--concurrency", default="1,4,8,16",
+                        help="comma-separated worker counts (default: 1,4,8,16)")
+    parser.add_argument("--latency-ms", type=float, default=50.0,
+                        help="server latency per request (default: 50)")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--retry-base-delay", type=float, default=0.05,
+                        help="client backoff base in seconds (default: 0.05)")
+    parser.add_argument("--rps", type=float, default=0,
+                        help="client requests/sec limit, 0 = unlimited (default: 0)")
+    parser.add_argument("--images", action="store_true", help="also download cover images")
+    parser.add_argument("--all-alternates", action="store_true")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="parse in N worker processes (default: 0)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    site = StandInSite(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                       retry_after=args.retry_after, seed=args.seed)
+    server, base_url = start_server(site)
+    results = []
+    try:
+        for level, workers in enumerate(int(n) for n in args.concurrency.split(",")):
+            # Fresh ISBNs per level so nothing is reused between levels
+            isbns = make_isbns(args.isbns, start=level * args.isbns)
+            results.append(run_level(base_url, site, isbns, workers, args))
+    finally:
+        server.shutdown()
+
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    write_results("scrape", parameters, results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
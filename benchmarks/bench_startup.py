@@ -0,0 +1,151 @@
+"""Start-up time of the GUI and the command line, each run in a fresh interpreter.
+
+- import: time to import each entry module (python -X importtime), and the
+  heavy third-party packages it loads before doing any work
+- time_to_window: from launching the GUI to its first drawn frame (needs a display)
+- time_to_first_request: from launching `python -m wheelers scrape` to its
+  first request reaching the local stand-in site
+
+    python -m benchmarks.bench_startup [--repeat 5] [--output startup.json]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import write_results
+from .server import StandInSite, start_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULES = ("scrapper", "wheelers.cli", "wheelers")
+# Packages that are slow to import and only needed once scraping, saving or exporting starts
+HEAVY_PACKAGES = ("requests", "urllib3", "bs4", "lxml", "sqlalchemy", "PIL", "pandas",
+                  "numpy", "openpyxl", "pyarrow")
+SAMPLE_ISBN = "9780300186116"
+
+WINDOW_SCRIPT = """
+import time
+import tkinter as tk
+import scrapper
+root = tk.Tk()
+app = scrapper.WheelersScraperGUI(root)
+root.update()
+print(time.time())
+root.destroy()
+"""
+
+
+def child_env():
+    """Environment for child interpreters: the repository importable from any folder"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_profile(module):
+    """(cumulative import time in ms, top-level packages loaded) for a fresh import"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=ROOT, env=child_env())
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    cumulative = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue  # header line
+        packages.add(name.strip().split(".")[0])
+        if name.strip() == module:
+            cumulative = int(total) / 1000
+    return cumulative, packages
+
+
+def time_to_window():
+    """Seconds from launching the GUI to its first frame, or None without a display"""
+    with tempfile.TemporaryDirectory() as folder:
+        # Run in an empty folder: the GUI writes db_config.json on start
+        started = time.time()
+        result = subprocess.run([sys.executable, "-c", WINDOW_SCRIPT], capture_output=True,
+                                text=True, cwd=folder, env=child_env())
+    if result.returncode != 0:
+        if "TclError" in result.stderr:
+            return None
+        raise RuntimeError(f"GUI start failed:\n{result.stderr}")
+    return float(result.stdout.split()[-1]) - started
+
+
+def time_to_first_request(base_url, site):
+    """Seconds from launching a headless scrape to its first request"""
+    with tempfile.TemporaryDirectory() as folder:
+        input_file = os.path.join(folder, "isbns.csv")
+        with open(input_file, "w") as f:
+            f.write(f"ISBN\n{SAMPLE_ISBN}\n")
+        site.first_request_at = None
+        started = time.time()
+        subprocess.run([sys.executable, "-m", "wheelers", "scrape", input_file,
+                        "-o", os.devnull, "--no-cache", "--no-journal", "-q",
+                        "--product-url", f"{base_url}/product/"],
+                       capture_output=True, cwd=folder, env=child_env(), check=True)
+    return site.first_request_at - started
+
+
+def summarize(name, samples, **extra):
+    return {
+        "case": name,
+        **extra,
+        "runs": len(samples),
+        "best_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+    }
+
+
+def run(repeat):
+    results = []
+    baseline = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append(time.perf_counter() - started)
+    results.append(summarize("interpreter_start", baseline))
+
+    for module in ENTRY_MODULES:
+        samples = []
+        for _ in range(repeat):
+            seconds, packages = import_profile(module)
+            samples.append(seconds / 1000)
+        heavy = sorted(packages.intersection(HEAVY_PACKAGES))
+        results.append(summarize("import", samples, module=module,
+                                 heavy_packages=",".join(heavy) or "-"))
+
+    samples = [time_to_window() for _ in range(repeat)]
+    if None in samples:
+        results.append({"case": "time_to_window", "skipped": "no display"})
+    else:
+        results.append(summarize("time_to_window", samples))
+
+    site = StandInSite()
+    server, base_url = start_server(site)
+    try:
+        samples = [time_to_first_request(base_url, site) for _ in range(repeat)]
+    finally:
+        server.shutdown()
+    results.append(summarize("time_to_first_request", samples))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark GUI and command line start-up.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case (default: 5)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    write_results("startup", {"repeat": args.repeat}, run(args.repeat), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
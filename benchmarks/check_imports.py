@@ -0,0 +1,51 @@
+"""Fail when start-up imports grow past their budget.
+
+Each entry module is imported in a fresh interpreter. The check fails if it
+loads one of the heavy packages that must stay deferred until scraping,
+saving or exporting starts, or if its import takes longer than the budget
+(best of --repeat runs). Run it in CI before building the executable:
+
+    python -m benchmarks.check_imports [--budget-ms 150]
+"""
+import argparse
+import sys
+
+from .bench_startup import ENTRY_MODULES, HEAVY_PACKAGES, import_profile
+
+DEFAULT_BUDGET_MS = 150
+
+
+def check(module, deferred, budget_ms, repeat):
+    """Problems found for module, as messages"""
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        milliseconds, packages = import_profile(module)
+        timings.append(milliseconds)
+        loaded |= packages
+    problems = [f"{module} imports {package} at start-up"
+                for package in deferred if package in loaded]
+    if min(timings) > budget_ms:
+        problems.append(f"{module} takes {min(timings):.0f} ms to import "
+                        f"(budget {budget_ms} ms)")
+    print(f"{module}: {min(timings):.1f} ms", file=sys.stderr)
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check start-up import time and deferred imports.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"max import time per entry module (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module (default: 3)")
+    args = parser.parse_args(argv)
+
+    problems = []
+    for module in ENTRY_MODULES:
+        problems += check(module, HEAVY_PACKAGES, args.budget_ms, args.repeat)
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
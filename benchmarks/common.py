@@ -0,0 +1,45 @@
+"""Shared helpers: environment metadata and machine-readable result files"""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def write_results(benchmark, parameters, results, output=None):
+    """Print a one-line-per-case table to stderr and the JSON document to output/stdout"""
+    document = {
+        "benchmark": benchmark,
+        "environment": environment(),
+        "parameters": parameters,
+        "results": results,
+    }
+    for result in results:
+        print("  ".join(f"{key}={value}" for key, value in result.items()
+                        if not isinstance(value, dict)), file=sys.stderr)
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return document
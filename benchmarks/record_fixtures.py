@@ -0,0 +1,65 @@
+"""Re-record the benchmark fixtures from the live site.
+
+Saves one product page, its alternate-format pages and its cover image into
+benchmarks/fixtures and rewrites manifest.json, so the benchmarks track the
+site's current markup.
+
+    python -m benchmarks.record_fixtures 9780300186116
+"""
+import argparse
+import json
+import os
+
+from wheelers.http_client import HttpSession, RateLimiter
+from wheelers.parser import PRODUCT_URL, parse_product_page, product_key
+
+from .server import ALTERNATE_PREFIXES, FIXTURES
+
+
+def fetch(http, url):
+    response = http.get(url)
+    response.raise_for_status()
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record benchmark fixtures from the live site.")
+    parser.add_argument("isbn", help="ISBN-13 of a product with at least one alternate format")
+    parser.add_argument("--folder", default=FIXTURES)
+    args = parser.parse_args(argv)
+
+    http = HttpSession(rate_limiter=RateLimiter(1))
+    try:
+        product = fetch(http, PRODUCT_URL + args.isbn)
+        page = parse_product_page(product.text, product.url)
+        manifest = {"product": {"file": "product.html", "isbn": args.isbn}, "alternates": []}
+        files = {"product.html": product.content}
+
+        for i, href in enumerate(page["alt_links"][:len(ALTERNATE_PREFIXES)]):
+            name = "alternate.html" if i == 0 else f"alternate_{i}.html"
+            files[name] = fetch(http, href).content
+            manifest["alternates"].append({"file": name, "isbn": product_key(href)})
+
+        image_url = page["record"]["image_url"]
+        if image_url:
+            cover = fetch(http, image_url)
+            files["cover.jpg"] = cover.content
+            manifest["cover"] = {"file": "cover.jpg",
+                                 "content_type": cover.headers.get("content-type", "image/jpeg")}
+    finally:
+        http.close()
+
+    for name, content in files.items():
+        with open(os.path.join(args.folder, name), "wb") as f:
+            f.write(content)
+    if "cover" not in manifest:
+        manifest["cover"] = {"file": "cover.jpg", "content_type": "image/jpeg"}  # keep the old one
+    with open(os.path.join(args.folder, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Recorded {len(files)} fixtures into {args.folder}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
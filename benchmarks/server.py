@@ -0,0 +1,207 @@
+"""Local stand-in for wheelersbooks.com.au serving the recorded fixtures.
+
+Any 13-digit ISBN starting with 978 is a product: the product fixture is
+served with its ISBN swapped for the requested one, and its alternate
+formats become the same ISBN with a 979 (977, 976, ...) prefix. Category
+pages (/category/<name>?page=N) are generated: each lists a fixed set of
+catalogue ISBNs derived from its name, links to its next page and to two
+sub-categories, for crawling without the live site. Latency,
+server errors and 429 throttling can be injected to exercise the retry and
+back-off logic.
+
+    python -m benchmarks.server --port 8000 --latency-ms 80 --throttle-rate 0.02
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ALTERNATE_PREFIXES = ("979", "977", "976", "975")
+CATEGORY_PRODUCTS = 24
+CATEGORY_PAGES = 3
+SUBCATEGORIES = 2
+
+
+def load_fixtures(folder=FIXTURES):
+    """The manifest with every fixture's content loaded"""
+    with open(os.path.join(folder, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    def read(entry):
+        with open(os.path.join(folder, entry["file"]), "rb") as f:
+            return f.read()
+
+    manifest["product"]["body"] = read(manifest["product"])
+    for alternate in manifest["alternates"]:
+        alternate["body"] = read(alternate)
+    manifest["cover"]["body"] = read(manifest["cover"])
+    return manifest
+
+
+def alternate_isbn(isbn, index):
+    return ALTERNATE_PREFIXES[index] + isbn[3:]
+
+
+def make_isbns(count, start=0):
+    """`count` distinct catalogue ISBNs the server knows about"""
+    return [f"978{n:010d}" for n in range(start, start + count)]
+
+
+class StandInSite:
+    """Fixture pages for any catalogue ISBN, with injected latency and failures"""
+
+    def __init__(self, fixtures=None, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1, seed=None):
+        self.fixtures = fixtures or load_fixtures()
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        # Wall-clock time of the first request, for start-up measurements
+        self.first_request_at = None
+        self._lock = threading.Lock()
+
+    def substitute(self, body, isbn, index=None):
+        """Fixture body rewritten for catalogue ISBN isbn (index: which alternate)"""
+        product = self.fixtures["product"]["isbn"].encode()
+        alternates = [entry["isbn"].encode() for entry in self.fixtures["alternates"]]
+        base = isbn if index is None else "978" + isbn[3:]
+        body = body.replace(product, base.encode())
+        for i, alternate in enumerate(alternates):
+            body = body.replace(alternate, alternate_isbn(base, i).encode())
+        return body
+
+    def page(self, isbn):
+        """(status, content type, body) for /product/<isbn>"""
+        if len(isbn) != 13 or not isbn.isdigit():
+            return 404, "text/html", b"<html><body>Not found</body></html>"
+        if isbn.startswith("978"):
+            return 200, "text/html; charset=utf-8", self.substitute(
+                self.fixtures["product"]["body"], isbn)
+        if isbn[:3] in ALTERNATE_PREFIXES:
+            index = ALTERNATE_PREFIXES.index(isbn[:3])
+            if index < len(self.fixtures["alternates"]):
+                return 200, "text/html; charset=utf-8", self.substitute(
+                    self.fixtures["alternates"][index]["body"], isbn, index)
+        return 404, "text/html", b"<html><body>Not found</body></html>"
+
+    def category(self, name, page):
+        """(status, content type, body) for page `page` of a generated category"""
+        if not 1 <= page <= CATEGORY_PAGES:
+            return 404, "text/html", b"<html><body>Not found</body></html>"
+        first = zlib.crc32(name.encode()) % 10 ** 8 * 100 + (page - 1) * CATEGORY_PRODUCTS
+        links = [f'<li><a href="/product/978{n:010d}">Book {n}</a></li>'
+                 for n in range(first, first + CATEGORY_PRODUCTS)]
+        if page < CATEGORY_PAGES:
+            links.append(f'<li><a href="/category/{name}?page={page + 1}">Next</a></li>')
+        links += [f'<li><a href="/category/{name}-{n}">{name} {n}</a></li>'
+                  for n in range(1, SUBCATEGORIES + 1)]
+        body = f"<html><body><h1>{name}</h1><ul>{''.join(links)}</ul></body></html>"
+        return 200, "text/html; charset=utf-8", body.encode()
+
+    def respond(self, path):
+        """(status, headers, body) for a request path, after the injected delay"""
+        with self._lock:
+            self.requests += 1
+            if self.first_request_at is None:
+                self.first_request_at = time.time()
+            roll = self.random.random()
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            with self._lock:
+                self.throttled += 1
+            return 429, {"Retry-After": str(self.retry_after)}, b"Too many requests"
+        if roll < self.throttle_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return 503, {}, b"Service unavailable"
+
+        path, _, query = path.partition("?")
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "category":
+            page = parse_qs(query).get("page", ["1"])[0]
+            status, content_type, body = self.category(parts[1], int(page) if page.isdigit() else 0)
+            return status, {"Content-Type": content_type}, body
+        if len(parts) == 2 and parts[0] == "product":
+            status, content_type, body = self.page(parts[1])
+            return status, {"Content-Type": content_type}, body
+        if len(parts) == 2 and parts[0] == "images":
+            cover = self.fixtures["cover"]
+            return 200, {"Content-Type": cover["content_type"]}, cover["body"]
+        return 404, {"Content-Type": "text/html"}, b"Not found"
+
+    def stats(self):
+        return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled}
+
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            status, headers, body = site.respond(self.path)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(site=None, host="127.0.0.1", port=0):
+    """Serve site on a background thread, returning (server, base URL)"""
+    site = site or StandInSite()
+    server = ThreadingHTTPServer((host, port), make_handler(site))
+    server.daemon_threads = True
+    server.site = site
+    threading.Thread(target=server.serve_forever, name="stand-in-site", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1,
+                        help="Retry-After seconds sent with 429s")
+    args = parser.parse_args(argv)
+
+    site = StandInSite(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                       retry_after=args.retry_after)
+    server, base_url = start_server(site, args.host, args.port)
+    print(f"Serving fixtures at {base_url}/product/<isbn> (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
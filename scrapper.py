@@ -1,20 +1,37 @@
 import tkinter as tk
-import sys
+import importlib
+import importlib.util
+import multiprocessing
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from sqlalchemy import create_engine, text
+import sqlite3
 import threading
 import os
-from PIL import Image
-import io
 import json
-import traceback
-from datetime import datetime
-from urllib.parse import urljoin
-import re
-from pathlib import WindowsPath, Path
+
+# Only light modules are imported up front so the window shows quickly; the
+# scraper, database and export code (requests, bs4, SQLAlchemy, Pillow) is
+# imported where it is first used
+from wheelers.defaults import (
+    CACHE_FILE,
+    DEFAULT_CACHE_TTL_HOURS,
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_WORKERS,
+    NEGATIVE_CACHE_FILE,
+)
+from wheelers.fields import FIELD_PRESETS, KEY_FIELDS, OPTIONAL_FIELDS
+from wheelers.isbns import read_isbn_file
+from wheelers.journal import RunJournal, completed_isbns, iter_records, journal_path_for
+from wheelers.metrics import RunMetrics
+from wheelers.records import RecordStore
+from wheelers.records import RECORD_FIELDS
+from wheelers.ui_bridge import FRAME_INTERVAL_MS, UiBridge
+
+THUMBNAIL_SIZE = 200
+LOG_FILE = "wheelers_scraper.log"
+METRICS_PREFIX = "wheelers_metrics"
+CUSTOM_FIELDS = "Custom selection"
+# Modules a scrape needs, imported in the background once the window is up
+PRELOAD_MODULES = ("wheelers.core", "wheelers.http_client", "wheelers.parser")
 
 class WheelersScraperGUI:
     def __init__(self, root):
@@ -28,12 +45,29 @@ class WheelersScraperGUI:
         
         # Variables
         self.isbn_list = []
-        self.scraped_data = []
+        self.input_file = None
+        self.scraped_data = RecordStore()
         self.is_scraping = False
         self.images_folder = "book_images"  # Default folder for images
+        self.scraper = None
+        # Worker threads report through the bridge; only pump_ui touches widgets
+        self.ui = UiBridge()
         
         self.setup_gui()
+        self.pump_ui()
+        self.root.after(FRAME_INTERVAL_MS, self.start_preload)
         
+    def start_preload(self):
+        """Import the scraping modules off the UI thread so Start doesn't wait for them"""
+        threading.Thread(target=self.preload_modules, name="preload", daemon=True).start()
+    
+    def preload_modules(self):
+        for name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                self.log_message(f"Error loading {name}: {str(e)}")
+    
     def load_config(self):
         """Load database configuration from file"""
         default_config = {
@@ -41,7 +75,8 @@ class WheelersScraperGUI:
             "port": "3306",
             "database": "books_db",
             "username": "root",
-            "password": ""
+            "password": "",
+            "batch_size": "500"
         }
         
         try:
@@ -106,12 +141,102 @@ class WheelersScraperGUI:
         ttk.Button(self.image_folder_frame, text="Browse", 
                   command=self.select_images_folder).pack(side=tk.LEFT, padx=(10, 0))
         
+        self.thumbnails_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.image_folder_frame, text=f"Also create {THUMBNAIL_SIZE}px thumbnails",
+                        variable=self.thumbnails_var).pack(side=tk.LEFT, padx=(15, 0))
+        
         # Initially hide image folder options
         self.image_folder_frame.pack_forget()
         
+        db_options_frame = ttk.Frame(options_frame)
+        db_options_frame.pack(fill=tk.X)
+        
         self.save_to_db_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(options_frame, text="Save to Database", 
-                       variable=self.save_to_db_var).pack(anchor=tk.W)
+        ttk.Checkbutton(db_options_frame, text="Save to Database", 
+                       variable=self.save_to_db_var).pack(side=tk.LEFT)
+        
+        self.skip_unchanged_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(db_options_frame, text="Only write new or changed books",
+                        variable=self.skip_unchanged_var).pack(side=tk.LEFT, padx=(15, 0))
+        
+        self.change_log_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(db_options_frame, text="Log changed fields",
+                        variable=self.change_log_var).pack(side=tk.LEFT, padx=(15, 0))
+        
+        self.all_alternates_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Fetch all alternate formats (slower)",
+                        variable=self.all_alternates_var).pack(anchor=tk.W)
+        
+        # Field selection: fewer fields means fewer pages fetched and less parsing
+        fields_frame = ttk.Frame(options_frame)
+        fields_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(fields_frame, text="Fields:").pack(side=tk.LEFT)
+        self.fields_var = tk.StringVar(value=next(iter(FIELD_PRESETS)))
+        ttk.Combobox(fields_frame, textvariable=self.fields_var, state="readonly", width=36,
+                     values=list(FIELD_PRESETS) + [CUSTOM_FIELDS]).pack(side=tk.LEFT, padx=(5, 5))
+        ttk.Button(fields_frame, text="Choose...",
+                   command=self.choose_fields).pack(side=tk.LEFT)
+        self.custom_fields = ()
+        
+        # Run journal options
+        journal_frame = ttk.Frame(options_frame)
+        journal_frame.pack(fill=tk.X)
+        
+        self.journal_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(journal_frame, text="Write run journal (crash-safe)",
+                        variable=self.journal_var).pack(side=tk.LEFT)
+        
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(journal_frame, text="Resume: skip ISBNs already in the journal",
+                        variable=self.resume_var).pack(side=tk.LEFT, padx=(15, 0))
+        
+        # Concurrency options
+        concurrency_frame = ttk.Frame(options_frame)
+        concurrency_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(concurrency_frame, text="Workers:").pack(side=tk.LEFT)
+        self.workers_var = tk.IntVar(value=DEFAULT_WORKERS)
+        ttk.Spinbox(concurrency_frame, from_=1, to=64, width=5,
+                    textvariable=self.workers_var).pack(side=tk.LEFT, padx=(5, 15))
+        
+        ttk.Label(concurrency_frame, text="Max requests/sec per host (0 = unlimited):").pack(side=tk.LEFT)
+        self.rate_limit_var = tk.DoubleVar(value=DEFAULT_REQUESTS_PER_SECOND)
+        ttk.Spinbox(concurrency_frame, from_=0, to=100, increment=0.5, width=6,
+                    textvariable=self.rate_limit_var).pack(side=tk.LEFT, padx=(5, 15))
+        
+        ttk.Label(concurrency_frame, text="Parse processes (0 = off):").pack(side=tk.LEFT)
+        self.parse_workers_var = tk.IntVar(value=0)
+        ttk.Spinbox(concurrency_frame, from_=0, to=os.cpu_count() or 1, width=4,
+                    textvariable=self.parse_workers_var).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Page cache options
+        cache_frame = ttk.Frame(options_frame)
+        cache_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(cache_frame, text="Cache product pages on disk",
+                        variable=self.use_cache_var).pack(side=tk.LEFT)
+        
+        ttk.Label(cache_frame, text="Revalidate after (hours):").pack(side=tk.LEFT, padx=(15, 0))
+        self.cache_ttl_var = tk.DoubleVar(value=DEFAULT_CACHE_TTL_HOURS)
+        ttk.Spinbox(cache_frame, from_=0, to=720, width=6,
+                    textvariable=self.cache_ttl_var).pack(side=tk.LEFT, padx=(5, 0))
+        
+        self.negative_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame,
+                        text="Skip ISBNs that failed recently (not found, unreadable pages)",
+                        variable=self.negative_cache_var).pack(anchor=tk.W, pady=(5, 0))
+        
+        self.log_file_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text=f"Write full log to {LOG_FILE}",
+                        variable=self.log_file_var,
+                        command=self.toggle_log_file).pack(anchor=tk.W, pady=(5, 0))
+        
+        self.metrics_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame,
+                        text=f"Write run metrics to {METRICS_PREFIX}.prom / .json",
+                        variable=self.metrics_var).pack(anchor=tk.W)
         
         # Control buttons frame
         control_frame = ttk.Frame(main_frame)
@@ -127,7 +252,14 @@ class WheelersScraperGUI:
         
         self.export_excel_button = ttk.Button(control_frame, text="Export to Excel", 
                                              command=self.export_excel, state=tk.DISABLED)
-        self.export_excel_button.pack(side=tk.LEFT)
+        self.export_excel_button.pack(side=tk.LEFT, padx=(0, 5))
+        
+        # Parquet needs the optional pyarrow package; find_spec looks for it without importing it
+        self.export_parquet_button = None
+        if importlib.util.find_spec("pyarrow") is not None:
+            self.export_parquet_button = ttk.Button(control_frame, text="Export to Parquet",
+                                                   command=self.export_parquet, state=tk.DISABLED)
+            self.export_parquet_button.pack(side=tk.LEFT)
         
         # Progress frame
         progress_frame = ttk.LabelFrame(main_frame, text="Progress", padding=10)
@@ -159,6 +291,40 @@ class WheelersScraperGUI:
         else:
             self.image_folder_frame.pack_forget()
     
+    def choose_fields(self):
+        """Pick the fields to scrape one by one in a dialog"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Fields to scrape")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        selected = self.get_fields() or RECORD_FIELDS
+        choices = {}
+        frame = ttk.Frame(dialog, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        names = [name for name in RECORD_FIELDS if name not in KEY_FIELDS + OPTIONAL_FIELDS]
+        for n, name in enumerate(names):
+            choices[name] = tk.BooleanVar(value=name in selected)
+            ttk.Checkbutton(frame, text=name, variable=choices[name]).grid(
+                row=n // 3, column=n % 3, sticky=tk.W, padx=(0, 10))
+        
+        def apply():
+            self.custom_fields = tuple(name for name in names if choices[name].get())
+            self.fields_var.set(CUSTOM_FIELDS)
+            dialog.destroy()
+        
+        buttons = ttk.Frame(dialog, padding=(10, 0, 10, 10))
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="OK", command=apply).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=(0, 5))
+    
+    def get_fields(self):
+        """Fields selected for scraping, or None for every field"""
+        preset = self.fields_var.get()
+        if preset == CUSTOM_FIELDS:
+            return self.custom_fields or None
+        return FIELD_PRESETS.get(preset)
+    
     def select_images_folder(self):
         """Select folder for storing downloaded images"""
         folder_path = filedialog.askdirectory(title="Select Images Folder")
@@ -178,7 +344,8 @@ class WheelersScraperGUI:
             ("Port:", "port"),
             ("Database:", "database"),
             ("Username:", "username"),
-            ("Password:", "password")
+            ("Password:", "password"),
+            ("Batch size:", "batch_size")
         ]
         
         self.db_entries = {}
@@ -205,79 +372,36 @@ class WheelersScraperGUI:
                   command=self.save_db_settings).pack(side=tk.LEFT)
     
     def log_message(self, message):
-        """Add message to log with timestamp"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """Add message to log with timestamp (safe from any thread)"""
+        self.ui.log(message)
     
-    def sanitize_filename(self, filename):
-        """Sanitize filename to be safe for file system"""
-        # Remove or replace invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
-        # Remove leading/trailing spaces and dots
-        filename = filename.strip(' .')
-        # Limit length
-        if len(filename) > 100:
-            filename = filename[:100]
-        return filename
+    def pump_ui(self):
+        """Apply queued log lines, progress and UI calls, then reschedule (UI thread)"""
+        lines, progress, calls = self.ui.drain()
+        if lines:
+            self.log_text.insert(tk.END, "".join(lines))
+            # Keep the widget a fixed-size ring buffer of the newest lines
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > self.ui.max_log_lines + 1:
+                self.log_text.delete("1.0", f"{line_count - self.ui.max_log_lines}.0")
+            self.log_text.see(tk.END)
+        if "maximum" in progress:
+            self.progress_bar['maximum'] = progress["maximum"]
+        if "value" in progress:
+            self.progress_bar['value'] = progress["value"]
+        if "text" in progress:
+            self.progress_var.set(progress["text"])
+        for func, args in calls:
+            func(*args)
+        self.root.after(FRAME_INTERVAL_MS, self.pump_ui)
     
-    def download_image(self, image_url, isbn, title=None):
-        """Download and save book image"""
+    def toggle_log_file(self):
+        """Start or stop appending the full log to LOG_FILE"""
         try:
-            # Create images folder if it doesn't exist
-            os.makedirs(self.images_folder, exist_ok=True)
-            
-            # Get image data
-            response = requests.get(image_url, timeout=30, 
-                                  headers={"User-Agent": "Mozilla/5.0 (compatible)"})
-            response.raise_for_status()
-            
-            # Determine file extension from URL or content type
-            content_type = response.headers.get('content-type', '')
-            if 'jpeg' in content_type or 'jpg' in content_type:
-                ext = '.jpg'
-            elif 'png' in content_type:
-                ext = '.png'
-            elif 'gif' in content_type:
-                ext = '.gif'
-            else:
-                # Try to get extension from URL
-                ext = os.path.splitext(image_url.split('?')[0])[1].lower()
-                if not ext or ext not in ['.jpg', '.jpeg', '.png', '.gif']:
-                    ext = '.jpg'  # Default to jpg
-            
-            # Create filename
-            filename = f"{isbn}{ext}"
-            
-            # Full path
-            filepath = os.path.join(self.images_folder, filename)
-            
-            # Save image
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            
-            # Verify it's a valid image by trying to open it
-            try:
-                with Image.open(filepath) as img:
-                    img.verify()
-            except Exception:
-                # If verification fails, remove the file
-                os.remove(filepath)
-                return None
-            
-            self.log_message(f"Downloaded image: {filename}")
-
-            filepath = str(Path(filepath).absolute())
-
-            if sys.platform not in ['linux', 'darwin']:
-                filepath = filepath.replace("/", "\\")
-
-            return filepath
-            
-        except Exception as e:
-            self.log_message(f"Failed to download image for ISBN {isbn}: {str(e)}")
-            return None
+            self.ui.set_log_file(LOG_FILE if self.log_file_var.get() else None)
+        except OSError as e:
+            self.log_file_var.set(False)
+            messagebox.showerror("Error", f"Cannot write log file: {str(e)}")
     
     def select_file(self):
         """Select CSV or Excel file containing ISBNs"""
@@ -292,28 +416,14 @@ class WheelersScraperGUI:
         
         if file_path:
             try:
-                # Read the file and extract ISBNs
-                if file_path.lower().endswith('.csv'):
-                    df = pd.read_csv(file_path)
-                else:
-                    df = pd.read_excel(file_path)
-                
-                # Look for ISBN column (case insensitive)
-                isbn_col = None
-                for col in df.columns:
-                    if 'isbn' in col.lower():
-                        isbn_col = col
-                        break
-                
-                if isbn_col is None:
-                    # If no ISBN column found, assume first column contains ISBNs
-                    isbn_col = df.columns[0]
-                
-                self.isbn_list = df[isbn_col].astype(str).tolist()
-                self.isbn_list = [isbn.strip() for isbn in self.isbn_list if isbn.strip()]
+                self.isbn_list, report = read_isbn_file(file_path)
+                self.input_file = file_path
                 
                 self.file_label.config(text=f"File loaded: {len(self.isbn_list)} ISBNs found")
-                self.log_message(f"Loaded {len(self.isbn_list)} ISBNs from {os.path.basename(file_path)}")
+                self.log_message(f"{os.path.basename(file_path)}: {report.describe()}")
+                if report.rejected_samples:
+                    self.log_message(f"Rejected values (first {len(report.rejected_samples)}): "
+                                     f"{', '.join(report.rejected_samples)}")
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to read file: {str(e)}")
@@ -326,11 +436,8 @@ class WheelersScraperGUI:
             for key, entry in self.db_entries.items():
                 self.db_config[key] = entry.get()
             
-            connection_string = f"mysql+pymysql://{self.db_config['username']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
-            
-            engine = create_engine(connection_string)
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            from wheelers.db import test_connection
+            test_connection(self.db_config)
             
             messagebox.showinfo("Success", "Database connection successful!")
             self.log_message("Database connection test successful")
@@ -348,280 +455,188 @@ class WheelersScraperGUI:
         messagebox.showinfo("Success", "Database settings saved!")
         self.log_message("Database settings saved")
     
-    def extract_book_info(self, isbn):
-        """Extract book information from Wheeler's website (robust to quotes)."""
-        base_url = "https://www.wheelersbooks.com.au/product/"
-        url = base_url + isbn
-
+    def get_worker_count(self):
+        """Read the worker count option, falling back to the default"""
         try:
-            res = requests.get(
-                url,
-                headers={"User-Agent": "Mozilla/5.0 (compatible)"},
-                timeout=30,
-            )
-            if res.status_code != 200:
-                return {"isbn": isbn, "error": f"HTTP {res.status_code}"}
-
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            def safe_text(selector: str):
-                el = soup.select_one(selector)
-                return el.get_text(strip=True) if el else None
-
-            def _row_selector(label_text: str) -> str:
-                safe = label_text.replace('"', '\\"')
-                return f'div.row:has(label:contains("{safe}")) span'
-
-            def _table_selector(label_text: str) -> str:
-                safe = label_text.replace('"', '\\"')
-                return f'tr:has(th:contains("{safe}")) td'
-
-            def grab(label: str):
-                return safe_text(_row_selector(label)) or safe_text(_table_selector(label))
-
-            def extract_single_book_data(soup_obj, isbn_val, base_url_val):
-                """Extract book data from a BeautifulSoup object."""
-                categories = [
-                    a.get_text(strip=True)
-                    for a in soup_obj.select("div.product-description a[href*='/category/']")
-                ]
-                categories_text = ", ".join(categories) if categories else None
-
-                image_url = None
-                local_image_path = None
-                
-                # Always extract image URL
-                img_el = soup_obj.select_one("img.cover")   
-                if img_el and img_el.get("src"):
-                    src = img_el["src"]
-
-                    # make it absolute
-                    if src.startswith("//"):            
-                        src = "https:" + src
-                    else:                               
-                        src = urljoin(base_url_val, src)
-
-                    image_url = src
-                    
-                    # Download image if option is enabled
-                    if self.download_images_var.get() and image_url:
-                        # Get title for filename
-                        title = grab("Title") or safe_text("h1.title")
-                        local_image_path = self.download_image(image_url, isbn_val, title)
-
-                # Use local grab function that works with the passed soup object
-                def local_grab(label: str):
-                    def local_safe_text(selector: str):
-                        el = soup_obj.select_one(selector)
-                        return el.get_text(strip=True) if el else None
-                    
-                    return local_safe_text(_row_selector(label)) or local_safe_text(_table_selector(label))
-                
-                return {
-                    # Identifiers ---------------------------------------------------
-                    "isbn": local_grab("ISBN:"),
-                    "title": local_grab("Title") or safe_text("h1.title"),
-                    "author": local_grab("Author") or safe_text("div.author a[href*='/author/']"),
-                    "illustrator": safe_text("div.author div:nth-of-type(2) a.link"),
-                    # Publication ---------------------------------------------------
-                    "publisher": local_grab("Publisher:") or local_grab("Publisher"),
-                    "published": local_grab("Published:"),
-                    "published_imported": local_grab("Published (Imported):"),
-                    "replaced_by": local_grab("Replaced by:"),
-                    "language": local_grab("Language:"),
-                    "series": local_grab("Series:") or safe_text("span.series a"),
-                    "interest_age": local_grab("Interest age:"),
-                    "ar_level": local_grab("AR:"),
-                    "premiers_reading_challenge": local_grab("Premier's Reading Challenge:"),
-                    "imprint": local_grab("Imprint"),
-                    "publication_country": local_grab("Publication Country"),
-                    "edition": local_grab("Edition"),
-                    # Physical / meta -----------------------------------------------
-                    "page_count": local_grab("Number of pages"),
-                    "dimensions": local_grab("Dimensions"),
-                    "weight": local_grab("Weight"),
-                    "dewey_code": local_grab("Dewey Code"),
-                    "reading_age": local_grab("Reading Age"),
-                    "library_of_congress": local_grab("Library of Congress"),
-                    "nbs_text": local_grab("NBS Text"),
-                    "onix_text": local_grab("Onix Text"),
-                    # Misc -----------------------------------------------------------
-                    "price": local_grab("Price") or safe_text("div.price.red-text.bold") or safe_text("span.price"),                    "full_description": local_grab("Full Description") or safe_text("div.description"),
-                    "categories": categories_text,
-                    "image_url": image_url,
-                    "local_image_path": local_image_path,  # New field for local image path
-                    "scraped_at": datetime.now().isoformat(),
-                }
-
-            def get_alternate_data():
-                """Extract alternate format data from the current page."""
-                alternate_data = []
-                all_alt_formats_section = soup.select('#allAltFormats ul li a[href*="/product/"]')
-
-                def abs_url(href: str) -> str:
-                    return urljoin('https://www.wheelersbooks.com.au', href)
-
-                current_url_norm = url.rstrip('/')
-
-                for link in all_alt_formats_section:
-                    href = link.get('href')
-                    if not href:
-                        continue
-                    href = abs_url(href)
-                    if href.rstrip('/') == current_url_norm:
-                        continue  # skip current page
-
-                    try:
-                        alt_res = requests.get(
-                            href,
-                            headers={"User-Agent": "Mozilla/5.0 (compatible)"},
-                            timeout=30,
-                        )
-                        if alt_res.status_code != 200:
-                            continue
-
-                        alt_soup = BeautifulSoup(alt_res.text, "html.parser")
-
-                        def alt_safe_text(selector: str):
-                            el = alt_soup.select_one(selector)
-                            return el.get_text(strip=True) if el else None
-
-                        def alt_local_grab(label: str):
-                            def _row_selector(label_text: str) -> str:
-                                safe = label_text.replace('"', '\\"')
-                                return f'div.row:has(label:contains("{safe}")) span'
-                            def _table_selector(label_text: str) -> str:
-                                safe = label_text.replace('"', '\\"')
-                                return f'tr:has(th:contains("{safe}")) td'
-                            return (
-                                alt_safe_text(_row_selector(label))
-                                or alt_safe_text(_table_selector(label))
-                            )
-
-                        alt_price = (
-                            alt_local_grab("Price")
-                            or alt_safe_text("div.price.red-text.bold")
-                            or alt_safe_text("span.price.red-text")
-                            or alt_safe_text("span.price")
-                        )
-
-                        alt_data = {
-                            "alternate_edition":        alt_local_grab("Edition"),
-                            "alternate_isbn":           alt_local_grab("ISBN:"),
-                            "alternate_isbn_pub_date":  alt_local_grab("Published:"),
-                            "alternate_isbn_price":     alt_price,
-                        }
-                        alternate_data.append(alt_data)
-
-                    except Exception:
-                        continue
-
-                return alternate_data
-
-
-
-            # Extract main book data
-            book_data = extract_single_book_data(soup, isbn, url)
-            
-            # Extract alternate formats
-            alternates = get_alternate_data()
-            
-            # Option 1: Flatten alternates into the main book data (takes first alternate only)
-            if alternates:
-                first_alt = alternates[0]
-                book_data.update(first_alt)
-            else:
-                # Add empty alternate fields if no alternates found
-                book_data.update({
-                    "alternate_edition": None,
-                    "alternate_isbn": None,
-                    "alternate_isbn_pub_date": None,
-                    "alternate_isbn_price": None,
-                })
-            
-            return book_data
-
-        except Exception as exc:
-            # Bubble up a clean message
-            return {"isbn": isbn}
-
+            return max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            return DEFAULT_WORKERS
+    
+    def get_parse_workers(self):
+        """Read the parse process count option, falling back to in-thread parsing"""
+        try:
+            return max(0, int(self.parse_workers_var.get()))
+        except (tk.TclError, ValueError):
+            return 0
+    
+    def get_rate_limit(self):
+        """Read the per-host requests/sec option, falling back to the default"""
+        try:
+            return max(0.0, float(self.rate_limit_var.get()))
+        except (tk.TclError, ValueError):
+            return DEFAULT_REQUESTS_PER_SECOND
+    
+    def open_cache(self):
+        """Open the on-disk page cache if enabled in the options"""
+        if not self.use_cache_var.get():
+            return None
+        try:
+            ttl_hours = max(0.0, float(self.cache_ttl_var.get()))
+        except (tk.TclError, ValueError):
+            ttl_hours = DEFAULT_CACHE_TTL_HOURS
+        from wheelers.http_client import ResponseCache
+        try:
+            return ResponseCache(CACHE_FILE, ttl_hours=ttl_hours)
+        except sqlite3.Error as e:
+            self.log_message(f"Page cache disabled: {str(e)}")
+            return None
+    
+    def open_negative_cache(self):
+        """Open the store of recent failures if skipping them is enabled"""
+        if not self.negative_cache_var.get():
+            return None
+        from wheelers.failures import NegativeCache
+        try:
+            return NegativeCache(NEGATIVE_CACHE_FILE)
+        except sqlite3.Error as e:
+            self.log_message(f"Skipping known failures disabled: {str(e)}")
+            return None
+    
+    def open_journal(self):
+        """Open the run journal for the input file, returning (journal, ISBNs to scrape)"""
+        if not self.journal_var.get() or not self.input_file:
+            return None, self.isbn_list
+        
+        journal_path = journal_path_for(self.input_file)
+        isbns = self.isbn_list
+        if self.resume_var.get():
+            done = completed_isbns(journal_path)
+            isbns = [isbn for isbn in self.isbn_list if isbn not in done]
+            # Keep earlier results so exports and DB saves cover the whole file
+            self.scraped_data = RecordStore(record for record in iter_records(journal_path)
+                                            if 'error' not in record)
+            self.log_message(f"Resuming: {len(self.isbn_list) - len(isbns)} ISBNs already in "
+                             f"{os.path.basename(journal_path)}, {len(isbns)} left")
+        try:
+            journal = RunJournal(journal_path)
+        except OSError as e:
+            self.log_message(f"Run journal disabled: {str(e)}")
+            return None, isbns
+        self.log_message(f"Writing run journal to: {journal_path}")
+        return journal, isbns
+    
+    def open_db_writer(self, metrics):
+        """Start the background database writer if saving to the database"""
+        if not self.save_to_db_var.get():
+            return None
+        try:
+            from wheelers.db import DatabaseWriter
+            return DatabaseWriter(self.db_config, skip_unchanged=self.skip_unchanged_var.get(),
+                                  change_log=self.change_log_var.get(),
+                                  metrics=metrics, log=self.log_message)
+        except Exception as e:
+            self.log_message(f"Error saving to database: {str(e)}")
+            self.ui.call(messagebox.showerror, "Database Error",
+                         f"Failed to save to database: {str(e)}")
+            return None
     
     def scrape_books(self):
         """Main scraping function"""
-        self.scraped_data = []
-        total_books = len(self.isbn_list)
-        
-        # Create images folder if downloading images
-        if self.download_images_var.get():
-            try:
-                os.makedirs(self.images_folder, exist_ok=True)
-                self.log_message(f"Images will be saved to: {self.images_folder}")
-            except Exception as e:
-                self.log_message(f"Error creating images folder: {str(e)}")
-        
-        self.progress_bar['maximum'] = total_books
-        
-        for i, isbn in enumerate(self.isbn_list):
-            if not self.is_scraping:  # Check if scraping was stopped
-                break
-                
-            self.progress_var.set(f"Processing ISBN {i+1}/{total_books}: {isbn}")
-            self.log_message(f"Scraping data for ISBN: {isbn}")
-            
-            book_data = self.extract_book_info(isbn)
-            self.scraped_data.append(book_data)
-            
-            if 'error' in book_data:
-                self.log_message(f"Error for ISBN {isbn}: {book_data['error']}")
-            else:
-                title = book_data.get('title', 'Unknown Title')
-                self.log_message(f"Successfully scraped: {title}")
-                
-                # Log if image was downloaded
-                if self.download_images_var.get() and book_data.get('local_image_path'):
-                    self.log_message(f"  └─ Image saved: {os.path.basename(book_data['local_image_path'])}")
-            
-            self.progress_bar['value'] = i + 1
-            self.root.update_idletasks()
-        
-        if self.is_scraping:  # Only proceed if scraping wasn't stopped
-            self.progress_var.set(f"Completed! Processed {len(self.scraped_data)} books")
-            
-            # Save to database if requested
-            if self.save_to_db_var.get():
-                self.save_to_database()
-            
-            # Enable export buttons
-            self.export_csv_button.config(state=tk.NORMAL)
-            self.export_excel_button.config(state=tk.NORMAL)
-            
-            # Log summary
-            downloaded_images = sum(1 for book in self.scraped_data if book.get('local_image_path'))
-            self.log_message("Scraping completed successfully!")
-            if self.download_images_var.get():
-                self.log_message(f"Downloaded {downloaded_images} images to {self.images_folder}")
-        
-        self.is_scraping = False
-        self.start_button.config(text="Start Scraping")
-    
-    def save_to_database(self):
-        """Save scraped data to MySQL database"""
+        self.scraped_data = RecordStore()
+        self.scraper = None
+        journal = metrics = cache = negative_cache = None
+        write_metrics = self.metrics_var.get()
         try:
-            connection_string = f"mysql+pymysql://{self.db_config['username']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
+            journal, isbns = self.open_journal()
+            metrics = RunMetrics(isbn_log=f"{METRICS_PREFIX}.isbns.jsonl" if write_metrics else None)
+            cache = self.open_cache()
+            negative_cache = self.open_negative_cache()
+            total_books = len(isbns)
             
-            engine = create_engine(connection_string)
+            from wheelers.core import WheelersScraper
+            # Snapshot options so worker threads never touch Tk variables
+            self.scraper = WheelersScraper(
+                workers=self.get_worker_count(),
+                requests_per_second=self.get_rate_limit(),
+                download_images=self.download_images_var.get(),
+                images_folder=self.images_folder,
+                thumbnail_size=THUMBNAIL_SIZE if self.thumbnails_var.get() else None,
+                fetch_all_alternates=self.all_alternates_var.get(),
+                fields=self.get_fields(),
+                parse_workers=self.get_parse_workers(),
+                cache=cache,
+                negative_cache=negative_cache,
+                journal=journal,
+                log=self.log_message,
+                metrics=metrics,
+            )
+            # Only start the writer thread once the scraper exists to close it
+            db_writer = self.scraper.db_writer = self.open_db_writer(metrics)
             
-            # Convert to DataFrame
-            df = pd.DataFrame(self.scraped_data)
+            self.ui.progress(value=0, maximum=total_books)
             
-            # Save to database
-            df.to_sql("wheelers_books", engine, if_exists="append", index=False)
+            try:
+                for i, (isbn, book_data) in enumerate(self.scraper.scrape(isbns)):
+                    if not self.is_scraping:  # Check if scraping was stopped
+                        break
+                    
+                    self.scraped_data.append(book_data)
+                    
+                    if 'known_failure' in book_data:
+                        self.log_message(f"Skipped ISBN {isbn}, failed at "
+                                         f"{book_data['known_failure']}: {book_data['error']}")
+                    elif 'error' in book_data:
+                        self.log_message(f"Error for ISBN {isbn}: {book_data['error']}")
+                    elif 'refreshed_fields' in book_data:
+                        self.log_message(f"Refreshed {book_data['refreshed_fields']}: {isbn}")
+                    else:
+                        title = book_data.get('title', 'Unknown Title')
+                        self.log_message(f"Successfully scraped: {title}")
+                        
+                        # Log if image was downloaded
+                        if book_data.get('local_image_path'):
+                            self.log_message(f"  └─ Image saved: {os.path.basename(book_data['local_image_path'])}")
+                    
+                    self.ui.progress(value=i + 1,
+                                     text=f"Processed ISBN {i+1}/{total_books}: {isbn}")
+            finally:
+                self.scraper.log_summary()
+                self.scraper.close()  # also flushes the database writer
+                if write_metrics:
+                    try:
+                        for path in metrics.write(METRICS_PREFIX, self.scraper.summary()):
+                            self.log_message(f"Metrics written to {path}")
+                    except OSError as e:
+                        self.log_message(f"Error writing metrics: {str(e)}")
             
-            self.log_message(f"Successfully saved {len(self.scraped_data)} records to database")
+            if db_writer is not None:
+                stats = db_writer.stats()
+                unchanged = (f", {stats['unchanged']} unchanged not rewritten"
+                             if "unchanged" in stats else "")
+                self.log_message(f"Database: {stats['written']} records saved{unchanged}, "
+                                 f"{stats['skipped']} errors skipped, {stats['failed']} failed")
             
+            if self.is_scraping:  # Only proceed if scraping wasn't stopped
+                self.ui.progress(text=f"Completed! Processed {len(self.scraped_data)} books")
+                
+                # Enable export buttons
+                self.ui.call(self.set_export_buttons, tk.NORMAL)
+                
+                # Log summary
+                self.log_message("Scraping completed successfully!")
+                if self.scraper.download_images:
+                    self.log_message(f"Downloaded {self.scraper.images_downloaded} images to {self.images_folder}")
         except Exception as e:
-            self.log_message(f"Error saving to database: {str(e)}")
-            messagebox.showerror("Database Error", f"Failed to save to database: {str(e)}")
+            self.log_message(f"Scraping failed: {str(e)}")
+            self.ui.call(messagebox.showerror, "Error", f"Scraping failed: {str(e)}")
+        finally:
+            if self.scraper is None:
+                # Setup failed before the scraper took these over, so close them here
+                for resource in (journal, metrics, cache, negative_cache):
+                    if resource is not None:
+                        resource.close()
+            self.is_scraping = False
+            self.ui.call(self.start_button.config, {"text": "Start Scraping"})
     
     def start_scraping(self):
         """Start or stop the scraping process"""
@@ -632,62 +647,77 @@ class WheelersScraperGUI:
             
             self.is_scraping = True
             self.start_button.config(text="Stop Scraping")
-            self.export_csv_button.config(state=tk.DISABLED)
-            self.export_excel_button.config(state=tk.DISABLED)
+            self.set_export_buttons(tk.DISABLED)
             
             # Start scraping in a separate thread
             threading.Thread(target=self.scrape_books, daemon=True).start()
         else:
             self.is_scraping = False
+            if self.scraper is not None:
+                self.scraper.stop()
             self.start_button.config(text="Start Scraping")
-            self.progress_var.set("Stopping...")
+            self.ui.progress(text="Stopping...")
     
-    def export_csv(self):
-        """Export scraped data to CSV"""
+    def set_export_buttons(self, state):
+        for button in (self.export_csv_button, self.export_excel_button,
+                       self.export_parquet_button):
+            if button is not None:
+                button.config(state=state)
+    
+    def start_export(self, title, extension, filetypes, label):
+        """Ask for a file and export scraped data to it off the UI thread"""
         if not self.scraped_data:
             messagebox.showwarning("Warning", "No data to export!")
             return
         
         file_path = filedialog.asksaveasfilename(
-            title="Save CSV File",
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")]
+            title=title,
+            defaultextension=extension,
+            filetypes=filetypes
         )
         
         if file_path:
-            try:
-                df = pd.DataFrame(self.scraped_data)
-                df.to_csv(file_path, index=False)
-                messagebox.showinfo("Success", f"Data exported to {file_path}")
-                self.log_message(f"Data exported to CSV: {file_path}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to export CSV: {str(e)}")
+            self.set_export_buttons(tk.DISABLED)
+            self.ui.progress(value=0, maximum=len(self.scraped_data))
+            threading.Thread(target=self.run_export, args=(file_path, label),
+                             daemon=True).start()
     
-    def export_excel(self):
-        """Export scraped data to Excel"""
-        if not self.scraped_data:
-            messagebox.showwarning("Warning", "No data to export!")
-            return
+    def run_export(self, file_path, label):
+        """Stream scraped data to file_path in chunks (runs on a worker thread)"""
+        total = len(self.scraped_data)
         
-        file_path = filedialog.asksaveasfilename(
-            title="Save Excel File",
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx")]
-        )
+        def progress(count):
+            self.ui.progress(value=count, text=f"Exporting to {label}: {count}/{total} rows")
         
-        if file_path:
-            try:
-                df = pd.DataFrame(self.scraped_data)
-                df.to_excel(file_path, index=False)
-                messagebox.showinfo("Success", f"Data exported to {file_path}")
-                self.log_message(f"Data exported to Excel: {file_path}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to export Excel: {str(e)}")
+        try:
+            from wheelers.export import export_records
+            export_records(self.scraped_data, file_path, progress=progress)
+            self.log_message(f"Data exported to {label}: {file_path}")
+            self.ui.call(messagebox.showinfo, "Success", f"Data exported to {file_path}")
+        except Exception as e:
+            self.ui.call(messagebox.showerror, "Error", f"Failed to export {label}: {str(e)}")
+        finally:
+            self.ui.call(self.set_export_buttons, tk.NORMAL)
+    
+    def export_csv(self):
+        """Export scraped data to CSV"""
+        self.start_export("Save CSV File", ".csv", [("CSV files", "*.csv")], "CSV")
+    
+    def export_excel(self):
+        """Export scraped data to Excel"""
+        self.start_export("Save Excel File", ".xlsx", [("Excel files", "*.xlsx")], "Excel")
+    
+    def export_parquet(self):
+        """Export scraped data to Parquet"""
+        self.start_export("Save Parquet File", ".parquet", [("Parquet files", "*.parquet")],
+                          "Parquet")
 
 def main():
+    multiprocessing.freeze_support()  # thumbnail process pool in the frozen exe
     root = tk.Tk()
     app = WheelersScraperGUI(root)
     root.mainloop()
+    app.ui.close()
 
 if __name__ == "__main__":
     main()
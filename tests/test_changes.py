@@ -0,0 +1,80 @@
+import pytest
+
+from wheelers.changes import (
+    CHANGED,
+    NEW,
+    UNCHANGED,
+    HashIndex,
+    content_hash,
+    isbn_key,
+)
+
+
+def test_content_hash_ignores_timestamps_only():
+    record = {"isbn": "9780306406157", "title": "A", "price": "$10",
+              "scraped_at": "2025-01-01T00:00:00"}
+    later = dict(record, scraped_at="2025-02-01T00:00:00")
+    assert content_hash(record) == content_hash(later)
+    assert content_hash(record) != content_hash(dict(record, price="$11"))
+
+
+def test_content_hash_tells_missing_from_none():
+    record = {"isbn": "9780306406157", "title": "A"}
+    assert content_hash(record) != content_hash(dict(record, all_alternates=None))
+
+
+def test_isbn_keys_do_not_collide():
+    keys = {isbn_key(isbn) for isbn in ("0439420891", "439420891", "043942089X",
+                                        "9780439420891")}
+    assert len(keys) == 4
+    assert isbn_key("043942089X") < 0
+
+
+def test_build_and_check():
+    index = HashIndex.build([("9780439420891", 2), ("9780306406157", 1), ("043942089X", 3)])
+    assert len(index) == 3
+    assert index.lookup("9780306406157") == (True, 1)
+    assert index.lookup("9781111111111") == (False, None)
+
+    assert index.check("9780306406157", 1) == UNCHANGED
+    assert index.check("9780439420891", 5) == CHANGED
+    assert index.check("9780439420891", 5) == UNCHANGED
+    assert index.check("9781111111111", 7) == NEW
+    assert index.check("9781111111111", 7) == UNCHANGED
+
+
+def test_unknown_hash_always_counts_as_changed():
+    index = HashIndex.build([("9780306406157", 1)])
+    assert index.check("9780306406157", None) == CHANGED
+    assert index.check("9780306406157", 1) == CHANGED
+    index.forget("9780306406157")
+    assert index.lookup("9780306406157") == (True, None)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = HashIndex.build([("9780306406157", 1), ("9780439420891", 2)])
+    index.check("043942089X", -3)
+    index.check("9780439420891", 4)
+    index.forget("9780306406157")
+    path = str(tmp_path / "hashes.idx")
+    index.save(path)
+
+    loaded = HashIndex.load(path)
+    # Forgotten (unknown) entries are not saved
+    assert len(loaded) == 2
+    assert loaded.lookup("043942089X") == (True, -3)
+    assert loaded.lookup("9780439420891") == (True, 4)
+    assert loaded.lookup("9780306406157") == (False, None)
+
+
+def test_load_rejects_truncated_and_foreign_files(tmp_path):
+    path = tmp_path / "hashes.idx"
+    HashIndex.build([("9780306406157", 1), ("9780439420891", 2)]).save(str(path))
+    data = path.read_bytes()
+    path.write_bytes(data[:-4])
+    with pytest.raises(ValueError, match="truncated"):
+        HashIndex.load(str(path))
+
+    path.write_bytes(b"not an index at all")
+    with pytest.raises(ValueError, match="not a hash index"):
+        HashIndex.load(str(path))
@@ -0,0 +1,16 @@
+import pytest
+
+from wheelers.cli import build_parser
+from wheelers.refresh import VOLATILE_FIELDS
+
+
+def test_scrape_fields_are_validated():
+    args = build_parser().parse_args(["scrape", "isbns.csv", "--fields", "price, title"])
+    assert args.fields == ("price", "title")
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["scrape", "isbns.csv", "--fields", "price,stok"])
+
+
+def test_scrape_fields_default_is_parsed():
+    args = build_parser().parse_args(["scrape", "isbns.csv"])
+    assert args.fields == tuple(VOLATILE_FIELDS)
@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from wheelers.core import ordered_map
+
+
+def test_ordered_map_yields_in_input_order():
+    # Later items finish first, but come out in the order they went in
+    def slow_first(n):
+        time.sleep(0.01 * (5 - n))
+        return n * n
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(ordered_map(executor, slow_first, range(5), window=5))
+    assert results == [(n, n * n) for n in range(5)]
+
+
+def test_ordered_map_submits_at_most_window_items_ahead():
+    pulled = []
+
+    def items():
+        for n in range(20):
+            pulled.append(n)
+            yield n
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for consumed, (item, _) in enumerate(ordered_map(executor, str, items(), window=3), 1):
+            # The item being yielded was one of at most `window` in flight
+            assert len(pulled) <= consumed - 1 + 3
+    assert len(pulled) == 20
+
+
+def test_ordered_map_cancels_queued_calls_on_early_exit():
+    calls = []
+    lock = threading.Lock()
+
+    def work(n):
+        with lock:
+            calls.append(n)
+        time.sleep(0.05)
+        return n
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = ordered_map(executor, work, range(10), window=4)
+        assert next(results) == (0, 0)
+        results.close()
+    # Item 1 may already have been running; 2 and 3 were still queued
+    assert calls in ([0], [0, 1])
+
+
+def test_ordered_map_stops_when_told_to():
+    stop = threading.Event()
+    seen = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for item, _ in ordered_map(executor, str, range(100), window=2,
+                                   keep_going=lambda: not stop.is_set()):
+            seen.append(item)
+            if item == 3:
+                stop.set()
+    assert seen == [0, 1, 2, 3]
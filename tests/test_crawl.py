@@ -0,0 +1,97 @@
+import pytest
+
+from wheelers.crawl import CATEGORY, MAX_CATEGORY_ATTEMPTS, PRODUCT, BloomFilter, Crawl
+
+SITE = "https://books.example"
+CATEGORY_URL = SITE + "/category/history"
+LISTING = ('<a href="/product/9780306406157">One</a>'
+           '<a href="/product/9780439420891">Two</a>')
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeHttp:
+    """get_page() answers from a list of outcomes per URL: a status code, or an exception"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.requests = []
+
+    def get_page(self, url):
+        self.requests.append(url)
+        outcome = self.outcomes[url].pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome, LISTING if outcome == 200 else "")
+
+
+def run(path, http):
+    crawl = Crawl(str(path), max_depth=1, max_pages=100)
+    try:
+        crawl.add_seeds([CATEGORY_URL], SITE)
+        isbns = []
+        # As the scraper does: each ISBN is finished before the next is asked for
+        for isbn in crawl.isbns(http):
+            isbns.append(isbn)
+            crawl.finished(isbn)
+            crawl.record(isbn, {"isbn": isbn})
+        return isbns, crawl.pending()
+    finally:
+        crawl.close()
+
+
+@pytest.mark.parametrize("failure", [503, ConnectionError("reset")])
+def test_failed_category_is_retried_by_the_next_run(tmp_path, failure):
+    state = tmp_path / "crawl.sqlite"
+    http = FakeHttp({CATEGORY_URL: [failure, 200]})
+
+    isbns, pending = run(state, http)
+    assert isbns == []
+    assert pending == {CATEGORY: 1}
+
+    isbns, pending = run(state, http)
+    assert isbns == ["9780306406157", "9780439420891"]
+    assert pending == {}
+    assert http.requests == [CATEGORY_URL, CATEGORY_URL]
+
+
+def test_missing_category_is_dropped(tmp_path):
+    state = tmp_path / "crawl.sqlite"
+    http = FakeHttp({CATEGORY_URL: [404]})
+    assert run(state, http) == ([], {})
+    assert run(state, http) == ([], {})
+    assert http.requests == [CATEGORY_URL]
+
+
+def test_category_is_given_up_after_max_attempts(tmp_path):
+    state = tmp_path / "crawl.sqlite"
+    http = FakeHttp({CATEGORY_URL: [500] * MAX_CATEGORY_ATTEMPTS})
+    for attempt in range(1, MAX_CATEGORY_ATTEMPTS + 1):
+        isbns, pending = run(state, http)
+        assert isbns == []
+        assert pending == ({} if attempt == MAX_CATEGORY_ATTEMPTS else {CATEGORY: 1})
+    assert len(http.requests) == MAX_CATEGORY_ATTEMPTS
+
+
+def test_unrecorded_products_are_handed_out_again(tmp_path):
+    state = tmp_path / "crawl.sqlite"
+    crawl = Crawl(str(state))
+    crawl.add_seeds(["/product/9780306406157"], SITE)
+    assert list(crawl.isbns(FakeHttp({}), stopped=lambda: crawl.products > 0)) == [
+        "9780306406157"]
+    crawl.close()  # crashed before the record was written
+
+    crawl = Crawl(str(state))
+    assert crawl.pending() == {PRODUCT: 1}
+    crawl.close()
+
+
+def test_bloom_filter_membership():
+    bloom = BloomFilter(1000, 1e-6)
+    assert bloom.add("category:a")
+    assert not bloom.add("category:a")
+    assert "category:a" in bloom and "category:b" not in bloom
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import select
+
+from wheelers.changes import content_hash
+from wheelers.core import refreshed_fields
+from wheelers.db import DEFAULT_BATCH_SIZE, DatabaseWriter, batch_size_of, books_table, get_engine
+from wheelers.records import RECORD_FIELDS
+
+ISBNS = [f"97803064{n:05d}" for n in range(12)]
+
+
+def full_record(isbn, price="$10.00", scraped_at="2026-01-01T00:00:00"):
+    record = dict.fromkeys(RECORD_FIELDS)
+    record.update(isbn=isbn, title=f"Book {isbn}", price=price, scraped_at=scraped_at)
+    return record
+
+
+def price_refresh(isbn, price, refreshed_at="2026-01-02T00:00:00"):
+    return refreshed_fields(full_record(isbn, price, scraped_at=refreshed_at), ["price"])
+
+
+def write(db_config, records):
+    writer = DatabaseWriter(db_config, skip_unchanged=True)
+    for record in records:
+        writer.put(record["isbn"], record)
+    writer.close()
+    return writer.stats()
+
+
+def stored(db_config):
+    columns = books_table.c
+    query = select(columns.isbn, columns.price, columns.content_hash, columns.refreshed_at)
+    with get_engine(db_config).connect() as conn:
+        return {row.isbn: row for row in conn.execute(query)}
+
+
+def test_unchanged_price_refresh_keeps_rows_unchanged(tmp_path):
+    db_config = {"url": f"sqlite:///{tmp_path / 'books.sqlite'}"}
+    journal = ([full_record(isbn) for isbn in ISBNS]
+               + [price_refresh(isbn, "$10.00") for isbn in ISBNS])
+    assert write(db_config, journal)["written"] == 12
+    hashes = {isbn: row.content_hash for isbn, row in stored(db_config).items()}
+    assert None not in hashes.values()
+
+    # Loading the same records again rewrites nothing
+    stats = write(db_config, journal)
+    assert stats["written"] == 0
+    assert stats["unchanged"] == 24
+    rows = stored(db_config)
+    assert {isbn: row.content_hash for isbn, row in rows.items()} == hashes
+    assert all(row.refreshed_at.day == 2 for row in rows.values())
+
+
+def test_changed_price_refresh_is_merged_into_the_hash(tmp_path):
+    db_config = {"url": f"sqlite:///{tmp_path / 'books.sqlite'}"}
+    isbn = ISBNS[0]
+    write(db_config, [full_record(isbn)])
+    stats = write(db_config, [price_refresh(isbn, "$12.50")])
+    assert stats == {"written": 1, "skipped": 0, "failed": 0, "unchanged": 0}
+    row = stored(db_config)[isbn]
+    assert row.price == "$12.50"
+    assert row.content_hash == content_hash(full_record(isbn, "$12.50"))
+
+    # A full scrape that agrees with the refreshed row is not rewritten
+    stats = write(db_config, [full_record(isbn, "$12.50", scraped_at="2026-01-03T00:00:00")])
+    assert stats["unchanged"] == 1
+    # ...but one back at the old price is
+    assert write(db_config, [full_record(isbn)])["written"] == 1
+    assert stored(db_config)[isbn].price == "$10.00"
+
+
+def test_price_refresh_of_an_unknown_isbn_has_no_hash(tmp_path):
+    db_config = {"url": f"sqlite:///{tmp_path / 'books.sqlite'}"}
+    assert write(db_config, [price_refresh(ISBNS[0], "$5.00")])["written"] == 1
+    assert stored(db_config)[ISBNS[0]].content_hash is None
+
+
+def test_batch_size_comes_from_db_config(tmp_path):
+    assert batch_size_of({}) == DEFAULT_BATCH_SIZE
+    assert batch_size_of({"batch_size": ""}) == DEFAULT_BATCH_SIZE
+    assert batch_size_of({"batch_size": "50"}) == 50
+    with pytest.raises(ValueError):
+        batch_size_of({"batch_size": "0"})
+
+    db_config = {"url": f"sqlite:///{tmp_path / 'books.sqlite'}", "batch_size": 5}
+    for batch_size, expected in ((None, 5), (7, 7)):
+        writer = DatabaseWriter(db_config, batch_size=batch_size)
+        writer.close()
+        assert writer.batch_size == expected
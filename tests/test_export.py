@@ -0,0 +1,19 @@
+import csv
+
+from wheelers.core import refreshed_fields
+from wheelers.export import export_csv
+from wheelers.records import RecordStore
+
+
+def test_csv_export_keeps_refresh_timestamps(tmp_path):
+    full = {"isbn": "9780306406157", "title": "Book", "price": "$10.00",
+            "scraped_at": "2026-01-01T00:00:00"}
+    refreshed = dict(full, price="$12.50", scraped_at="2026-01-02T00:00:00")
+    path = tmp_path / "books.csv"
+    export_csv(RecordStore([full, refreshed_fields(refreshed, ["price"])]), str(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["title"] == "Book" and rows[0]["refreshed_at"] == ""
+    assert rows[1]["price"] == "$12.50"
+    assert rows[1]["refreshed_at"] == "2026-01-02T00:00:00"
+    assert rows[1]["refreshed_fields"] == "price"
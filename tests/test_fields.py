@@ -0,0 +1,34 @@
+import pytest
+
+from wheelers.fields import compile_fields, parse_field_list
+
+
+def test_parse_field_list():
+    assert parse_field_list(" price, title ,") == ("price", "title")
+
+
+def test_parse_field_list_rejects_unknown_fields():
+    with pytest.raises(ValueError, match="stok"):
+        parse_field_list("price,stok")
+
+
+def test_price_only_plan_skips_alternates_and_images():
+    plan = compile_fields(("price",))
+    assert plan.partial
+    assert plan.fields == ("price",)
+    assert not plan.alternates and not plan.images and not plan.alt_links
+    assert [spec.name for spec in plan.page_specs] == ["isbn", "price", "scraped_at"]
+
+
+def test_alternate_fields_pull_in_their_sources():
+    plan = compile_fields(("alternate_isbn",))
+    assert plan.alternates and plan.alt_links
+    parsed = {spec.name for spec in plan.page_specs}
+    assert {"edition", "isbn", "published", "price"} <= parsed
+
+
+def test_full_plan():
+    plan = compile_fields()
+    assert not plan.partial
+    assert plan.alternates and plan.images
+    assert plan.describe() == "all fields"
@@ -0,0 +1,77 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from wheelers.core import WheelersScraper
+from wheelers.failures import NOT_FOUND
+from wheelers.http_client import ResponseCache
+
+KNOWN_ISBN = "9780306406157"
+UNKNOWN_ISBN = "9780439420891"
+PRODUCT_PAGE = (f'<div class="row"><label>ISBN:</label><span>{KNOWN_ISBN}</span></div>'
+                '<h1 class="title">A Book</h1>')
+SEARCH_PAGE = '<h1 class="title">Search results</h1>'
+
+
+class StandInSite(BaseHTTPRequestHandler):
+    """Known ISBN gets its product page; anything else is sent to search, like the live site"""
+
+    def do_GET(self):
+        if self.path == f"/product/{KNOWN_ISBN}":
+            self._send(PRODUCT_PAGE)
+        elif self.path.startswith("/product/"):
+            self.send_response(302)
+            self.send_header("Location", "/search?q=" + self.path.rsplit("/", 1)[-1])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self._send(SEARCH_PAGE)
+
+    def _send(self, html):
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInSite)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/product/"
+    server.shutdown()
+    server.server_close()
+
+
+def scrape_once(product_url, cache_path, isbn):
+    """Scrape isbn in a fresh run (new memo) sharing the on-disk cache"""
+    scraper = WheelersScraper(workers=1, requests_per_second=0, product_url=product_url,
+                              cache=ResponseCache(cache_path))
+    try:
+        record, _ = scraper.scrape_book(isbn)
+        return record, scraper.http.cache.stats()
+    finally:
+        scraper.close()
+
+
+def test_unknown_isbn_is_not_found_on_every_run(site, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    for _ in range(2):
+        record, stats = scrape_once(site, cache_path, UNKNOWN_ISBN)
+        assert record["error_class"] == NOT_FOUND
+        assert stats["hits"] == 0
+
+
+def test_product_pages_are_served_from_the_cache(site, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    record, stats = scrape_once(site, cache_path, KNOWN_ISBN)
+    assert record["isbn"] == KNOWN_ISBN and stats["misses"] == 1
+    record, stats = scrape_once(site, cache_path, KNOWN_ISBN)
+    assert record["isbn"] == KNOWN_ISBN and stats["hits"] == 1
@@ -0,0 +1,97 @@
+import io
+
+import pytest
+from PIL import Image
+
+from wheelers.images import ImageDownloader, content_hash
+from wheelers.metrics import RunMetrics
+
+ISBN = "9780306406157"
+COVER_URL = "https://images.example/covers/9780306406157.jpg"
+
+
+def jpeg(size, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+COVER = jpeg((200, 300), "navy")
+PLACEHOLDER = jpeg((200, 300), "grey")
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+        self.headers = {"content-type": "image/jpeg"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+class FakeHttp:
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.metrics = RunMetrics()
+        self.requests = []
+
+    def get(self, url, stream=False):
+        self.requests.append(url)
+        return FakeResponse(self.bodies[url])
+
+
+@pytest.fixture
+def placeholder_file(tmp_path):
+    path = tmp_path / "placeholder.jpg"
+    path.write_bytes(PLACEHOLDER)
+    return str(path)
+
+
+def download(folder, http, placeholders=()):
+    downloader = ImageDownloader(http, str(folder), placeholders=placeholders)
+    try:
+        return downloader.download(ISBN, COVER_URL), downloader.stats()
+    finally:
+        downloader.close()
+
+
+def test_existing_cover_is_kept(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    (folder / f"{ISBN}.jpg").write_bytes(COVER)
+    http = FakeHttp({})
+    path, stats = download(folder, http)
+    assert path == str(folder / f"{ISBN}.jpg")
+    assert stats["skipped_existing"] == 1 and http.requests == []
+
+
+def test_placeholder_left_by_an_earlier_run_is_replaced(tmp_path, placeholder_file):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    (folder / f"{ISBN}.jpg").write_bytes(PLACEHOLDER)
+    http = FakeHttp({COVER_URL: COVER})
+    path, stats = download(folder, http, placeholders=[placeholder_file])
+    assert http.requests == [COVER_URL]
+    assert stats["downloaded"] == 1 and stats["skipped_existing"] == 0
+    with open(path, "rb") as f:
+        assert content_hash(f.read()) == content_hash(COVER)
+
+
+def test_url_known_to_serve_a_placeholder_is_not_reported(tmp_path, placeholder_file):
+    folder = tmp_path / "images"
+    http = FakeHttp({COVER_URL: PLACEHOLDER})
+    assert download(folder, http, placeholders=[placeholder_file])[0] is None
+    # An older version saved the placeholder anyway
+    (folder / f"{ISBN}.jpg").write_bytes(PLACEHOLDER)
+    path, stats = download(folder, FakeHttp({}))
+    assert path is None
+    assert stats["placeholders"] == 1 and stats["skipped_existing"] == 0
@@ -0,0 +1,52 @@
+from wheelers.isbns import (
+    IsbnLoadReport,
+    isbn10_is_valid,
+    isbn13_is_valid,
+    iter_isbn_file,
+    normalize_isbn,
+)
+
+
+def test_isbn10_checksum():
+    assert isbn10_is_valid("0306406152")
+    assert isbn10_is_valid("043942089X")
+    assert not isbn10_is_valid("0306406153")
+    assert not isbn10_is_valid("X306406152")
+
+
+def test_isbn13_checksum_and_prefix():
+    assert isbn13_is_valid("9780306406157")
+    assert not isbn13_is_valid("9780306406158")
+    # Right checksum, but not a Bookland prefix
+    assert not isbn13_is_valid("9770306406158")
+
+
+def test_normalize_accepts_common_forms():
+    assert normalize_isbn("978-0-306-40615-7") == "9780306406157"
+    assert normalize_isbn(" 978 0306406157 ") == "9780306406157"
+    assert normalize_isbn("0-306-40615-2") == "9780306406157"
+    assert normalize_isbn("043942089x") == "9780439420891"
+    assert normalize_isbn("9780306406157.0") == "9780306406157"
+    assert normalize_isbn(9780306406157.0) == "9780306406157"
+    # An ISBN-10 whose leading zero a spreadsheet dropped
+    assert normalize_isbn(306406152) == "9780306406157"
+
+
+def test_normalize_rejects_non_isbns():
+    for value in (None, "", "hello", "9780306406158", "030640615", 9780306406157.5):
+        assert normalize_isbn(value) is None
+
+
+def test_iter_isbn_file_counts_rejects(tmp_path):
+    path = tmp_path / "isbns.csv"
+    path.write_text("Title,ISBN\n"
+                    "a,978-0-306-40615-7\n"
+                    "b,0306406152\n"
+                    "c,\n"
+                    "d,12345\n"
+                    "e,9780439420891\n", encoding="utf-8")
+    report = IsbnLoadReport()
+    assert list(iter_isbn_file(str(path), report)) == ["9780306406157", "9780439420891"]
+    assert (report.rows, report.valid, report.duplicates, report.blank, report.invalid) == (
+        5, 2, 1, 1, 1)
+    assert report.rejected_samples == ["12345"]
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from wheelers.fields import compile_fields
+from wheelers.parser import PRODUCT_URL, alternate_fields, parse_product_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "benchmarks", "fixtures")
+FIXTURE_PRICE = '<div class="price red-text bold">$29.99</div>'
+# A list price ahead of the red sale price, and no bold price div
+SALE_PRICES = '<span class="price">$39.99</span><span class="price red-text">$29.99</span>'
+URL = PRODUCT_URL + "9780300186116"
+
+
+@pytest.fixture
+def product_html():
+    with open(os.path.join(FIXTURES, "product.html"), encoding="utf-8") as f:
+        html = f.read()
+    assert FIXTURE_PRICE in html
+    return html
+
+
+def test_fixture_page(product_html):
+    page = parse_product_page(product_html, URL, compile_fields())
+    assert page["record"]["isbn"] == "9780300186116"
+    assert page["record"]["price"] == "$29.99"
+    assert alternate_fields(page)["alternate_isbn_price"] == "$29.99"
+
+
+def test_main_price_takes_the_first_span_price(product_html):
+    html = product_html.replace(FIXTURE_PRICE, SALE_PRICES)
+    page = parse_product_page(html, URL, compile_fields())
+    assert page["record"]["price"] == "$39.99"
+    # Read as another edition's alternate, the red price wins
+    assert alternate_fields(page)["alternate_isbn_price"] == "$29.99"
+
+
+def test_no_alternate_price_without_alternates(product_html):
+    html = product_html.replace(FIXTURE_PRICE, SALE_PRICES)
+    page = parse_product_page(html, URL, compile_fields(("price",)))
+    assert page["record"]["price"] == "$39.99"
+    assert "alternate_price" not in page
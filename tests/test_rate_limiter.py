@@ -0,0 +1,94 @@
+import pytest
+
+from wheelers import http_client
+from wheelers.http_client import MIN_REQUESTS_PER_SECOND, RateLimiter
+
+HOST_A = "https://a.example/product/1"
+HOST_B = "https://b.example/product/1"
+
+
+class FakeClock:
+    """time.monotonic/time.sleep stand-in that only moves when slept on"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(http_client.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_requests_to_one_host_are_spaced_by_the_rate(clock):
+    limiter = RateLimiter(4)
+    for _ in range(3):
+        limiter.wait(HOST_A)
+    assert clock.slept == [0.25, 0.25]
+
+
+def test_hosts_are_limited_separately(clock):
+    limiter = RateLimiter(1)
+    limiter.wait(HOST_A)
+    limiter.wait(HOST_B)
+    assert clock.slept == []
+    limiter.wait(HOST_A)
+    assert clock.slept == [1.0]
+
+
+def test_zero_rate_is_unlimited(clock):
+    limiter = RateLimiter(0)
+    for _ in range(5):
+        limiter.wait(HOST_A)
+    assert clock.slept == []
+
+
+def test_defer_holds_back_the_host(clock):
+    limiter = RateLimiter(0)
+    limiter.defer(HOST_A, 5)
+    limiter.wait(HOST_B)
+    assert clock.slept == []
+    limiter.wait(HOST_A)
+    assert clock.slept == [5]
+
+
+def test_congestion_halves_the_rate_at_most_once_a_second(clock):
+    limiter = RateLimiter(8)
+    limiter.feedback(HOST_A, congested=True)
+    assert limiter.rate("a.example") == 4
+    limiter.feedback(HOST_A, congested=True)
+    assert limiter.rate("a.example") == 4
+    clock.now += 1
+    limiter.feedback(HOST_A, congested=True)
+    assert limiter.rate("a.example") == 2
+    assert limiter.rate("b.example") == 8
+
+
+def test_rate_never_drops_below_the_floor(clock):
+    limiter = RateLimiter(1)
+    for _ in range(10):
+        limiter.feedback(HOST_A, congested=True)
+        clock.now += 1
+    assert limiter.rate("a.example") == MIN_REQUESTS_PER_SECOND
+
+
+def test_success_climbs_back_to_the_ceiling(clock):
+    limiter = RateLimiter(10)
+    limiter.feedback(HOST_A, congested=True)
+    assert limiter.rate("a.example") == 5
+    for _ in range(9):
+        limiter.feedback(HOST_A, congested=False)
+    assert limiter.rate("a.example") == 9.5
+    for _ in range(5):
+        limiter.feedback(HOST_A, congested=False)
+    assert limiter.rate("a.example") == 10
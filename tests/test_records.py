@@ -0,0 +1,69 @@
+from wheelers.records import INTERN_CHECK_ROWS, RecordStore
+
+FULL = {"isbn": "9780306406157", "title": "Book", "publisher": "Penguin",
+        "price": "$10.00", "page_count": 320, "scraped_at": "2026-01-01T10:30:00.123456"}
+
+
+def round_trip(records):
+    store = RecordStore(records)
+    assert len(store) == len(records)
+    assert list(store) == records
+    assert [store[i] for i in range(-len(records), 0)] == records
+    return store
+
+
+def test_plain_records_round_trip():
+    store = round_trip([FULL, dict(FULL, isbn="9780439420891", title="Other")])
+    assert store.stats()["publisher"].startswith("interned")
+    assert store.stats()["scraped_at"] == "timestamps"
+
+
+def test_interned_columns_keep_value_types():
+    records = [dict(FULL, page_count=value) for value in (1, 1.0, True, "1")]
+    stored = list(round_trip(records))
+    assert [type(record["page_count"]) for record in stored] == [int, float, bool, str]
+
+
+def test_unhashable_values_fall_back_to_plain_columns():
+    records = [FULL, dict(FULL, categories=["Fiction", "Classics"]),
+               dict(FULL, all_alternates=[{"alternate_isbn": "9781861972712"}])]
+    store = round_trip(records)
+    assert store.stats()["categories"] == "plain"
+
+
+def test_non_canonical_timestamps_are_kept_as_given():
+    records = [FULL,
+               dict(FULL, scraped_at="2026-01-01 10:30:00"),
+               dict(FULL, scraped_at="2026-01-01T10:30:00+00:00"),
+               dict(FULL, scraped_at="yesterday"),
+               dict(FULL, scraped_at=None)]
+    store = round_trip(records)
+    assert store.stats()["scraped_at"] == "plain"
+
+
+def test_missing_fields_differ_from_none():
+    records = [{"isbn": "9780306406157", "title": None},
+               {"isbn": "9780306406157"},
+               {"isbn": "9780306406157", "error": "HTTP 404", "error_class": "not_found"},
+               {}]
+    store = round_trip(records)
+    assert "title" in store[0] and "title" not in store[1]
+    assert list(store.iter_rows(("isbn", "title", "error"))) == [
+        ("9780306406157", None, None), ("9780306406157", None, None),
+        ("9780306406157", None, "HTTP 404"), (None, None, None)]
+
+
+def test_extra_keys_round_trip():
+    records = [dict(FULL, refreshed_at="2026-01-02T00:00:00", refreshed_fields="price"),
+               FULL, {"isbn": "9780439420891", "known_failure": "2026-01-01T00:00:00"}]
+    store = round_trip(records)
+    assert list(store.iter_rows(("isbn", "refreshed_fields", "known_failure"))) == [
+        ("9780306406157", "price", None), ("9780306406157", None, None),
+        ("9780439420891", None, "2026-01-01T00:00:00")]
+
+
+def test_mostly_distinct_columns_stop_interning():
+    records = [dict(FULL, title=f"Book {n}") for n in range(INTERN_CHECK_ROWS)]
+    store = round_trip(records)
+    assert store.stats()["title"] == "plain"
+    assert store.stats()["publisher"].startswith("interned")
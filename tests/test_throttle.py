@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from wheelers.throttle import (
+    AdaptiveConcurrency,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+)
+
+
+class FakeResponse:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+def test_retry_policy_backs_off_then_gives_up():
+    policy = RetryPolicy(retries=2, base_delay=1.0, max_delay=3.0)
+    for attempt in (1, 2):
+        assert 0 <= policy.delay(attempt) <= min(3.0, 2 ** attempt)
+    assert policy.delay(3) is None
+
+
+def test_retry_policy_honours_retry_after():
+    policy = RetryPolicy(max_retry_after=60)
+    assert policy.delay(1, FakeResponse({"Retry-After": "7"})) == 7
+    # Asking for longer than we are willing to wait: give up instead
+    assert policy.delay(1, FakeResponse({"Retry-After": "3600"})) is None
+
+
+def test_adaptive_concurrency_halves_and_recovers():
+    limit = AdaptiveConcurrency(8, cooldown=0)
+    limit.acquire()
+    limit.release(0.1, congested=True)
+    assert limit.limit == 4 and limit.decreases == 1
+    for _ in range(20):
+        limit.acquire()
+        limit.release(0.1, congested=False)
+    assert 4 < limit.limit <= 8
+
+
+def test_adaptive_concurrency_counts_a_burst_once():
+    limit = AdaptiveConcurrency(8, cooldown=60)
+    for _ in range(3):
+        limit.acquire()
+        limit.release(0.1, congested=True)
+    assert limit.limit == 4 and limit.decreases == 1
+
+
+def test_circuit_opens_after_threshold_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05, max_open=10)
+    for _ in range(2):
+        breaker.record(ok=False)
+    assert not breaker.is_open
+    breaker.record(ok=False)
+    assert breaker.is_open and breaker.trips == 1
+
+    # After the reset timeout one probe is let through...
+    time.sleep(0.06)
+    breaker.before_request()
+    # ...and its failure opens the circuit again without a new trip
+    breaker.record(ok=False)
+    assert breaker.is_open and breaker.trips == 1
+
+    time.sleep(0.06)
+    breaker.before_request()
+    breaker.record(ok=True)
+    assert not breaker.is_open and breaker.failures == 0
+
+
+def test_circuit_gives_up_after_max_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60, max_open=0)
+    breaker.record(ok=False)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
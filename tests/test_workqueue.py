@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from wheelers import workqueue
+from wheelers.workqueue import DONE, FAILED, LEASED, PENDING, WorkQueue, jobs_table
+
+ISBNS = ["9780306406157", "9780439420891", "9781861972712"]
+TRANSIENT_ERROR = {"error": "HTTP 503", "error_class": "transient"}
+NOT_FOUND_ERROR = {"error": "HTTP 404", "error_class": "not_found"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(workqueue, "utcnow", clock)
+    return clock
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    db_config = {"url": f"sqlite:///{tmp_path / 'jobs.sqlite'}"}
+
+    def make_queue(**options):
+        options.setdefault("lease_seconds", 1)
+        options.setdefault("retry_delay", 0)
+        return WorkQueue(db_config, name="test", **options)
+    return make_queue
+
+
+def jobs(work_queue):
+    columns = jobs_table.c
+    with work_queue.engine.connect() as conn:
+        rows = conn.execute(select(columns.isbn, columns.status, columns.attempts,
+                                   columns.lease_owner)
+                            .where(columns.queue == work_queue.name))
+        return {row.isbn: row for row in rows}
+
+
+def test_add_ignores_isbns_already_queued(clock, make_queue):
+    work_queue = make_queue()
+    assert work_queue.add(ISBNS) == 3
+    assert work_queue.add(ISBNS[:2]) == 0
+    assert work_queue.stats()[PENDING] == 3
+
+
+def test_claims_do_not_overlap(clock, make_queue):
+    work_queue = make_queue()
+    work_queue.add(ISBNS)
+    assert work_queue.claim("a", 2) == ISBNS[:2]
+    assert work_queue.claim("b", 2) == ISBNS[2:]
+    assert work_queue.claim("c", 2) == []
+    state = jobs(work_queue)
+    assert [state[isbn].lease_owner for isbn in ISBNS] == ["a", "a", "b"]
+    assert all(row.status == LEASED and row.attempts == 1 for row in state.values())
+
+
+def test_expired_lease_is_claimed_again(clock, make_queue):
+    work_queue = make_queue()
+    work_queue.add(ISBNS[:1])
+    assert work_queue.claim("a", 1) == ISBNS[:1]
+    clock.advance(0.5)
+    assert work_queue.claim("b", 1) == []
+    clock.advance(1)
+    assert work_queue.stats()["expired_leases"] == 1
+    assert work_queue.claim("b", 1) == ISBNS[:1]
+    row = jobs(work_queue)[ISBNS[0]]
+    assert (row.lease_owner, row.attempts) == ("b", 2)
+
+
+def test_heartbeat_keeps_the_lease(clock, make_queue):
+    work_queue = make_queue()
+    work_queue.add(ISBNS[:2])
+    work_queue.claim("a", 2)
+    for _ in range(3):
+        clock.advance(0.8)
+        assert work_queue.heartbeat("a") == 2
+    assert work_queue.claim("b", 2) == []
+    assert work_queue.heartbeat("b") == 0
+
+
+def test_stale_owner_cannot_finish(clock, make_queue):
+    work_queue = make_queue()
+    work_queue.add(ISBNS[:1])
+    work_queue.claim("a", 1)
+    clock.advance(2)
+    work_queue.claim("b", 1)
+    assert work_queue.finish("a", [(ISBNS[0], {"isbn": ISBNS[0]})]) == 1
+    assert jobs(work_queue)[ISBNS[0]].status == LEASED
+    assert work_queue.finish("b", [(ISBNS[0], {"isbn": ISBNS[0]})]) == 0
+    row = jobs(work_queue)[ISBNS[0]]
+    assert (row.status, row.lease_owner) == (DONE, None)
+
+
+def test_failures_are_retried_until_max_attempts(clock, make_queue):
+    work_queue = make_queue(max_attempts=2)
+    work_queue.add(ISBNS[:1])
+    work_queue.claim("a", 1)
+    assert work_queue.finish("a", [(ISBNS[0], TRANSIENT_ERROR)]) == 0
+    assert jobs(work_queue)[ISBNS[0]].status == PENDING
+    clock.advance(1)
+    assert work_queue.claim("a", 1) == ISBNS[:1]
+    work_queue.finish("a", [(ISBNS[0], TRANSIENT_ERROR)])
+    assert jobs(work_queue)[ISBNS[0]].status == FAILED
+
+    assert work_queue.retry_failed() == 1
+    row = jobs(work_queue)[ISBNS[0]]
+    assert (row.status, row.attempts) == (PENDING, 0)
+
+
+def test_permanent_failures_are_not_retried(clock, make_queue):
+    work_queue = make_queue(max_attempts=5)
+    work_queue.add(ISBNS[:1])
+    work_queue.claim("a", 1)
+    work_queue.finish("a", [(ISBNS[0], NOT_FOUND_ERROR)])
+    assert jobs(work_queue)[ISBNS[0]].status == FAILED
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_job(clock, make_queue):
+    work_queue = make_queue(max_attempts=2)
+    work_queue.add(ISBNS[:1])
+    for owner in ("a", "b"):
+        assert work_queue.claim(owner, 1) == ISBNS[:1]
+        clock.advance(2)
+    assert work_queue.claim("c", 1) == []
+    row = jobs(work_queue)[ISBNS[0]]
+    assert (row.status, row.attempts, row.lease_owner) == (FAILED, 2, None)
+
+
+def test_release_does_not_count_the_attempt(clock, make_queue):
+    work_queue = make_queue()
+    work_queue.add(ISBNS)
+    work_queue.claim("a", 3)
+    assert work_queue.release("a", ISBNS[:2]) == 2
+    state = jobs(work_queue)
+    assert [(state[isbn].status, state[isbn].attempts) for isbn in ISBNS] == [
+        (PENDING, 0), (PENDING, 0), (LEASED, 1)]
+    assert work_queue.outstanding() == 3
+    assert work_queue.outstanding(exclude_owner="a") == 2
+    assert work_queue.claim("b", 3) == ISBNS[:2]
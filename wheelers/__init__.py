@@ -0,0 +1,10 @@
+"""Scraping core for Wheeler's Books product pages, usable without the GUI"""
+__all__ = ["WheelersScraper"]
+
+
+def __getattr__(name):
+    # Imported on first use, so `import wheelers.x` doesn't load the whole scraper
+    if name == "WheelersScraper":
+        from .core import WheelersScraper
+        return WheelersScraper
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,142 @@
+"""Content hashes of stored records, to tell new and changed records from unchanged ones"""
+import os
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+from .records import RECORD_FIELDS
+
+# Fields that say when a record was fetched rather than what the book is
+UNHASHED_FIELDS = ("isbn", "scraped_at")
+HASHED_FIELDS = tuple(name for name in RECORD_FIELDS if name not in UNHASHED_FIELDS)
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+_SIDECAR_MAGIC = b"WHIDX001"
+_ABSENT = object()
+
+
+def _int64(digest):
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def content_hash(record):
+    """64-bit hash over the meaningful fields of a full record.
+
+    A field the record does not have hashes differently from one set to
+    None, since only the fields present are written to the database.
+    """
+    h = blake2b(digest_size=8)
+    for name in HASHED_FIELDS:
+        value = record.get(name, _ABSENT)
+        if value is _ABSENT:
+            h.update(b"\xff\xff\xff\xfe")
+        elif value is None:
+            h.update(b"\xff\xff\xff\xff")
+        else:
+            data = str(value).encode("utf-8", "surrogatepass")
+            h.update(len(data).to_bytes(4, "big"))
+            h.update(data)
+    return _int64(h.digest())
+
+
+def isbn_key(isbn):
+    """int64 key for an ISBN in the index"""
+    # All-digit ISBNs are their own number (with the length, for leading
+    # zeros); anything else gets a negative hash, so the two never collide
+    isbn = str(isbn)
+    if isbn.isascii() and isbn.isdigit() and len(isbn) <= 17:
+        return int(isbn) << 4 | len(isbn)
+    return -1 - (_int64(blake2b(isbn.encode(), digest_size=8).digest()) & 0x7FFFFFFFFFFFFFFF)
+
+
+class HashIndex:
+    """isbn -> content hash of its stored record, in 16 bytes per ISBN.
+
+    The hashes loaded at the start of a run are kept in two int64 arrays
+    sorted by isbn_key and searched with bisect; hashes written during the
+    run go to a small dict on top. A hash of None means the stored row is in
+    an unknown state, e.g. after only some of its fields were updated, and
+    always counts as changed.
+    """
+
+    def __init__(self, keys=None, hashes=None):
+        self._keys = keys if keys is not None else array("q")
+        self._hashes = hashes if hashes is not None else array("q")
+        self._updates = {}
+
+    @classmethod
+    def build(cls, pairs):
+        """Index from (isbn, hash) pairs in any order"""
+        keys = array("q")
+        hashes = array("q")
+        for isbn, value in pairs:
+            keys.append(isbn_key(isbn))
+            hashes.append(value)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return cls(array("q", (keys[i] for i in order)), array("q", (hashes[i] for i in order)))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _loaded(self, key):
+        i = bisect_left(self._keys, key)
+        return i if i < len(self._keys) and self._keys[i] == key else None
+
+    def lookup(self, isbn):
+        """(known, hash): whether isbn has a stored record and its hash (None if unknown)"""
+        key = isbn_key(isbn)
+        if key in self._updates:
+            return True, self._updates[key]
+        i = self._loaded(key)
+        return (False, None) if i is None else (True, self._hashes[i])
+
+    def check(self, isbn, value):
+        """NEW, CHANGED or UNCHANGED for a record hashing to value, remembering value"""
+        known, stored = self.lookup(isbn)
+        self._updates[isbn_key(isbn)] = value
+        if not known:
+            return NEW
+        if value is None or stored is None or value != stored:
+            return CHANGED
+        return UNCHANGED
+
+    def remember(self, isbn, value):
+        """Record value as the hash of isbn's stored row"""
+        self._updates[isbn_key(isbn)] = value
+
+    def forget(self, isbn):
+        """Mark isbn's stored row as unknown, e.g. when writing it failed"""
+        self._updates[isbn_key(isbn)] = None
+
+    def save(self, path):
+        """Write the index, including this run's hashes, to a sidecar file"""
+        merged = dict(zip(self._keys, self._hashes))
+        merged.update(self._updates)
+        keys = array("q", sorted(key for key, value in merged.items() if value is not None))
+        hashes = array("q", (merged[key] for key in keys))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_SIDECAR_MAGIC)
+            f.write(len(keys).to_bytes(8, "little"))
+            keys.tofile(f)
+            hashes.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Index saved by save(), raising ValueError for anything else"""
+        with open(path, "rb") as f:
+            if f.read(len(_SIDECAR_MAGIC)) != _SIDECAR_MAGIC:
+                raise ValueError(f"{path} is not a hash index")
+            count = int.from_bytes(f.read(8), "little")
+            keys = array("q")
+            hashes = array("q")
+            data = f.read()
+        if len(data) != 2 * count * keys.itemsize:
+            raise ValueError(f"{path} is truncated")
+        keys.frombytes(data[:count * keys.itemsize])
+        hashes.frombytes(data[count * keys.itemsize:])
+        return cls(keys, hashes)
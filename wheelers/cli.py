@@ -0,0 +1,546 @@
+"""Headless command line entry point: python -m wheelers scrape ISBNS.csv"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from .defaults import (
+    CACHE_FILE,
+    CRAWL_STATE_FILE,
+    DEFAULT_CACHE_TTL_HOURS,
+    DEFAULT_CLAIM_BATCH,
+    DEFAULT_CRAWL_DEPTH,
+    DEFAULT_CRAWL_PAGES,
+    DEFAULT_IMAGE_WORKERS,
+    DEFAULT_LEASE_SECONDS,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_QUEUE,
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_WORKERS,
+    NEGATIVE_CACHE_FILE,
+    NEGATIVE_CACHE_TTL_HOURS,
+)
+from .failures import parse_ttl
+from .fields import parse_field_list
+from .isbns import IsbnLoadReport, iter_isbn_file
+from .journal import (
+    RunJournal,
+    completed_isbns,
+    iter_latest,
+    iter_records,
+    journal_path_for,
+    skip_completed,
+)
+from .metrics import RunMetrics
+from .refresh import (
+    DEFAULT_MAX_AGE_HOURS,
+    VOLATILE_FIELDS,
+    DatabaseTimestamps,
+    JournalTimestamps,
+    RefreshPlan,
+)
+
+
+def negative_ttl(value):
+    try:
+        return parse_ttl(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def field_list(value):
+    try:
+        return parse_field_list(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_change_options(command):
+    """Options for how records are written to the database"""
+    command.add_argument("--write-unchanged", action="store_true",
+                         help="upsert every record, even ones identical to their stored row")
+    command.add_argument("--hash-index", metavar="FILE",
+                         help="keep the stored records' content hashes in FILE between runs "
+                              "instead of reading them from the table (only if nothing "
+                              "else writes to it)")
+    command.add_argument("--change-log", action="store_true",
+                         help="record which fields of each new or changed record changed "
+                              "in the wheelers_book_changes table")
+
+
+def add_scraper_options(command):
+    """Options shared by every command that runs the scraper"""
+    command.add_argument("-o", "--output", default="-",
+                         help="JSONL output file (default: stdout)")
+    command.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                         help=f"concurrent ISBN fetches (default: {DEFAULT_WORKERS})")
+    command.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                         help="max requests per second per host, 0 = unlimited "
+                              f"(default: {DEFAULT_REQUESTS_PER_SECOND})")
+    command.add_argument("--images", metavar="DIR",
+                         help="download cover images into DIR")
+    command.add_argument("--image-workers", type=int, default=DEFAULT_IMAGE_WORKERS,
+                         help=f"concurrent image downloads (default: {DEFAULT_IMAGE_WORKERS})")
+    command.add_argument("--thumbnails", type=int, metavar="SIZE",
+                         help="also write SIZE px thumbnails to DIR/thumbnails")
+    command.add_argument("--placeholder", metavar="FILE", action="append", default=[],
+                         help="treat covers identical to this image as missing (repeatable)")
+    command.add_argument("--all-alternates", action="store_true",
+                         help="fetch every alternate format, not just the first")
+    command.add_argument("--only", type=field_list, metavar="FIELD,...",
+                         help="scrape only these record fields; alternate-format pages are "
+                              "fetched only for alternate_* fields (default: every field)")
+    command.add_argument("--parse-workers", type=int, default=0,
+                         help="parse pages in N worker processes, 0 = in the fetch threads "
+                              "(default: 0)")
+    command.add_argument("--save-db", action="store_true",
+                         help="also upsert records into the MySQL table from --db-config")
+    command.add_argument("--db-config", default="db_config.json",
+                         help="database settings file (default: db_config.json)")
+    add_change_options(command)
+    command.add_argument("--no-cache", action="store_true",
+                         help="do not use the on-disk page cache")
+    command.add_argument("--cache-file", default=CACHE_FILE,
+                         help=f"page cache location (default: {CACHE_FILE})")
+    command.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL_HOURS,
+                         help="hours before cached pages are revalidated "
+                              f"(default: {DEFAULT_CACHE_TTL_HOURS})")
+    command.add_argument("--no-negative-cache", action="store_true",
+                         help="fetch every ISBN, even ones that failed recently")
+    command.add_argument("--negative-cache", default=NEGATIVE_CACHE_FILE, metavar="FILE",
+                         help="where recent failures are remembered "
+                              f"(default: {NEGATIVE_CACHE_FILE})")
+    command.add_argument("--negative-ttl", type=negative_ttl, action="append", default=[],
+                         metavar="CLASS=HOURS",
+                         help="hours a failure of CLASS is remembered, 0 = never (repeatable; "
+                              "default: " + ", ".join(f"{error_class}={hours:g}" for
+                                                      error_class, hours
+                                                      in NEGATIVE_CACHE_TTL_HOURS.items())
+                              + ")")
+    command.add_argument("--failures", metavar="FILE",
+                         help="write every failed ISBN with its error class to a CSV file")
+    command.add_argument("--summary", metavar="FILE",
+                         help="also write the JSON run summary to FILE")
+    command.add_argument("--metrics", metavar="PREFIX",
+                         help="write per-stage timings to PREFIX.prom (Prometheus text), "
+                              "PREFIX.json and PREFIX.isbns.jsonl (one line per ISBN)")
+    command.add_argument("--profile", metavar="FILE",
+                         help="profile the run: cProfile stats for FILE.prof/.pstats, "
+                              "otherwise sampled collapsed stacks (flame graph input)")
+    command.add_argument("--product-url", metavar="URL",
+                         help="base URL of product pages, e.g. a local stand-in site "
+                              "(default: the live site)")
+    command.add_argument("-q", "--quiet", action="store_true",
+                         help="only print the summary on stderr")
+
+
+def add_queue_options(command):
+    command.add_argument("--queue-db", default="db_config.json",
+                         help="database holding the queue: a db_config.json file or a "
+                              "SQLAlchemy URL such as sqlite:////shared/jobs.sqlite "
+                              "(default: db_config.json)")
+    command.add_argument("--queue", default=DEFAULT_QUEUE,
+                         help=f"queue name, so several jobs can share a database "
+                              f"(default: {DEFAULT_QUEUE})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m wheelers",
+        description="Scrape Wheeler's Books product data without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser(
+        "scrape", help="scrape the ISBNs in a CSV/Excel file, one JSON record per line")
+    scrape.add_argument("input", help="CSV or Excel file containing ISBNs")
+    scrape.add_argument("--journal", metavar="FILE",
+                        help="crash-safe run journal (default: INPUT.journal.jsonl)")
+    scrape.add_argument("--no-journal", action="store_true",
+                        help="do not write a run journal")
+    scrape.add_argument("--resume", action="store_true",
+                        help="skip ISBNs that already have a successful record in the journal")
+    scrape.add_argument("--refresh-from", choices=("db", "journal"),
+                        help="incremental refresh: skip ISBNs whose record in the database "
+                             "(--db-config) or the run journal is still fresh")
+    scrape.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE_HOURS, metavar="HOURS",
+                        help="with --refresh-from, re-scrape records older than HOURS "
+                             f"(default: {DEFAULT_MAX_AGE_HOURS})")
+    scrape.add_argument("--fields", type=field_list, default=",".join(VOLATILE_FIELDS),
+                        metavar="FIELD,...",
+                        help="with --fields-max-age, fields refreshed on their own schedule "
+                             f"(default: {','.join(VOLATILE_FIELDS)})")
+    scrape.add_argument("--fields-max-age", type=float, metavar="HOURS",
+                        help="with --refresh-from, refresh only --fields of records whose "
+                             "fields are older than HOURS (no alternates or images fetched)")
+    add_scraper_options(scrape)
+
+    work = commands.add_parser(
+        "work", help="scrape ISBNs claimed from a shared work queue until it is finished")
+    add_queue_options(work)
+    work.add_argument("--batch-size", type=int, default=DEFAULT_CLAIM_BATCH,
+                      help=f"ISBNs claimed at a time (default: {DEFAULT_CLAIM_BATCH})")
+    work.add_argument("--lease", type=int, default=DEFAULT_LEASE_SECONDS, metavar="SECONDS",
+                      help="lease length; leases of a worker that stops renewing them are "
+                           f"reclaimed after this long (default: {DEFAULT_LEASE_SECONDS})")
+    work.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                      help="attempts before a job is marked failed "
+                           f"(default: {DEFAULT_MAX_ATTEMPTS})")
+    work.add_argument("--wait", action="store_true",
+                      help="keep polling for new jobs instead of exiting when the queue is done")
+    work.add_argument("--journal", metavar="FILE",
+                      help="also append this worker's records to a run journal")
+    add_scraper_options(work)
+
+    crawl = commands.add_parser(
+        "crawl", help="discover ISBNs from category or product pages and scrape them")
+    crawl.add_argument("seeds", nargs="*", metavar="URL",
+                       help="category or product URLs, or site paths such as /category/history, "
+                            "to start from (none: carry on with the saved crawl)")
+    crawl.add_argument("--state", default=CRAWL_STATE_FILE, metavar="FILE",
+                       help="frontier and seen pages, kept between runs "
+                            f"(default: {CRAWL_STATE_FILE})")
+    crawl.add_argument("--max-depth", type=int, default=DEFAULT_CRAWL_DEPTH,
+                       help="levels of linked categories visited beyond the seeds, 0 = only "
+                            "the seeds' own pages and products (default: "
+                            f"{DEFAULT_CRAWL_DEPTH})")
+    crawl.add_argument("--max-pages", type=int, default=DEFAULT_CRAWL_PAGES,
+                       help="category pages and products visited in this run "
+                            f"(default: {DEFAULT_CRAWL_PAGES})")
+    crawl.add_argument("--fresh", action="store_true",
+                       help="forget the saved frontier and seen pages before starting")
+    crawl.add_argument("--journal", metavar="FILE",
+                       help="also append the records to a run journal")
+    add_scraper_options(crawl)
+
+    work_queue = commands.add_parser(
+        "queue", help="add ISBNs to a shared work queue, show its progress or retry failures")
+    work_queue.add_argument("action", choices=("add", "status", "retry-failed"))
+    work_queue.add_argument("input", nargs="?",
+                            help="with add: CSV or Excel file containing ISBNs")
+    add_queue_options(work_queue)
+
+    export = commands.add_parser(
+        "export", help="export the records in a run journal to CSV, Excel or Parquet")
+    export.add_argument("journal", help="run journal (.journal.jsonl)")
+    export.add_argument("output", help="output file: .csv, .xlsx or .parquet")
+
+    load_db = commands.add_parser(
+        "load-db", help="upsert the records in a run journal into MySQL")
+    load_db.add_argument("journal", help="run journal (.journal.jsonl)")
+    load_db.add_argument("--db-config", default="db_config.json",
+                         help="database settings file (default: db_config.json)")
+    add_change_options(load_db)
+    return parser
+
+
+def stderr_logger(quiet):
+    def log(message):
+        if not quiet:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+    return log
+
+
+def open_db_writer(args, log, metrics=None):
+    from .db import DatabaseWriter
+
+    with open(args.db_config) as f:
+        db_config = json.load(f)
+    return DatabaseWriter(db_config, skip_unchanged=not args.write_unchanged,
+                          hash_index_file=args.hash_index, change_log=args.change_log,
+                          metrics=metrics, log=log)
+
+
+def start_profiling(args):
+    if not args.profile:
+        return None
+    from .profiling import start_profiler
+    return start_profiler(args.profile)
+
+
+def build_scraper(args, log, metrics, journal=None, db_writer=None, refresh=None, crawl=None):
+    # Deferred so that --help and the queue commands never load requests and bs4
+    from .core import WheelersScraper
+    from .failures import FailureReport, NegativeCache
+    from .http_client import ResponseCache
+    from .parser import PRODUCT_URL
+
+    cache = None if args.no_cache else ResponseCache(args.cache_file, ttl_hours=args.cache_ttl)
+    negative_cache = None
+    if not args.no_negative_cache:
+        negative_cache = NegativeCache(args.negative_cache,
+                                       ttl_hours=dict(args.negative_ttl))
+    return WheelersScraper(
+        workers=args.workers,
+        requests_per_second=args.rps,
+        download_images=bool(args.images),
+        images_folder=args.images or "book_images",
+        image_workers=args.image_workers,
+        thumbnail_size=args.thumbnails,
+        placeholder_images=args.placeholder,
+        fetch_all_alternates=args.all_alternates,
+        parse_workers=args.parse_workers,
+        cache=cache,
+        journal=journal,
+        db_writer=db_writer,
+        refresh=refresh,
+        negative_cache=negative_cache,
+        failure_report=FailureReport(args.failures),
+        crawl=crawl,
+        fields=args.only,
+        log=log,
+        metrics=metrics,
+        product_url=args.product_url or PRODUCT_URL,
+    )
+
+
+def write_records(scraper, isbns, out, log, on_record=None):
+    """Scrape isbns, writing one JSON line per record to out"""
+    for isbn, record in scraper.scrape(isbns):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if on_record is not None:
+            on_record(isbn, record)
+        if 'known_failure' in record:
+            log(f"Skipped ISBN {isbn}, failed at {record['known_failure']}: {record['error']}")
+        elif 'error' in record:
+            log(f"Error for ISBN {isbn}: {record['error']}")
+        elif 'refreshed_fields' in record:
+            log(f"Refreshed {record['refreshed_fields']}: {isbn}")
+        else:
+            log(f"Successfully scraped: {record.get('title')}")
+
+
+def finish_run(args, summary, metrics, profiler, log):
+    """Print the run summary and write the optional summary, metrics and profile files"""
+    summary_json = json.dumps(summary)
+    print(summary_json, file=sys.stderr, flush=True)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            f.write(summary_json + "\n")
+    if args.metrics:
+        for path in metrics.write(args.metrics, summary):
+            log(f"Metrics written to {path}")
+    if profiler is not None:
+        profiler.stop()
+        profiler.write(args.profile)
+        log(f"Profile written to {args.profile}")
+
+
+def run_scrape(args):
+    log = stderr_logger(args.quiet)
+    started = time.monotonic()
+    profiler = start_profiling(args)
+    metrics = RunMetrics(isbn_log=f"{args.metrics}.isbns.jsonl" if args.metrics else None)
+
+    # ISBNs are read, validated and de-duplicated lazily as the scrape consumes them
+    load_report = IsbnLoadReport()
+    isbns = iter_isbn_file(args.input, load_report)
+
+    journal = None
+    resume = {"skipped": 0}
+    journal_path = args.journal or journal_path_for(args.input)
+    refresh = None
+    if args.refresh_from:
+        if args.refresh_from == "db":
+            with open(args.db_config) as f:
+                timestamps = DatabaseTimestamps(json.load(f))
+        else:
+            timestamps = JournalTimestamps(journal_path)
+        refresh = RefreshPlan(timestamps, max_age_hours=args.max_age, fields=args.fields,
+                              fields_max_age_hours=args.fields_max_age)
+        isbns = refresh.filter(isbns)
+
+    if not args.no_journal:
+        if args.resume:
+            isbns = skip_completed(isbns, completed_isbns(journal_path), resume)
+        journal = RunJournal(journal_path)
+        log(f"Journal: {journal_path}")
+    elif args.resume:
+        log("--resume needs a journal, ignoring it")
+
+    db_writer = open_db_writer(args, log, metrics) if args.save_db else None
+    scraper = build_scraper(args, log, metrics, journal=journal, db_writer=db_writer,
+                            refresh=refresh)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        write_records(scraper, isbns, out, log)
+    except KeyboardInterrupt:
+        scraper.stop()
+        log("Interrupted, stopping")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        log(f"{args.input}: {load_report.describe()}")
+        if resume["skipped"]:
+            log(f"Resumed: skipped {resume['skipped']} ISBNs already in the journal")
+        if refresh is not None:
+            log(refresh.describe())
+        scraper.log_summary()
+        scraper.close()
+
+    summary = {
+        "input": args.input,
+        "output": args.output,
+        "isbns": load_report.valid,
+        "input_rows": load_report.as_dict(),
+        "resumed_skipped": resume["skipped"],
+        **({"refresh": refresh.as_dict()} if refresh is not None else {}),
+        **scraper.summary(),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+    finish_run(args, summary, metrics, profiler, log)
+    return 130 if scraper.stopped else 0
+
+
+def run_crawl(args):
+    from .crawl import Crawl
+
+    log = stderr_logger(args.quiet)
+    started = time.monotonic()
+    profiler = start_profiling(args)
+    metrics = RunMetrics(isbn_log=f"{args.metrics}.isbns.jsonl" if args.metrics else None)
+
+    crawl = Crawl(args.state, max_depth=args.max_depth, max_pages=args.max_pages,
+                  fresh=args.fresh, log=log)
+    journal = RunJournal(args.journal) if args.journal else None
+    db_writer = open_db_writer(args, log, metrics) if args.save_db else None
+    scraper = build_scraper(args, log, metrics, journal=journal, db_writer=db_writer,
+                            crawl=crawl)
+    crawl.add_seeds(args.seeds, scraper.product_url)
+    log(f"Crawl state: {args.state}")
+
+    # Appended to, as a crawl can be carried on over several runs
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        isbns = crawl.isbns(scraper.http, stopped=lambda: scraper.stopped)
+        write_records(scraper, isbns, out, log, on_record=crawl.record)
+    except KeyboardInterrupt:
+        scraper.stop()
+        log("Interrupted, stopping")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        log(crawl.describe())
+        scraper.log_summary()
+        scraper.close()
+        crawl_stats = crawl.stats()
+        crawl.close()
+
+    summary = {
+        "output": args.output,
+        "crawl": crawl_stats,
+        **scraper.summary(),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+    finish_run(args, summary, metrics, profiler, log)
+    return 130 if scraper.stopped else 0
+
+
+def open_work_queue(args):
+    from .workqueue import WorkQueue, queue_db_config
+
+    return WorkQueue(queue_db_config(args.queue_db), name=args.queue,
+                     lease_seconds=getattr(args, "lease", DEFAULT_LEASE_SECONDS),
+                     max_attempts=getattr(args, "max_attempts", DEFAULT_MAX_ATTEMPTS))
+
+
+def run_work(args):
+    from .workqueue import QueueWorker
+
+    log = stderr_logger(args.quiet)
+    started = time.monotonic()
+    profiler = start_profiling(args)
+    metrics = RunMetrics(isbn_log=f"{args.metrics}.isbns.jsonl" if args.metrics else None)
+
+    worker = QueueWorker(open_work_queue(args), batch_size=args.batch_size, wait=args.wait,
+                         log=log)
+    log(f"Worker {worker.owner} on queue {args.queue!r}")
+    journal = RunJournal(args.journal) if args.journal else None
+    db_writer = open_db_writer(args, log, metrics) if args.save_db else None
+    scraper = build_scraper(args, log, metrics, journal=journal, db_writer=db_writer)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        while not scraper.stopped:
+            batch = worker.claim()
+            if batch:
+                write_records(scraper, worker.isbns(batch), out, log, on_record=worker.record)
+            elif not worker.idle():
+                break
+    except KeyboardInterrupt:
+        scraper.stop()
+        log("Interrupted, stopping")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        worker.close()
+        scraper.log_summary()
+        scraper.close()
+
+    summary = {
+        "output": args.output,
+        **worker.stats(),
+        "queue_status": worker.queue.stats(),
+        **scraper.summary(),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+    finish_run(args, summary, metrics, profiler, log)
+    return 130 if scraper.stopped else 0
+
+
+def run_queue(args):
+    work_queue = open_work_queue(args)
+    result = {}
+    if args.action == "add":
+        if not args.input:
+            print("queue add needs an input file", file=sys.stderr)
+            return 2
+        load_report = IsbnLoadReport()
+        result["added"] = work_queue.add(iter_isbn_file(args.input, load_report))
+        result["input_rows"] = load_report.as_dict()
+    elif args.action == "retry-failed":
+        result["requeued"] = work_queue.retry_failed()
+    result.update(work_queue.stats())
+    print(json.dumps(result))
+    return 0
+
+
+def run_export(args):
+    from .export import export_records
+
+    log = stderr_logger(False)
+    count = export_records(iter_records(args.journal), args.output,
+                           progress=lambda n: log(f"Exported {n} records"))
+    print(json.dumps({"journal": args.journal, "output": args.output, "records": count}),
+          file=sys.stderr)
+    return 0
+
+
+def run_load_db(args):
+    log = stderr_logger(False)
+    db_writer = open_db_writer(args, log)
+    for isbn, record in iter_latest(args.journal, include_partial=True):
+        db_writer.put(isbn, record)
+    db_writer.close()
+    print(json.dumps({"journal": args.journal, "database": db_writer.stats()}), file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "scrape":
+        return run_scrape(args)
+    if args.command == "crawl":
+        return run_crawl(args)
+    if args.command == "work":
+        return run_work(args)
+    if args.command == "queue":
+        return run_queue(args)
+    if args.command == "export":
+        return run_export(args)
+    if args.command == "load-db":
+        return run_load_db(args)
+    return 2
@@ -0,0 +1,410 @@
+"""Scraping pipeline shared by the GUI and the command line"""
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .defaults import DEFAULT_IMAGE_WORKERS, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_WORKERS
+from .failures import (
+    NOT_FOUND,
+    PARSE_FAILURE,
+    TRANSIENT,
+    FailureReport,
+    classify_status,
+    error_record,
+    page_error,
+)
+from .fields import compile_fields
+from .http_client import HttpSession, RateLimiter
+from .metrics import RunMetrics
+from .parser import (
+    PRODUCT_URL,
+    alternate_fields,
+    parse_product_bytes,
+    parse_product_page,
+    product_key,
+)
+from .records import EMPTY_ALTERNATE
+
+MEMO_MAX_ENTRIES = 20000
+
+
+def ordered_map(executor, func, items, window, keep_going=lambda: True):
+    """Run func over items on executor, yielding (item, result) in input order.
+
+    At most `window` calls are queued or running at any time, so large inputs
+    are never submitted all at once. When keep_going() returns False the
+    queued calls are cancelled and iteration stops.
+    """
+    pending = deque()
+    items = iter(items)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window and keep_going():
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((item, executor.submit(func, item)))
+
+            if not pending or not keep_going():
+                return
+
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        # Runs on stop and when the consumer abandons the generator
+        for _, future in pending:
+            future.cancel()
+
+
+def refreshed_fields(record, fields):
+    """Partial record carrying only the refreshed fields of a fresh product page"""
+    partial = {"isbn": record["isbn"]}
+    partial.update((field, record.get(field)) for field in fields)
+    partial["refreshed_at"] = record["scraped_at"]
+    partial["refreshed_fields"] = ",".join(fields)
+    return partial
+
+
+class ProductMemo:
+    """Run-wide memo of parsed product pages shared by all worker threads.
+
+    Concurrent requests for the same key wait for the single in-flight load
+    instead of fetching the page again. Failed loads are forgotten so they
+    can be retried; the oldest entries are dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries=MEMO_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._entries[key] = Future()
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        if owner:
+            try:
+                future.set_result(loader())
+            except BaseException as exc:
+                with self._lock:
+                    if self._entries.get(key) is future:
+                        del self._entries[key]
+                future.set_exception(exc)
+        return future.result()
+
+
+class WheelersScraper:
+    """Fetches and parses books for a list of ISBNs.
+
+    The scraper has no UI of its own: progress goes through the `log`
+    callback and results are yielded from scrape() in input order, so the
+    GUI, the command line and other scripts can all drive it.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 download_images=False, images_folder="book_images",
+                 image_workers=DEFAULT_IMAGE_WORKERS, thumbnail_size=None, placeholder_images=(),
+                 fetch_all_alternates=False, parse_workers=0, cache=None, journal=None,
+                 db_writer=None, refresh=None, negative_cache=None, failure_report=None,
+                 crawl=None, fields=None, log=None, metrics=None, product_url=PRODUCT_URL):
+        self.workers = max(1, workers)
+        self.download_images = download_images
+        self.images_folder = images_folder
+        self.fetch_all_alternates = fetch_all_alternates
+        self.product_url = product_url
+        self.product_path = urlsplit(product_url).path
+        self.journal = journal
+        self.db_writer = db_writer
+        self.refresh = refresh
+        self.negative_cache = negative_cache
+        # Told about every product page, so a crawl can follow its links
+        self.crawl = crawl
+        self.failures = failure_report or FailureReport()
+        # Only the requested fields (None for all) are fetched and parsed;
+        # option-only fields come along when their option is on
+        if fields is not None:
+            fields = set(fields)
+            if download_images:
+                fields.add("local_image_path")
+            if fetch_all_alternates:
+                fields.add("all_alternates")
+            if refresh is not None:
+                fields.update(refresh.fields)
+        self.plan = compile_fields(fields, links=crawl is not None)
+        self.log = log or (lambda message: None)
+        self.metrics = metrics or RunMetrics()
+        self.image_workers = image_workers if download_images else 0
+        self.http = HttpSession(pool_size=self.workers + self.image_workers,
+                                rate_limiter=RateLimiter(requests_per_second),
+                                cache=cache, metrics=self.metrics)
+        self.images = None
+        if download_images:
+            # Pillow is only loaded when covers are downloaded
+            from .images import ImageDownloader
+
+            self.images = ImageDownloader(self.http, images_folder, workers=image_workers,
+                                          thumbnail_size=thumbnail_size,
+                                          placeholders=placeholder_images,
+                                          metrics=self.metrics, log=self.log)
+        self.memo = ProductMemo()
+        # Parsing is CPU-bound; with parse_workers it runs in other processes
+        # while the network I/O stays on this process's threads
+        self.parse_workers = max(0, parse_workers)
+        self.parse_pool = None
+        if self.parse_workers:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self.processed = 0
+        self.errors = 0
+        self.images_downloaded = 0
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Ask a running scrape() to stop after the records already yielded"""
+        self._stop.set()
+        self.http.abort()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def fetch_product(self, url):
+        """Fetch and parse one product page (memo loader)"""
+        with self.metrics.timer("page_fetch"):
+            res = self.http.get_page(url)
+        if res.status_code != 200:
+            return page_error(classify_status(res.status_code), f"HTTP {res.status_code}")
+        if res.url != url and not urlsplit(res.url).path.startswith(self.product_path):
+            # Unknown products are redirected to search or the home page
+            return page_error(NOT_FOUND, f"Redirected to {res.url}")
+        try:
+            with self.metrics.timer("parse"):
+                if self.parse_pool is not None:
+                    page = self.parse_pool.submit(
+                        parse_product_bytes, res.content, res.encoding, url,
+                        self.plan.requested, self.plan.links).result()
+                else:
+                    page = parse_product_page(res.text, url, self.plan)
+        except Exception as exc:
+            return page_error(PARSE_FAILURE, f"{type(exc).__name__}: {exc}")
+        if not page["record"]["isbn"] and not page["record"].get("title"):
+            return page_error(PARSE_FAILURE, "No book details found on the page")
+        return page
+
+    def get_product(self, url):
+        """Parsed product page for url, fetched at most once per run"""
+        return self.memo.get(product_key(url), lambda: self.fetch_product(url))
+
+    def get_alternate_data(self, page):
+        """Alternate format data for a parsed page, fetched lazily.
+
+        Stops at the first usable alternate unless fetch_all_alternates is set.
+        """
+        alternate_data = []
+        for href in page["alt_links"]:
+            try:
+                alt_page = self.get_product(href)
+            except Exception:
+                continue
+            if "error" in alt_page:
+                continue
+            alternate_data.append(alternate_fields(alt_page))
+            if not self.fetch_all_alternates:
+                break
+        return alternate_data
+
+    def scrape_book(self, isbn):
+        """Scrape the metadata for isbn, queueing its cover image separately.
+
+        Returns (record, image future or None) so page scraping never waits
+        on the image download.
+        """
+        try:
+            with self.metrics.track(isbn), self.metrics.timer("isbn"):
+                return self._scrape_book(isbn)
+        finally:
+            if self.crawl is not None:
+                self.crawl.finished(isbn)
+
+    def _scrape_book(self, isbn):
+        url = self.product_url + isbn
+
+        if self.negative_cache is not None:
+            known = self.negative_cache.lookup(isbn)
+            if known is not None:
+                self.metrics.event("known_failures_skipped")
+                return known, None
+
+        try:
+            page = self.get_product(url)
+            if "error" in page:
+                return error_record(isbn, page["error_class"], page["error"]), None
+            if self.crawl is not None:
+                self.crawl.discover(isbn, page, url)
+
+            fields = self.refresh.fields_for(isbn) if self.refresh is not None else None
+            if fields:
+                return refreshed_fields(page["record"], fields), None
+
+            # Pages are shared through the memo, so work on a copy
+            book_data = dict(page["record"])
+
+            # Queue the image download if option is enabled
+            image_job = None
+            if self.images is not None and book_data["image_url"]:
+                image_job = self.images.submit(isbn, book_data["image_url"])
+
+            # Extract alternate formats
+            if self.plan.alternates:
+                with self.metrics.timer("alternates"):
+                    alternates = self.get_alternate_data(page)
+
+                # Flatten alternates into the main book data (takes first alternate only)
+                book_data.update(alternates[0] if alternates else EMPTY_ALTERNATE)
+                if self.fetch_all_alternates:
+                    book_data["all_alternates"] = json.dumps(alternates)
+
+            if self.plan.partial:
+                return refreshed_fields(book_data, self.plan.fields), image_job
+            return book_data, image_job
+
+        except Exception as exc:
+            # Parse failures come back as page errors, so this is the network giving up
+            return error_record(isbn, TRANSIENT, f"{type(exc).__name__}: {exc}"), None
+
+    def extract_book_info(self, isbn):
+        """Extract book information from Wheeler's website (robust to quotes)."""
+        book_data, image_job = self.scrape_book(isbn)
+        if image_job is not None:
+            book_data["local_image_path"] = image_job.result()
+        self.metrics.finish_isbn(isbn, book_data)
+        return book_data
+
+    def scrape(self, isbns):
+        """Scrape isbns concurrently, yielding (isbn, record) in input order"""
+        if self.download_images:
+            try:
+                os.makedirs(self.images_folder, exist_ok=True)
+                self.log(f"Images will be saved to: {self.images_folder}")
+            except Exception as e:
+                self.log(f"Error creating images folder: {str(e)}")
+
+        if self.plan.partial:
+            self.log(f"Fields: {self.plan.describe()}")
+        if self.parse_pool is not None:
+            self.log(f"Scraping with {self.workers} workers, parsing in {self.parse_workers} processes")
+        else:
+            self.log(f"Scraping with {self.workers} workers")
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scraper")
+        # Leave room for records waiting on their image so metadata keeps flowing
+        window = (self.workers + self.image_workers) * 2
+        try:
+            results = ordered_map(executor, self.scrape_book, isbns,
+                                  window=window, keep_going=lambda: not self.stopped)
+            for isbn, (book_data, image_job) in results:
+                if image_job is not None:
+                    book_data["local_image_path"] = image_job.result()
+                self.processed += 1
+                if 'error' in book_data:
+                    self.errors += 1
+                elif book_data.get('local_image_path'):
+                    self.images_downloaded += 1
+                if self.journal is not None:
+                    with self.metrics.timer("journal", isbn):
+                        self.journal.append(isbn, book_data)
+                if self.db_writer is not None:
+                    self.db_writer.put(isbn, book_data)
+                if self.negative_cache is not None:
+                    self.negative_cache.record(isbn, book_data)
+                self.failures.add(isbn, book_data)
+                self.metrics.finish_isbn(isbn, book_data)
+                yield isbn, book_data
+        finally:
+            # Don't wait for in-flight requests when the run was stopped
+            executor.shutdown(wait=not self.stopped)
+
+    def summary(self):
+        """Counters for the run so far"""
+        summary = {
+            "processed": self.processed,
+            "errors": self.errors,
+            "failures": self.failures.as_dict(),
+            "images_downloaded": self.images_downloaded,
+            "pages_reused": self.memo.hits,
+            "stopped": self.stopped,
+            "http": self.http.stats(),
+        }
+        if self.images is not None:
+            summary["images"] = self.images.stats()
+        if self.http.cache is not None:
+            summary["cache"] = self.http.cache.stats()
+        if self.journal is not None:
+            summary["journal"] = {"path": self.journal.path, "written": self.journal.written}
+        if self.db_writer is not None:
+            summary["database"] = self.db_writer.stats()
+        if self.negative_cache is not None:
+            summary["negative_cache"] = self.negative_cache.stats()
+        return summary
+
+    def log_summary(self):
+        """Log the reuse and cache counters for the run"""
+        self.log(f"Product pages reused from this run: {self.memo.hits}")
+        self.log("Time per stage:")
+        self.metrics.log_stages(self.log)
+        stats = self.http.stats()
+        if stats["retries"] or stats["throttled"]:
+            self.log(f"Requests: {stats['retries']} retried, {stats['throttled']} throttled by the server")
+        for host, limits in stats["hosts"].items():
+            if limits["circuit_trips"] or limits["concurrency_decreases"]:
+                self.log(f"{host}: backed off {limits['concurrency_decreases']} times, circuit "
+                         f"opened {limits['circuit_trips']} times, ending at "
+                         f"{limits['concurrency']} concurrent / "
+                         f"{limits['requests_per_second']:g} requests per second")
+        if self.images is not None:
+            stats = self.images.stats()
+            self.log(f"Images: {stats['downloaded']} downloaded, {stats['reused']} reused from "
+                     f"the store, {stats['deduplicated']} duplicates, {stats['skipped_existing']} "
+                     f"already on disk, {stats['placeholders']} placeholders, "
+                     f"{stats['failed']} failed")
+            self.log(f"Image store: {stats['store']['blobs']} unique images "
+                     f"({stats['store']['bytes'] / 1024 ** 2:.1f} MB)")
+        if self.http.cache is not None:
+            stats = self.http.cache.stats()
+            self.log(f"Page cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+                     f"{stats['misses']} misses ({stats['bytes'] / 1024 ** 2:.1f} MB on disk)")
+        if self.negative_cache is not None:
+            stats = self.negative_cache.stats()
+            self.log(f"Known failures: {stats['skipped']} skipped, {stats['recorded']} recorded, "
+                     f"{stats['cleared']} cleared after a successful scrape")
+        self.failures.log(self.log)
+
+    def close(self):
+        if self.images is not None:
+            self.images.close(wait=not self.stopped)
+        self.http.close()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=not self.stopped, cancel_futures=True)
+        if self.journal is not None:
+            self.journal.close()
+        if self.db_writer is not None:
+            self.db_writer.close()
+        if self.negative_cache is not None:
+            self.negative_cache.close()
+        self.failures.close()
+        self.metrics.close()
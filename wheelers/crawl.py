@@ -0,0 +1,375 @@
+"""Category crawl: discover product ISBNs from category and product pages.
+
+The crawl is breadth-first from a set of seed URLs. Category pages are
+fetched here and their product and category links are added to the
+frontier; product ISBNs are handed to the scraper, which reports back the
+alternate formats and category links found on each product page.
+
+Depth counts category levels. Seeds are at depth 0, and the products listed
+on a category page (and their alternate formats) share its depth, as do
+further pages of the same category. Any other category linked from a
+category or product page is one level deeper. Categories deeper than
+max_depth are not visited. At most max_pages pages (category pages plus
+products) are taken from the frontier per run.
+
+The frontier is kept on disk in SQLite and only holds pages still to
+visit. Whether a page was ever seen is answered by a Bloom filter stored
+with it. The filter takes about 4 bytes per URL at a one-in-a-million
+false positive rate, where a set of URLs would take a hundred or more.
+Both survive between runs, so a crawl that hit its page budget carries on
+where it stopped. A category page that fails for a reason other than not
+existing stays in the frontier and is tried again by the next run, up to
+MAX_CATEGORY_ATTEMPTS times; its URL is already in the seen filter, so it
+could never be queued again once dropped.
+"""
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from .defaults import CRAWL_STATE_FILE, DEFAULT_CRAWL_DEPTH, DEFAULT_CRAWL_PAGES
+from .failures import NOT_FOUND, classify_status
+from .parser import ISBN_KEY, parse_listing_page, product_key
+
+PRODUCT = "product"
+CATEGORY = "category"
+
+BLOOM_CAPACITY = 100_000
+BLOOM_ERROR_RATE = 1e-6
+# Each new filter holds twice as many keys at half the error rate of the one
+# before (the first gets half of BLOOM_ERROR_RATE), so however many filters
+# are chained the overall false positive rate stays under BLOOM_ERROR_RATE
+BLOOM_GROWTH = 2
+BLOOM_TIGHTENING = 0.5
+FRONTIER_BATCH = 100
+# Runs a category page that keeps failing (5xx, timeouts) is tried in
+MAX_CATEGORY_ATTEMPTS = 3
+COMMIT_INTERVAL = 5.0
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        # Double hashing: two 64-bit halves of one digest give every position
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    def add(self, key):
+        """Add key, returning False if it was (probably) there already"""
+        added = False
+        bits = self.bits
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        self.count += added
+        return added
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class ScalableBloomFilter:
+    """Bloom filters chained as they fill, so the number of keys need not be known up front"""
+
+    def __init__(self, filters=None, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.filters = filters or [BloomFilter(capacity, error_rate * BLOOM_TIGHTENING)]
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.filters)
+
+    def add(self, key):
+        """Add key, returning False if it was (probably) seen before"""
+        if key in self:
+            return False
+        last = self.filters[-1]
+        if last.full:
+            last = BloomFilter(last.capacity * BLOOM_GROWTH, last.error_rate * BLOOM_TIGHTENING)
+            self.filters.append(last)
+        last.add(key)
+        return True
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+
+def normalize_url(url):
+    """URL without its fragment, used as the frontier key of a category page"""
+    return url.split("#")[0]
+
+
+class Crawl:
+    """Frontier, seen-filter and budget of one crawl, persisted in a SQLite file.
+
+    isbns() is the input of WheelersScraper.scrape(): it yields product
+    ISBNs from the frontier, fetching category pages as it reaches them.
+    The scraper calls discover() for each product page it parses and
+    finished() once each ISBN is done, and record() is called with every
+    written record, which removes the ISBN from the frontier. ISBNs handed
+    out but never recorded (the run crashed or was stopped) go back to the
+    frontier the next time the crawl is opened.
+    """
+
+    def __init__(self, path=CRAWL_STATE_FILE, max_depth=DEFAULT_CRAWL_DEPTH,
+                 max_pages=DEFAULT_CRAWL_PAGES, fresh=False, log=None):
+        self.path = path
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.log = log or (lambda message: None)
+        self.pages = 0
+        self.category_pages = 0
+        self.category_errors = 0
+        self.products = 0
+        self.discovered = {PRODUCT: 0, CATEGORY: 0}
+        self.duplicates = 0
+        self.too_deep = 0
+        self._in_flight = {}
+        self._busy = set()
+        self._finished = threading.Condition()
+        self._lock = threading.Lock()
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                handed_out INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )""")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(frontier)")}
+        if "attempts" not in columns:
+            self._conn.execute(
+                "ALTER TABLE frontier ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_filter (
+                level INTEGER PRIMARY KEY,
+                capacity INTEGER NOT NULL,
+                error_rate REAL NOT NULL,
+                count INTEGER NOT NULL,
+                bits BLOB NOT NULL
+            )""")
+        if fresh:
+            self._conn.execute("DELETE FROM frontier")
+            self._conn.execute("DELETE FROM seen_filter")
+        # Products handed out by a run that never recorded them, and categories
+        # that failed, are visited again
+        self._conn.execute("UPDATE frontier SET handed_out = 0 WHERE handed_out = 1")
+        self._conn.commit()
+        filters = [BloomFilter(capacity, error_rate, bits, count)
+                   for capacity, error_rate, count, bits in self._conn.execute(
+                       "SELECT capacity, error_rate, count, bits FROM seen_filter ORDER BY level")]
+        self.seen = ScalableBloomFilter(filters)
+        self._saved_filters = len(filters)
+
+    def _add(self, kind, target, depth):
+        """Queue target unless it was seen before or is beyond max_depth (caller holds _lock)"""
+        if depth > self.max_depth:
+            self.too_deep += 1
+            return
+        if not self.seen.add(f"{kind}:{target}"):
+            self.duplicates += 1
+            return
+        self._conn.execute("INSERT INTO frontier (kind, target, depth) VALUES (?, ?, ?)",
+                           (kind, target, depth))
+        self.discovered[kind] += 1
+
+    def add_seeds(self, urls, site_url):
+        """Queue seed URLs (absolute, or paths on site_url) at depth 0"""
+        with self._lock:
+            for url in urls:
+                url = normalize_url(urljoin(site_url, url))
+                key = product_key(url)
+                if ISBN_KEY.fullmatch(key):
+                    self._add(PRODUCT, key, 0)
+                else:
+                    self._add(CATEGORY, url, 0)
+            self._commit()
+
+    def _add_links(self, products, categories, depth, source_url):
+        host = urlsplit(source_url).netloc
+        source_path = urlsplit(source_url).path
+        with self._lock:
+            for isbn in products:
+                self._add(PRODUCT, isbn, depth)
+            for url in categories:
+                parts = urlsplit(url)
+                if parts.netloc != host:
+                    continue  # stay on the site
+                # Further pages of the same category are not a level deeper
+                self._add(CATEGORY, url, depth if parts.path == source_path else depth + 1)
+            self._commit_if_due()
+
+    def discover(self, isbn, page, url):
+        """Queue the alternate formats and categories linked from a scraped product page"""
+        depth = self._in_flight.get(isbn, (None, self.max_depth))[1]
+        alternates = [product_key(href) for href in page["alt_links"]]
+        self._add_links([key for key in alternates if ISBN_KEY.fullmatch(key)],
+                        page.get("category_links", ()), depth, url)
+
+    def finished(self, isbn):
+        """The scraper is done with isbn; its links have been discovered"""
+        with self._finished:
+            self._busy.discard(isbn)
+            self._finished.notify_all()
+
+    def record(self, isbn, record):
+        """isbn's record was written: drop it from the frontier"""
+        with self._finished:
+            entry = self._in_flight.pop(isbn, None)
+        if entry is not None:
+            self._delete(entry[0])
+
+    def _next_rows(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, kind, target, depth FROM frontier WHERE handed_out = 0 "
+                "ORDER BY id LIMIT ?", (FRONTIER_BATCH,)).fetchall()
+
+    def isbns(self, http, stopped=lambda: False):
+        """Yield product ISBNs to scrape, breadth first, until the frontier or budget runs out"""
+        while self.pages < self.max_pages and not stopped():
+            rows = self._next_rows()
+            if not rows:
+                # Products still being scraped may link to more pages
+                with self._finished:
+                    if not self._busy:
+                        return
+                    self._finished.wait(1.0)
+                continue
+            for row_id, kind, target, depth in rows:
+                if self.pages >= self.max_pages or stopped():
+                    break
+                if depth > self.max_depth:
+                    self.too_deep += 1
+                    self._delete(row_id)
+                    continue
+                self.pages += 1
+                if kind == PRODUCT:
+                    self.products += 1
+                    with self._lock:
+                        self._conn.execute("UPDATE frontier SET handed_out = 1 WHERE id = ?",
+                                           (row_id,))
+                    with self._finished:
+                        self._in_flight[target] = (row_id, depth)
+                        self._busy.add(target)
+                    yield target
+                elif self.visit_category(http, target, depth):
+                    self._delete(row_id)
+                else:
+                    self._retry_later(row_id, target)
+        if self.pages >= self.max_pages:
+            self.log(f"Crawl page budget of {self.max_pages} reached")
+
+    def visit_category(self, http, url, depth):
+        """Fetch a category page and queue its links.
+
+        Returns False if the page should be tried again by a later run.
+        """
+        try:
+            response = http.get_page(url)
+        except Exception as exc:
+            self.category_errors += 1
+            self.log(f"Error for category {url}: {type(exc).__name__}: {exc}")
+            return False
+        if response.status_code != 200:
+            self.category_errors += 1
+            self.log(f"Error for category {url}: HTTP {response.status_code}")
+            return classify_status(response.status_code) == NOT_FOUND
+        self.category_pages += 1
+        links = parse_listing_page(response.text, url)
+        self._add_links(links["products"], links["categories"], depth, url)
+        self.log(f"Category {url}: {len(links['products'])} products, "
+                 f"{len(links['categories'])} category links")
+        return True
+
+    def _retry_later(self, row_id, url):
+        """Keep a failed category for the next run, or drop it after MAX_CATEGORY_ATTEMPTS"""
+        with self._lock:
+            self._conn.execute("UPDATE frontier SET handed_out = 1, attempts = attempts + 1 "
+                               "WHERE id = ?", (row_id,))
+            attempts = self._conn.execute("SELECT attempts FROM frontier WHERE id = ?",
+                                          (row_id,)).fetchone()[0]
+        if attempts >= MAX_CATEGORY_ATTEMPTS:
+            self.log(f"Giving up on category {url} after {attempts} attempts")
+            self._delete(row_id)
+
+    def _delete(self, row_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM frontier WHERE id = ?", (row_id,))
+            self._commit_if_due()
+
+    def _commit_if_due(self):
+        if time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+            self._commit()
+
+    def _commit(self):
+        # The filter is saved with the frontier rows it vouches for; filters
+        # before the last saved one were already full and have not changed
+        for level in range(max(0, self._saved_filters - 1), len(self.seen.filters)):
+            bloom = self.seen.filters[level]
+            self._conn.execute("INSERT OR REPLACE INTO seen_filter VALUES (?, ?, ?, ?, ?)",
+                               (level, bloom.capacity, bloom.error_rate, bloom.count,
+                                bytes(bloom.bits)))
+        self._saved_filters = len(self.seen.filters)
+        self._conn.commit()
+        self._last_commit = time.monotonic()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT kind, COUNT(*) FROM frontier GROUP BY kind").fetchall())
+
+    def stats(self):
+        return {
+            "state": self.path,
+            "pages": self.pages,
+            "category_pages": self.category_pages,
+            "category_errors": self.category_errors,
+            "products": self.products,
+            "discovered": dict(self.discovered),
+            "duplicates_skipped": self.duplicates,
+            "beyond_max_depth": self.too_deep,
+            "pending": self.pending(),
+            "seen": len(self.seen),
+            "seen_filter_bytes": self.seen.nbytes,
+        }
+
+    def describe(self):
+        stats = self.stats()
+        pending = stats["pending"]
+        return (f"Crawl: {stats['category_pages']} category pages and {stats['products']} "
+                f"products visited, {stats['duplicates_skipped']} duplicate links skipped, "
+                f"{pending.get(PRODUCT, 0)} products and {pending.get(CATEGORY, 0)} categories "
+                f"left in {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
@@ -0,0 +1,414 @@
+"""MySQL persistence for scraped records"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    bindparam,
+    create_engine,
+    inspect,
+    or_,
+    select,
+    text,
+)
+
+from .changes import CHANGED, HASHED_FIELDS, NEW, UNCHANGED, HashIndex, content_hash
+from .records import RECORD_FIELDS
+
+TABLE_NAME = "wheelers_books"
+CHANGES_TABLE_NAME = "wheelers_book_changes"
+DEFAULT_BATCH_SIZE = 500
+FLUSH_INTERVAL = 5.0
+POOL_SIZE = 4
+
+metadata = MetaData()
+
+# Explicit schema: one row per ISBN, kept up to date by upserts
+books_table = Table(
+    TABLE_NAME,
+    metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True,
+           autoincrement=True),
+    Column("isbn", String(32), nullable=False, unique=True),
+    *[Column(name, Text) for name in RECORD_FIELDS
+      if name not in ("isbn", "scraped_at")],
+    Column("scraped_at", DateTime),
+    # Last time any field was fetched; newer than scraped_at after a price-only refresh
+    Column("refreshed_at", DateTime),
+    # Hash of the meaningful fields (wheelers.changes), NULL while unknown
+    Column("content_hash", BigInteger),
+    mysql_charset="utf8mb4",
+)
+# Columns added after the first release, with their DDL type for ALTER TABLE
+ADDED_COLUMNS = {"refreshed_at": "DATETIME", "content_hash": "BIGINT"}
+
+# Optional log of what each write changed: one row per new or changed record
+changes_table = Table(
+    CHANGES_TABLE_NAME,
+    metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True,
+           autoincrement=True),
+    Column("isbn", String(32), nullable=False, index=True),
+    Column("changed_at", DateTime, nullable=False),
+    Column("change_type", String(16), nullable=False),
+    # Comma-separated fields whose stored value changed (NULL for new records)
+    Column("fields", Text),
+    mysql_charset="utf8mb4",
+)
+# Columns that change on every write and are left out of the change log
+UNLOGGED_COLUMNS = ("isbn", "scraped_at", "refreshed_at", "content_hash")
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def connection_string(db_config):
+    """SQLAlchemy URL for the settings stored in db_config.json"""
+    if db_config.get("url"):
+        return db_config["url"]
+    return f"mysql+pymysql://{db_config['username']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
+
+
+def batch_size_of(db_config):
+    """Records per upsert batch: db_config's optional batch_size, 500 by default"""
+    batch_size = int(db_config.get("batch_size") or DEFAULT_BATCH_SIZE)
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    return batch_size
+
+
+def get_engine(db_config):
+    """Pooled engine for db_config, shared by everything in the process"""
+    url = connection_string(db_config)
+    with _engines_lock:
+        if url not in _engines:
+            options = {"pool_pre_ping": True}
+            if not url.startswith("sqlite"):
+                options.update(pool_size=POOL_SIZE, pool_recycle=3600)
+            _engines[url] = create_engine(url, **options)
+        return _engines[url]
+
+
+def test_connection(db_config):
+    """Raise if the database cannot be reached"""
+    with get_engine(db_config).connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def ensure_schema(engine):
+    """Create wheelers_books if needed and check it has a unique ISBN key.
+
+    Tables created by older versions (pandas to_sql) have no unique key, so
+    upserts would still append duplicates; refuse to write to them.
+    """
+    metadata.create_all(engine, tables=[books_table])
+    inspector = inspect(engine)
+    unique_isbn = any(
+        index.get("unique") and index["column_names"] == ["isbn"]
+        for index in inspector.get_indexes(TABLE_NAME)
+    ) or any(
+        constraint["column_names"] == ["isbn"]
+        for constraint in inspector.get_unique_constraints(TABLE_NAME)
+    )
+    if not unique_isbn:
+        raise RuntimeError(
+            f"Table {TABLE_NAME} has no unique key on isbn (created by an older version). "
+            f"Remove duplicate rows and run: ALTER TABLE {TABLE_NAME} "
+            f"MODIFY isbn VARCHAR(32) NOT NULL, ADD UNIQUE KEY (isbn)")
+    existing = {column["name"] for column in inspector.get_columns(TABLE_NAME)}
+    with engine.begin() as conn:
+        for name, ddl_type in ADDED_COLUMNS.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {name} {ddl_type}"))
+
+
+def to_row(isbn, record):
+    """Database row for a record, or None if it should not be stored"""
+    if 'error' in record:
+        return None  # never overwrite good data with a failed fetch
+    row = {key: value for key, value in record.items() if key in books_table.c}
+    row["isbn"] = record.get("isbn") or isbn
+    for column in ("scraped_at", "refreshed_at"):
+        if isinstance(row.get(column), str):
+            row[column] = datetime.fromisoformat(row[column])
+    if "refreshed_at" not in row and "scraped_at" in row:
+        row["refreshed_at"] = row["scraped_at"]
+    # A partial update leaves the row's other fields as they were, so its
+    # hash is only worked out against the stored row (hash_partial_rows)
+    row["content_hash"] = None if "refreshed_fields" in record else content_hash(record)
+    return row
+
+
+def is_partial(row):
+    return row["content_hash"] is None
+
+
+def upsert_statement(conn, rows):
+    """Multi-row INSERT that updates existing ISBNs instead of duplicating them"""
+    update_columns = [key for key in rows[0] if key != "isbn"]
+    if conn.dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(books_table).values(rows)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+    if conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(books_table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=["isbn"], set_={c: stmt.excluded[c] for c in update_columns})
+    raise RuntimeError(f"Upserts are not supported for {conn.dialect.name}")
+
+
+def upsert_rows(conn, rows):
+    """Upsert rows, batching rows that share the same columns into one statement"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    for group in groups.values():
+        conn.execute(upsert_statement(conn, group))
+    return len(rows)
+
+
+def touch_rows(conn, checked):
+    """Move scraped_at/refreshed_at of unchanged rows forward, given (isbn, time) pairs"""
+    columns = books_table.c
+    conn.execute(books_table.update()
+                 .where(columns.isbn == bindparam("key"))
+                 .where(or_(columns.scraped_at.is_(None),
+                            columns.scraped_at < bindparam("checked_at")))
+                 .values(scraped_at=bindparam("checked_at"), refreshed_at=bindparam("checked_at")),
+                 [{"key": isbn, "checked_at": checked_at} for isbn, checked_at in checked])
+
+
+def touch_refreshed(conn, refreshed):
+    """Move refreshed_at of rows whose refreshed fields were unchanged forward"""
+    columns = books_table.c
+    conn.execute(books_table.update()
+                 .where(columns.isbn == bindparam("key"))
+                 .where(or_(columns.refreshed_at.is_(None),
+                            columns.refreshed_at < bindparam("checked_at")))
+                 .values(refreshed_at=bindparam("checked_at")),
+                 [{"key": row["isbn"], "checked_at": row["refreshed_at"]} for row in refreshed])
+
+
+def hash_partial_rows(conn, rows):
+    """Split partial rows into (changed, unchanged), setting each one's content_hash.
+
+    A changed row gets the hash of its stored row with the refreshed fields
+    merged in, an unchanged one keeps the stored hash, so a price-only
+    refresh does not make the next full scrape look changed. Rows with no
+    stored row keep a NULL hash, since their other fields are unknown.
+    """
+    columns = books_table.c
+    stored = {}
+    query = select(books_table).where(columns.isbn.in_([row["isbn"] for row in rows]))
+    for old in conn.execute(query):
+        stored[old.isbn] = old._mapping
+    changed = []
+    unchanged = []
+    for row in rows:
+        old = stored.get(row["isbn"])
+        if old is None:
+            changed.append(row)
+            continue
+        fields = [name for name in row if name not in UNLOGGED_COLUMNS]
+        if old["content_hash"] is not None and all(old[name] == row[name] for name in fields):
+            row["content_hash"] = old["content_hash"]
+            unchanged.append(row)
+            continue
+        merged = {name: old[name] for name in HASHED_FIELDS}
+        merged.update((name, row[name]) for name in fields)
+        row["content_hash"] = content_hash(merged)
+        changed.append(row)
+    return changed, unchanged
+
+
+def log_changes(conn, rows):
+    """Add a change log entry for each row that is new or differs from its stored row"""
+    columns = books_table.c
+    stored = {}
+    query = select(books_table).where(columns.isbn.in_([row["isbn"] for row in rows]))
+    for old in conn.execute(query):
+        stored[old.isbn] = old._mapping
+    entries = []
+    for row in rows:
+        old = stored.get(row["isbn"])
+        changed_at = row.get("refreshed_at") or datetime.now()
+        if old is None:
+            entries.append({"isbn": row["isbn"], "changed_at": changed_at,
+                            "change_type": NEW, "fields": None})
+            continue
+        fields = [name for name, value in row.items()
+                  if name not in UNLOGGED_COLUMNS and old[name] != value]
+        if fields:
+            entries.append({"isbn": row["isbn"], "changed_at": changed_at,
+                            "change_type": CHANGED, "fields": ",".join(fields)})
+    if entries:
+        conn.execute(changes_table.insert(), entries)
+    return len(entries)
+
+
+def load_hash_index(engine):
+    """HashIndex of the content hashes stored in wheelers_books"""
+    columns = books_table.c
+    query = select(columns.isbn, columns.content_hash).where(columns.content_hash.isnot(None))
+    with engine.connect() as conn:
+        return HashIndex.build(conn.execution_options(stream_results=True).execute(query))
+
+
+class DatabaseWriter:
+    """Background stage that upserts completed records in batches.
+
+    put() hands a record to a bounded queue and returns immediately (it only
+    blocks when the database falls far behind), so DB writes overlap with
+    scraping. Batches of batch_size records (the batch_size setting of
+    db_config unless given) are flushed when full or every FLUSH_INTERVAL
+    seconds.
+
+    With skip_unchanged, each record's content hash is checked against the
+    hashes of the stored rows, loaded once when the writer starts: only new
+    and changed records are upserted, and unchanged ones just have their
+    timestamps moved forward, so incremental refreshes still see them as
+    fresh. Partial records from a field refresh are compared with the
+    stored row's columns when their batch is written, and only rewritten if
+    a refreshed field changed. hash_index_file keeps the hashes in a local file between runs
+    instead of reading them from the table; it is only right while nothing
+    else writes to the table. With change_log, every new or changed record
+    also gets a row in wheelers_book_changes naming the fields that changed.
+    """
+
+    def __init__(self, db_config, batch_size=None,
+                 flush_interval=FLUSH_INTERVAL, skip_unchanged=False, hash_index_file=None,
+                 change_log=False, metrics=None, log=None):
+        self.engine = get_engine(db_config)
+        self.metrics = metrics
+        self.batch_size = batch_size or batch_size_of(db_config)
+        self.flush_interval = flush_interval
+        self.log = log or (lambda message: None)
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self.unchanged = 0
+        self.changes_logged = 0
+        self._queue = queue.Queue(maxsize=self.batch_size * 4)
+        ensure_schema(self.engine)
+        self.change_log = change_log
+        if change_log:
+            metadata.create_all(self.engine, tables=[changes_table])
+        self.hash_index_file = hash_index_file
+        self.hashes = self._load_hashes() if skip_unchanged else None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def _load_hashes(self):
+        started = time.perf_counter()
+        hashes = None
+        source = self.hash_index_file
+        if source and os.path.exists(source):
+            try:
+                hashes = HashIndex.load(source)
+            except (OSError, ValueError) as e:
+                self.log(f"Ignoring hash index {source}: {str(e)}")
+        if hashes is None:
+            hashes = load_hash_index(self.engine)
+            source = TABLE_NAME
+        self.log(f"Change detection: {len(hashes)} stored records from {source} "
+                 f"({time.perf_counter() - started:.1f} s)")
+        return hashes
+
+    def put(self, isbn, record):
+        row = to_row(isbn, record)
+        if row is None:
+            self.skipped += 1
+        elif is_partial(row):
+            self._queue.put(row)  # checked against the stored row in _flush
+        elif (self.hashes is not None
+              and self.hashes.check(row["isbn"], row["content_hash"]) == UNCHANGED
+              and row.get("scraped_at") is not None):
+            self._queue.put((row["isbn"], row["scraped_at"]))
+        else:
+            self._queue.put(row)
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                row = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                row = False  # idle: flush what we have
+            if row is None:
+                break
+            if row:
+                batch.append(row)
+            if batch and (row is False or len(batch) >= self.batch_size):
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        # Unchanged records are queued as (isbn, scraped_at) pairs
+        rows = [item for item in batch if isinstance(item, dict)]
+        checked = [item for item in batch if not isinstance(item, dict)]
+        full_rows = [row for row in rows if not is_partial(row)]
+        partial_rows = [row for row in rows if is_partial(row)]
+        refreshed = []
+        started = time.perf_counter()
+        try:
+            with self.engine.begin() as conn:
+                if rows and self.change_log:
+                    self.changes_logged += log_changes(conn, rows)
+                if full_rows:
+                    upsert_rows(conn, full_rows)
+                if partial_rows:
+                    partial_rows, refreshed = hash_partial_rows(conn, partial_rows)
+                    if self.hashes is None:
+                        partial_rows, refreshed = partial_rows + refreshed, []
+                    if partial_rows:
+                        upsert_rows(conn, partial_rows)
+                    if refreshed:
+                        touch_refreshed(conn, refreshed)
+                if checked:
+                    touch_rows(conn, checked)
+            self.written += len(full_rows) + len(partial_rows)
+            self.unchanged += len(checked) + len(refreshed)
+            if self.hashes is not None:
+                for row in partial_rows:
+                    self.hashes.remember(row["isbn"], row["content_hash"])
+            if self.metrics is not None:
+                self.metrics.observe("db_flush", time.perf_counter() - started)
+        except Exception as e:
+            self.failed += len(batch)
+            if self.hashes is not None:
+                for row in rows:
+                    self.hashes.forget(row["isbn"])
+            self.log(f"Error saving {len(batch)} records to database: {str(e)}")
+
+    def close(self):
+        """Flush everything still queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.hashes is not None and self.hash_index_file:
+            try:
+                self.hashes.save(self.hash_index_file)
+            except OSError as e:
+                self.log(f"Error saving hash index {self.hash_index_file}: {str(e)}")
+
+    def stats(self):
+        stats = {"written": self.written, "skipped": self.skipped, "failed": self.failed}
+        if self.hashes is not None:
+            stats["unchanged"] = self.unchanged
+        if self.change_log:
+            stats["changes_logged"] = self.changes_logged
+        return stats
+
@@ -0,0 +1,35 @@
+"""Default settings, importable without loading requests, Pillow or SQLAlchemy.
+
+The GUI and the command line build their widgets and options from these
+before any scraping starts, so they live apart from the modules that use
+them to keep start-up fast.
+"""
+
+# HTTP
+DEFAULT_WORKERS = 8
+DEFAULT_REQUESTS_PER_SECOND = 5.0
+CACHE_FILE = "http_cache.sqlite"
+DEFAULT_CACHE_TTL_HOURS = 24
+
+# Images
+DEFAULT_IMAGE_WORKERS = 4
+
+# Work queue
+DEFAULT_QUEUE = "default"
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_CLAIM_BATCH = 50
+
+# Negative cache: hours a failure is remembered, per error class (0 = never)
+NEGATIVE_CACHE_FILE = "failed_isbns.sqlite"
+NEGATIVE_CACHE_TTL_HOURS = {
+    "not_found": 24 * 7,
+    "parse_failure": 24,
+    "transient": 1,
+    "blocked": 0,
+}
+
+# Category crawl
+CRAWL_STATE_FILE = "crawl_state.sqlite"
+DEFAULT_CRAWL_DEPTH = 2
+DEFAULT_CRAWL_PAGES = 1000
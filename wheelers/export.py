@@ -0,0 +1,108 @@
+"""Streaming exporters: records are written in chunks, never as one DataFrame"""
+import csv
+import os
+
+from .records import REFRESH_FIELDS, STORE_FIELDS
+
+# Fixed column set so every export of a run has the same schema
+EXPORT_FIELDS = STORE_FIELDS + REFRESH_FIELDS
+CHUNK_SIZE = 1000
+EXCEL_MAX_CELL_LENGTH = 32767
+
+EXPORT_FORMATS = {
+    ".csv": "CSV",
+    ".xlsx": "Excel",
+    ".parquet": "Parquet",
+}
+
+
+def _report(progress, count):
+    if progress is not None:
+        progress(count)
+
+
+def iter_rows(records, fields=EXPORT_FIELDS):
+    """A tuple of `fields` per record, read straight from the columns of a RecordStore"""
+    if hasattr(records, "iter_rows"):
+        return records.iter_rows(fields)
+    return (tuple(record.get(field) for field in fields) for record in records)
+
+
+def export_csv(records, file_path, progress=None):
+    """Write records to CSV, calling progress(rows written) every chunk"""
+    count = 0
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_FIELDS)
+        for row in iter_rows(records):
+            writer.writerow(row)
+            count += 1
+            if count % CHUNK_SIZE == 0:
+                _report(progress, count)
+    _report(progress, count)
+    return count
+
+
+def export_excel(records, file_path, progress=None):
+    """Write records to xlsx using openpyxl's constant-memory write-only mode"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def cell(value):
+        if isinstance(value, str):
+            return ILLEGAL_CHARACTERS_RE.sub("", value)[:EXCEL_MAX_CELL_LENGTH]
+        return value
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Books")
+    sheet.append(EXPORT_FIELDS)
+    count = 0
+    for row in iter_rows(records):
+        sheet.append([cell(value) for value in row])
+        count += 1
+        if count % CHUNK_SIZE == 0:
+            _report(progress, count)
+    workbook.save(file_path)
+    _report(progress, count)
+    return count
+
+
+def export_parquet(records, file_path, progress=None):
+    """Write records to Parquet (all string columns) one row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema([(field, pa.string()) for field in EXPORT_FIELDS])
+
+    def to_batch(chunk):
+        columns = [pa.array(column, type=pa.string()) for column in zip(*chunk)]
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    count = 0
+    chunk = []
+    with pq.ParquetWriter(file_path, schema, compression="zstd") as writer:
+        for row in iter_rows(records):
+            chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                writer.write_batch(to_batch(chunk))
+                count += len(chunk)
+                chunk = []
+                _report(progress, count)
+        if chunk:
+            writer.write_batch(to_batch(chunk))
+            count += len(chunk)
+    _report(progress, count)
+    return count
+
+
+def export_records(records, file_path, progress=None):
+    """Export records in the format given by the file extension"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".xlsx":
+        return export_excel(records, file_path, progress)
+    if ext == ".parquet":
+        return export_parquet(records, file_path, progress)
+    return export_csv(records, file_path, progress)
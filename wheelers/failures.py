@@ -0,0 +1,224 @@
+"""Typed scrape failures, a persistent cache of known-bad ISBNs and the per-run failure report"""
+import csv
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from .defaults import NEGATIVE_CACHE_FILE, NEGATIVE_CACHE_TTL_HOURS
+
+# Error classes, stored in a failed record's "error_class"
+NOT_FOUND = "not_found"            # no such product (404/410, redirected away from /product/)
+TRANSIENT = "transient"            # network errors, timeouts, 429/5xx after retries
+PARSE_FAILURE = "parse_failure"    # a page came back but no book could be read from it
+BLOCKED = "blocked"                # the site refused us (401/403/407/451)
+ERROR_CLASSES = (NOT_FOUND, TRANSIENT, PARSE_FAILURE, BLOCKED)
+# Failures that another attempt at the same ISBN will not fix
+PERMANENT_CLASSES = frozenset({NOT_FOUND})
+
+NOT_FOUND_STATUSES = frozenset({404, 410})
+BLOCKED_STATUSES = frozenset({401, 403, 407, 451})
+
+COMMIT_EVERY = 100
+COMMIT_INTERVAL = 2.0
+EXAMPLES_PER_CLASS = 5
+
+
+def classify_status(status):
+    """Error class for a final non-200 HTTP status"""
+    if status in NOT_FOUND_STATUSES:
+        return NOT_FOUND
+    if status in BLOCKED_STATUSES:
+        return BLOCKED
+    return TRANSIENT
+
+
+def page_error(error_class, message):
+    """Failed product page, as returned in place of a parsed page"""
+    return {"error": message, "error_class": error_class}
+
+
+def error_record(isbn, error_class, message):
+    return {"isbn": isbn, "error": message, "error_class": error_class}
+
+
+def error_class_of(record):
+    """Error class of a failed record, also for records written before classes existed"""
+    error_class = record.get("error_class")
+    if error_class in ERROR_CLASSES:
+        return error_class
+    match = re.fullmatch(r"HTTP (\d{3})", str(record.get("error")))
+    return classify_status(int(match.group(1))) if match else TRANSIENT
+
+
+def parse_ttl(value):
+    """(error class, hours) from a CLASS=HOURS string, raising ValueError on bad input"""
+    error_class, _, hours = value.partition("=")
+    error_class = error_class.strip()
+    if error_class not in ERROR_CLASSES:
+        raise ValueError(f"unknown error class {error_class!r} "
+                         f"(expected one of {', '.join(ERROR_CLASSES)})")
+    return error_class, max(0.0, float(hours))
+
+
+class NegativeCache:
+    """ISBNs that failed recently, so later runs skip them without a request.
+
+    A failure is remembered for the TTL of its error class: long for pages
+    that do not exist, short for network trouble, and not at all for classes
+    with a TTL of 0 (by default `blocked`, which says more about the client
+    than about the ISBN). TTLs are applied when looking up, so changing them
+    takes effect for failures already stored. A later successful scrape
+    clears the entry. Writes are committed in batches.
+    """
+
+    def __init__(self, path=NEGATIVE_CACHE_FILE, ttl_hours=None):
+        self.path = path
+        self.ttl = {error_class: hours * 3600 for error_class, hours
+                    in {**NEGATIVE_CACHE_TTL_HOURS, **(ttl_hours or {})}.items()}
+        self.skipped = 0
+        self.recorded = 0
+        self.cleared = 0
+        self._expired = set()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS failures (
+                isbn TEXT PRIMARY KEY,
+                error_class TEXT NOT NULL,
+                error TEXT,
+                failures INTEGER NOT NULL,
+                first_failed REAL NOT NULL,
+                last_failed REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def lookup(self, isbn):
+        """Failed record standing in for isbn while its last failure is current, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT error_class, error, last_failed FROM failures WHERE isbn = ?",
+                (isbn,)).fetchone()
+            if row is None:
+                return None
+            error_class, error, last_failed = row
+            if time.time() - last_failed >= self.ttl.get(error_class, 0):
+                self._expired.add(isbn)
+                return None
+            self.skipped += 1
+        record = error_record(isbn, error_class, error)
+        record["known_failure"] = datetime.fromtimestamp(last_failed).isoformat()
+        return record
+
+    def record(self, isbn, record):
+        """Remember a fresh failure, or forget an old one once isbn scrapes cleanly"""
+        if "known_failure" in record:
+            return
+        with self._lock:
+            if 'error' in record:
+                error_class = error_class_of(record)
+                if self.ttl.get(error_class, 0) <= 0:
+                    return
+                now = time.time()
+                self._conn.execute(
+                    "INSERT INTO failures VALUES (?, ?, ?, 1, ?, ?) "
+                    "ON CONFLICT (isbn) DO UPDATE SET error_class = excluded.error_class, "
+                    "error = excluded.error, failures = failures + 1, "
+                    "last_failed = excluded.last_failed",
+                    (isbn, error_class, str(record["error"]), now, now))
+                self.recorded += 1
+            elif isbn in self._expired:
+                self._expired.discard(isbn)
+                self._conn.execute("DELETE FROM failures WHERE isbn = ?", (isbn,))
+                self.cleared += 1
+            else:
+                return
+            self._uncommitted += 1
+            if (self._uncommitted >= COMMIT_EVERY
+                    or time.monotonic() - self._last_commit >= COMMIT_INTERVAL):
+                self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def stats(self):
+        return {"skipped": self.skipped, "recorded": self.recorded, "cleared": self.cleared}
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+
+class FailureReport:
+    """Failed ISBNs of a run counted by error class, with a few examples of each.
+
+    Failures served from the negative cache are counted apart from fresh
+    ones. With `path`, every failed ISBN is also written to a CSV file as
+    the run goes.
+    """
+
+    def __init__(self, path=None, examples=EXAMPLES_PER_CLASS):
+        self.path = path
+        self.examples = examples
+        self.failed = dict.fromkeys(ERROR_CLASSES, 0)
+        self.known = dict.fromkeys(ERROR_CLASSES, 0)
+        self.samples = {error_class: [] for error_class in ERROR_CLASSES}
+        self._file = self._writer = None
+        if path:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(("isbn", "error_class", "error", "known_failure"))
+
+    def add(self, isbn, record):
+        if 'error' not in record:
+            return
+        error_class = error_class_of(record)
+        if "known_failure" in record:
+            self.known[error_class] += 1
+        else:
+            self.failed[error_class] += 1
+            if len(self.samples[error_class]) < self.examples:
+                self.samples[error_class].append((isbn, str(record["error"])))
+        if self._writer is not None:
+            self._writer.writerow((isbn, error_class, record["error"],
+                                   record.get("known_failure", "")))
+
+    @property
+    def total(self):
+        return sum(self.failed.values()) + sum(self.known.values())
+
+    def log(self, log):
+        """Log one line per error class that occurred"""
+        if not self.total:
+            return
+        log("Failures by class:")
+        for error_class in ERROR_CLASSES:
+            failed, known = self.failed[error_class], self.known[error_class]
+            if not failed and not known:
+                continue
+            text = f"  {error_class.replace('_', ' ')}: {failed}"
+            if known:
+                text += f" (+{known} known failures skipped)"
+            if self.samples[error_class]:
+                text += " - e.g. " + ", ".join(f"{isbn} ({error})"
+                                               for isbn, error in self.samples[error_class])
+            log(text)
+        if self.path:
+            log(f"Failed ISBNs written to {self.path}")
+
+    def as_dict(self):
+        return {error_class: {"failed": self.failed[error_class],
+                              "known_skipped": self.known[error_class]}
+                for error_class in ERROR_CLASSES
+                if self.failed[error_class] or self.known[error_class]}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
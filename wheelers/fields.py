@@ -0,0 +1,161 @@
+"""Declarative product fields and the per-run plan of what to fetch and parse for them"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from .records import BOOK_FIELDS, EMPTY_ALTERNATE, RECORD_FIELDS
+
+# Run features a field can depend on besides other fields
+ALTERNATES = "alternates"  # fetch the first (or every) alternate-format page
+IMAGES = "images"          # download the cover image
+
+# How one field of a record is produced:
+#   labels     row labels looked up in order ("div.row label" / "tr th" containing the text)
+#   selectors  CSS selectors tried in order when no label gave a value
+#   extract    a custom extractor in parser.py (reading `selectors`), "timestamp",
+#              "unset" (filled in later by the scraper) or ALTERNATES (built from
+#              alternate-format pages, not the product page)
+#   requires   fields that must be parsed too, and run features the field needs
+FieldSpec = namedtuple("FieldSpec", "name labels selectors extract requires",
+                       defaults=((), (), None, ()))
+
+# Fields of alternate-format pages that the alternate_* columns are built from
+ALTERNATE_SOURCE_FIELDS = ("edition", "isbn", "published", "price")
+
+FIELD_SPECS = (
+    FieldSpec("isbn", labels=("ISBN:",)),
+    FieldSpec("title", labels=("Title",), selectors=("h1.title",)),
+    FieldSpec("author", labels=("Author",), selectors=("div.author a[href*='/author/']",)),
+    FieldSpec("illustrator", selectors=("div.author div:nth-of-type(2) a.link",)),
+    FieldSpec("publisher", labels=("Publisher:", "Publisher")),
+    FieldSpec("published", labels=("Published:",)),
+    FieldSpec("published_imported", labels=("Published (Imported):",)),
+    FieldSpec("replaced_by", labels=("Replaced by:",)),
+    FieldSpec("language", labels=("Language:",)),
+    FieldSpec("series", labels=("Series:",), selectors=("span.series a",)),
+    FieldSpec("interest_age", labels=("Interest age:",)),
+    FieldSpec("ar_level", labels=("AR:",)),
+    FieldSpec("premiers_reading_challenge", labels=("Premier's Reading Challenge:",)),
+    FieldSpec("imprint", labels=("Imprint",)),
+    FieldSpec("publication_country", labels=("Publication Country",)),
+    FieldSpec("edition", labels=("Edition",)),
+    FieldSpec("page_count", labels=("Number of pages",)),
+    FieldSpec("dimensions", labels=("Dimensions",)),
+    FieldSpec("weight", labels=("Weight",)),
+    FieldSpec("dewey_code", labels=("Dewey Code",)),
+    FieldSpec("reading_age", labels=("Reading Age",)),
+    FieldSpec("library_of_congress", labels=("Library of Congress",)),
+    FieldSpec("nbs_text", labels=("NBS Text",)),
+    FieldSpec("onix_text", labels=("Onix Text",)),
+    FieldSpec("price", labels=("Price",), selectors=("div.price.red-text.bold", "span.price")),
+    FieldSpec("full_description", labels=("Full Description",), selectors=("div.description",)),
+    FieldSpec("categories", selectors=("div.product-description a[href*='/category/']",),
+              extract="categories"),
+    FieldSpec("image_url", selectors=("img.cover",), extract="image_url"),
+    FieldSpec("local_image_path", extract="unset", requires=("image_url", IMAGES)),
+    FieldSpec("scraped_at", extract="timestamp"),
+    *(FieldSpec(name, extract=ALTERNATES, requires=(ALTERNATES,) + ALTERNATE_SOURCE_FIELDS)
+      for name in EMPTY_ALTERNATE),
+    FieldSpec("all_alternates", extract=ALTERNATES, requires=(ALTERNATES,) + ALTERNATE_SOURCE_FIELDS),
+)
+SPECS = {spec.name: spec for spec in FIELD_SPECS}
+# Read as an alternate format, a page also tries a red span.price before any
+# span.price, as the alternate extraction always has
+ALTERNATE_PRICE_SELECTORS = ("div.price.red-text.bold", "span.price.red-text", "span.price")
+FEATURES = (ALTERNATES, IMAGES)
+
+# Always parsed: the page's ISBN tells a product page from an empty one
+KEY_FIELDS = ("isbn", "scraped_at")
+# Fields that only come with a run option (--images, --all-alternates)
+OPTIONAL_FIELDS = ("local_image_path", "all_alternates")
+
+FIELD_PRESETS = {
+    "All fields": None,
+    "Price only": ("price",),
+    "Title, author, publisher and price": ("title", "author", "publisher", "published", "price"),
+    "Book details without alternates": tuple(name for name in BOOK_FIELDS
+                                             if name not in KEY_FIELDS + OPTIONAL_FIELDS),
+}
+
+
+def _first_class(selector):
+    """Class of the outermost element a selector starts from, if it names one"""
+    match = re.search(r"\.([\w-]+)", selector.split()[0])
+    return match.group(1) if match else None
+
+
+class FieldPlan:
+    """What a run has to fetch and parse for the fields it was asked for.
+
+    Built once per run from a field subset (None for every field): the
+    requested fields plus everything they require are parsed from product
+    pages, in record order, and only those fields' labels and selectors are
+    evaluated. Alternate-format pages are fetched only when an alternate_*
+    field is requested, and covers downloaded only for local_image_path.
+    `links` keeps the alternate and category links a crawl follows.
+    """
+
+    def __init__(self, fields=None, links=False):
+        self.requested = None if fields is None else frozenset(fields)
+        unknown = sorted((self.requested or frozenset()) - set(SPECS))
+        if unknown:
+            raise ValueError(f"unknown field(s): {', '.join(unknown)} "
+                             f"(expected some of {', '.join(RECORD_FIELDS)})")
+        self.links = links
+        requested = set(RECORD_FIELDS) if self.requested is None else set(self.requested)
+        self.partial = not set(RECORD_FIELDS) - set(OPTIONAL_FIELDS) <= requested
+        # Output fields of a partial record, in record order
+        self.fields = tuple(name for name in RECORD_FIELDS
+                            if name in requested and name not in KEY_FIELDS)
+
+        needed = set()
+        features = set()
+        pending = list(requested) + list(KEY_FIELDS)
+        while pending:
+            name = pending.pop()
+            if name in FEATURES:
+                features.add(name)
+            elif name not in needed:
+                needed.add(name)
+                pending.extend(SPECS[name].requires)
+        self.alternates = ALTERNATES in features
+        self.images = IMAGES in features
+        self.alt_links = self.alternates or links
+        self.category_links = links
+        # Product-page fields to evaluate, in record order
+        self.page_specs = tuple(SPECS[name] for name in BOOK_FIELDS if name in needed)
+        self.uses_labels = any(spec.labels for spec in self.page_specs)
+
+        # Elements the parser keeps; everything else on the page is dropped
+        classes = {_first_class(selector) for spec in self.page_specs
+                   for selector in spec.selectors}
+        if links:
+            classes.add(_first_class(SPECS["categories"].selectors[0]))
+        if self.uses_labels:
+            classes.add("row")
+        self.classes = frozenset(classes - {None})
+
+    def describe(self):
+        if not self.partial:
+            return "all fields"
+        extras = [feature for feature, used in ((ALTERNATES, self.alternates),
+                                                (IMAGES, self.images)) if used]
+        text = ", ".join(self.fields)
+        return f"{text} (with {' and '.join(extras)})" if extras else text
+
+
+@lru_cache(maxsize=32)
+def _compile(fields, links):
+    return FieldPlan(fields, links)
+
+
+def compile_fields(fields=None, links=False):
+    """The FieldPlan for a field subset (None for every field), built once per subset"""
+    return _compile(None if fields is None else frozenset(fields), links)
+
+
+def parse_field_list(value):
+    """Field names from a comma-separated list, raising ValueError for unknown ones"""
+    fields = tuple(name.strip() for name in value.split(",") if name.strip())
+    compile_fields(fields)
+    return fields
@@ -0,0 +1,374 @@
+"""Pooled, rate-limited and cached HTTP access to wheelersbooks.com.au"""
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .defaults import CACHE_FILE, DEFAULT_CACHE_TTL_HOURS, DEFAULT_WORKERS
+from .metrics import RunMetrics
+from .throttle import (
+    RETRY_EXCEPTIONS,
+    RETRY_STATUSES,
+    THROTTLE_STATUSES,
+    AdaptiveConcurrency,
+    CircuitBreaker,
+    RetryPolicy,
+)
+
+MIN_REQUESTS_PER_SECOND = 0.2
+REQUEST_TIMEOUT = 30
+USER_AGENT = "Mozilla/5.0 (compatible)"
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+
+class RateLimiter:
+    """Per-host requests-per-second cap shared by all worker threads.
+
+    The configured rate is a ceiling: when a host signals congestion the
+    rate for that host is halved (down to MIN_REQUESTS_PER_SECOND) and then
+    climbs back by a twentieth of the ceiling per successful request.
+    defer() pauses a host entirely, e.g. for a Retry-After header.
+    """
+
+    def __init__(self, requests_per_second):
+        self.max_rate = requests_per_second
+        self._rate = {}
+        self._next_slot = {}
+        self._last_decrease = {}
+        self._lock = threading.Lock()
+
+    def rate(self, host):
+        return self._rate.get(host, self.max_rate)
+
+    def wait(self, url):
+        """Block until a request to the host of url is allowed"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            rate = self.rate(host)
+            if rate > 0:
+                self._next_slot[host] = slot + 1.0 / rate
+            elif slot > now:
+                self._next_slot[host] = slot
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, url, seconds):
+        """Hold back every request to the host of url for `seconds`"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._next_slot[host] = max(self._next_slot.get(host, until), until)
+
+    def feedback(self, url, congested):
+        """Adapt the host's rate to the outcome of a request (AIMD)"""
+        if self.max_rate <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            rate = self.rate(host)
+            now = time.monotonic()
+            if congested:
+                if now - self._last_decrease.get(host, 0.0) >= 1.0:
+                    self._rate[host] = max(MIN_REQUESTS_PER_SECOND, rate / 2)
+                    self._last_decrease[host] = now
+            elif rate < self.max_rate:
+                self._rate[host] = min(self.max_rate, rate + self.max_rate / 20)
+
+
+def supported_encodings():
+    """Content encodings urllib3 can decode in this environment"""
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401 - urllib3 decodes br when this is installed
+        encodings.append("br")
+    except ImportError:
+        pass
+    return ", ".join(encodings)
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the page cache"""
+
+    def __init__(self, url, status_code, content, encoding, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers or {}
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+class ResponseCache:
+    """On-disk cache of product pages keyed by URL.
+
+    Bodies are stored zlib-compressed in SQLite. Entries younger than the TTL
+    are served without touching the network; older ones are revalidated with
+    ETag/Last-Modified when the server sent them. The total compressed size
+    is capped and the least recently used entries are evicted first.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl_hours=DEFAULT_CACHE_TTL_HOURS,
+                 max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self.total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def lookup(self, url):
+        """Return the cached row for url as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, body, encoding, etag, last_modified, fetched_at "
+                "FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?",
+                               (time.time(), url))
+            self._conn.commit()
+        status, body, encoding, etag, last_modified, fetched_at = row
+        return {
+            "status": status,
+            "body": body,
+            "encoding": encoding,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+        }
+
+    def count(self, counter):
+        """Increment one of the hits/revalidated/misses counters"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def to_response(self, url, entry):
+        return CachedResponse(url, entry["status"], zlib.decompress(entry["body"]),
+                              entry["encoding"])
+
+    def store(self, url, response):
+        """Cache a successful response and evict old entries if over the size cap"""
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, body, len(body),
+                 response.encoding or response.apparent_encoding,
+                 response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 now, now))
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """Mark a revalidated entry as fresh again"""
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, last_access = ? WHERE url = ?",
+                (now, now, url))
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until 90% of the cap is free
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute(
+            "SELECT url, size FROM responses ORDER BY last_access").fetchall()
+        for url, size in rows:
+            if self.total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.total_bytes -= size
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "bytes": self.total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class HttpSession:
+    """Keep-alive connection pool shared by page, alternate and image fetches.
+
+    Every request goes through the host's circuit breaker, rate limiter and
+    adaptive concurrency limit, and transient failures (connection errors,
+    timeouts, 429 and 5xx) are retried with backoff.
+    """
+
+    def __init__(self, pool_size=DEFAULT_WORKERS, rate_limiter=None, timeout=REQUEST_TIMEOUT,
+                 cache=None, retry=None, metrics=None):
+        self.timeout = timeout
+        self.metrics = metrics or RunMetrics()
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter or RateLimiter(0)
+        self.retry = retry or RetryPolicy()
+        self.cache = cache
+        self.retries = 0
+        self.throttled = 0
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._abort = threading.Event()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": supported_encodings(),
+            "Connection": "keep-alive",
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def host_controls(self, url):
+        """(CircuitBreaker, AdaptiveConcurrency) for the host of url"""
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (CircuitBreaker(), AdaptiveConcurrency(self.pool_size))
+            return self._hosts[host]
+
+    def get(self, url, **kwargs):
+        """Rate-limited GET over the pooled session, retrying transient failures"""
+        kwargs.setdefault("timeout", self.timeout)
+        breaker, concurrency = self.host_controls(url)
+        attempt = 0
+        while True:
+            breaker.before_request(self._abort)
+            self.rate_limiter.wait(url)
+            concurrency.acquire()
+            started = time.monotonic()
+            response = error = None
+            try:
+                response = self.session.get(url, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                error = e
+            finally:
+                status = response.status_code if response is not None else None
+                throttled = status in THROTTLE_STATUSES
+                failed = error is not None or (status is not None and status >= 500)
+                concurrency.release(time.monotonic() - started, congested=throttled or failed)
+                self.rate_limiter.feedback(url, congested=throttled or failed)
+                # A throttling host is up, so only real failures count towards the breaker
+                breaker.record(ok=not failed or (throttled and error is None))
+
+            self.metrics.event(f"http_{status or type(error).__name__}")
+            if error is None and status not in RETRY_STATUSES:
+                if not kwargs.get("stream"):
+                    self.metrics.add_bytes("page", len(response.content))
+                return response
+            if throttled:
+                self.throttled += 1
+                self.metrics.event("throttled")
+
+            attempt += 1
+            delay = None if self._abort.is_set() else self.retry.delay(attempt, response)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            if throttled:
+                self.rate_limiter.defer(url, delay)  # the whole host backs off, not just us
+            if response is not None:
+                response.close()
+            self.retries += 1
+            self.metrics.event("retries")
+            self._abort.wait(delay)
+
+    def abort(self):
+        """Stop retrying and waiting on open circuits (used when a run is stopped)"""
+        self._abort.set()
+
+    def stats(self):
+        """Retry counters and the current adaptive limits per host"""
+        with self._hosts_lock:
+            hosts = {
+                host: {
+                    "requests_per_second": self.rate_limiter.rate(host),
+                    "concurrency": int(concurrency.limit),
+                    "concurrency_decreases": concurrency.decreases,
+                    "circuit_trips": breaker.trips,
+                    "circuit_open": breaker.is_open,
+                }
+                for host, (breaker, concurrency) in self._hosts.items()
+            }
+        return {"retries": self.retries, "throttled": self.throttled, "hosts": hosts}
+
+    def get_page(self, url):
+        """GET a product page through the response cache when one is configured"""
+        if self.cache is None:
+            return self.get(url)
+
+        entry = self.cache.lookup(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.count("hits")
+            self.metrics.event("cache_hits")
+            return self.cache.to_response(url, entry)
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.get(url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.count("revalidated")
+            self.metrics.event("cache_revalidated")
+            self.cache.touch(url)
+            return self.cache.to_response(url, entry)
+
+        self.cache.count("misses")
+        self.metrics.event("cache_misses")
+        # A redirected answer (unknown ISBNs go to search) is not the page at
+        # url: caching it would hide the redirect from later lookups
+        if response.status_code == 200 and not response.history:
+            self.cache.store(url, response)
+        return response
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
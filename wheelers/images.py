@@ -0,0 +1,395 @@
+"""Cover image stage: its own worker pool, streaming writes and a content-addressed store"""
+import hashlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from .defaults import DEFAULT_IMAGE_WORKERS
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif']
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_FOLDER = "thumbnails"
+STORE_FOLDER = ".store"
+INDEX_FILE = ".image_index.sqlite"
+
+# Cover URLs that name a stock "no image" graphic rather than a real cover
+PLACEHOLDER_URL_MARKERS = ("noimage", "no-image", "no_image", "nocover", "no-cover",
+                           "no_cover", "placeholder", "coming-soon", "comingsoon")
+# Spacers and stock graphics are tiny; real covers are never this small
+MIN_COVER_PIXELS = 40
+
+
+def image_dimensions(data):
+    """(width, height) if PIL can verify the image in data (bytes or a path), else None"""
+    try:
+        with Image.open(io.BytesIO(data) if isinstance(data, bytes) else data) as img:
+            img.verify()
+            return img.size
+    except Exception:
+        return None
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_placeholder_url(image_url):
+    path = image_url.split('?')[0].lower()
+    return any(marker in path for marker in PLACEHOLDER_URL_MARKERS)
+
+
+def display_path(filepath):
+    """Absolute path in the platform's native form, as stored in records"""
+    filepath = str(Path(filepath).absolute())
+    if sys.platform not in ['linux', 'darwin']:
+        filepath = filepath.replace("/", "\\")
+    return filepath
+
+
+def image_extension(content_type, image_url):
+    """File extension from the content type, falling back to the URL"""
+    if 'jpeg' in content_type or 'jpg' in content_type:
+        return '.jpg'
+    if 'png' in content_type:
+        return '.png'
+    if 'gif' in content_type:
+        return '.gif'
+    # Try to get extension from URL
+    ext = os.path.splitext(image_url.split('?')[0])[1].lower()
+    if not ext or ext not in IMAGE_EXTENSIONS:
+        ext = '.jpg'  # Default to jpg
+    return ext
+
+
+def make_thumbnail(source, target, size):
+    """Write a thumbnail of source no larger than size x size (process pool task)"""
+    with Image.open(source) as img:
+        img.thumbnail((size, size))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(target, "JPEG", quality=85)
+    return target
+
+
+class ImageStore:
+    """Content-addressed image blobs with a URL -> hash index.
+
+    Each distinct image is stored once as <folder>/.store/<ab>/<sha256><ext>
+    and exposed per ISBN as <folder>/<isbn><ext>, a hard link to the blob (or
+    a copy where the filesystem has no hard links). The SQLite index remembers
+    which hash every cover URL returned, so a URL is only downloaded once
+    across runs, and which hashes are placeholders that must never be stored.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.blob_folder = os.path.join(folder, STORE_FOLDER)
+        os.makedirs(self.blob_folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._closed_stats = None
+        self._conn = sqlite3.connect(os.path.join(folder, INDEX_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                placeholder INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                placeholder INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS isbns (
+                isbn TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            """)
+        self._conn.commit()
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(self.blob_folder, sha256[:2], f"{sha256}{ext}")
+
+    def lookup_url(self, url):
+        """(sha256, ext, is placeholder) previously fetched from url, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blobs.sha256, blobs.ext, blobs.placeholder OR urls.placeholder FROM urls "
+                "JOIN blobs ON blobs.sha256 = urls.sha256 WHERE urls.url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        sha256, ext, placeholder = row
+        if not placeholder and not os.path.exists(self.blob_path(sha256, ext)):
+            return None  # blob deleted by hand, fetch it again
+        return sha256, ext, bool(placeholder)
+
+    def is_placeholder(self, sha256):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT placeholder FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return bool(row and row[0])
+
+    def mark_placeholder(self, sha256, ext=".jpg"):
+        """Treat images with this hash as placeholders from now on"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO blobs VALUES (?, ?, 0, 1) "
+                "ON CONFLICT (sha256) DO UPDATE SET placeholder = 1", (sha256, ext))
+            self._conn.commit()
+        blob = self.blob_path(sha256, ext)
+        if os.path.exists(blob):
+            os.remove(blob)
+
+    def add(self, url, sha256, ext, temp_path=None, placeholder=False):
+        """Record what url returned, moving temp_path into the store if the blob is new.
+
+        A placeholder is remembered for the URL and, if its hash is new, for
+        the hash too. Returns (sha256, ext, True if a new blob was written); a
+        hash that is already stored keeps its original extension.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ext FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            created = row is None and not placeholder
+            if row is None:
+                blob = self.blob_path(sha256, ext)
+                if temp_path is not None and not placeholder:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.chmod(temp_path, 0o644)  # mkstemp files are owner-only
+                    os.replace(temp_path, blob)
+                self._conn.execute("INSERT INTO blobs VALUES (?, ?, ?, ?)",
+                                   (sha256, ext, os.path.getsize(blob) if not placeholder else 0,
+                                    int(placeholder)))
+            else:
+                ext = row[0]
+            self._conn.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)",
+                               (url, sha256, int(placeholder), time.time()))
+            self._conn.commit()
+        return sha256, ext, created
+
+    def link(self, isbn, sha256, ext):
+        """Expose a stored blob as <folder>/<isbn><ext> and return that path"""
+        target = os.path.join(self.folder, f"{isbn}{ext}")
+        temp_target = f"{target}.{threading.get_ident()}.link"
+        blob = self.blob_path(sha256, ext)
+        try:
+            os.link(blob, temp_target)
+        except OSError:
+            shutil.copyfile(blob, temp_target)  # no hard links here (e.g. FAT, some shares)
+        os.replace(temp_target, target)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO isbns VALUES (?, ?)", (isbn, sha256))
+            self._conn.commit()
+        return target
+
+    def stats(self):
+        with self._lock:
+            if self._closed_stats is not None:
+                return self._closed_stats
+            blobs, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs WHERE placeholder = 0"
+            ).fetchone()
+            placeholders = self._conn.execute(
+                "SELECT COUNT(*) FROM blobs WHERE placeholder = 1").fetchone()[0]
+        return {"blobs": blobs, "bytes": size, "placeholder_hashes": placeholders}
+
+    def close(self):
+        if self._closed_stats is None:
+            stats = self.stats()
+            with self._lock:
+                self._closed_stats = stats  # still reported in the run summary
+                self._conn.close()
+
+
+class ImageDownloader:
+    """Downloads cover images on a dedicated pool so they never hold up page scraping.
+
+    Each image is streamed to a temporary file while the bytes are buffered,
+    validated with PIL from the buffer and only then moved into the
+    content-addressed ImageStore, so a crash or a bad response never leaves a
+    broken <isbn>.jpg behind. Existing valid images and cover URLs already in
+    the store are not downloaded again, and placeholder covers are neither
+    stored nor returned as a local path, even when a file of one was left
+    by an earlier run. Thumbnails, if requested, are
+    generated in a process pool.
+    """
+
+    def __init__(self, http, folder, workers=DEFAULT_IMAGE_WORKERS,
+                 thumbnail_size=None, placeholders=(), metrics=None, log=None):
+        self.http = http
+        self.metrics = metrics or http.metrics
+        self.folder = folder
+        self.thumbnail_size = thumbnail_size
+        self.log = log or (lambda message: None)
+        self.downloaded = 0
+        self.reused = 0
+        self.deduplicated = 0
+        self.skipped_existing = 0
+        self.placeholders = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        os.makedirs(folder, exist_ok=True)
+        self.store = ImageStore(folder)
+        for path in placeholders:
+            with open(path, "rb") as f:
+                self.store.mark_placeholder(content_hash(f.read()))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers),
+                                        thread_name_prefix="images")
+        self._thumbnails = None
+        if thumbnail_size:
+            os.makedirs(os.path.join(folder, THUMBNAIL_FOLDER), exist_ok=True)
+            self._thumbnails = ProcessPoolExecutor()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _url_lock(self, image_url):
+        """Lock held while a URL is fetched so concurrent ISBNs sharing it wait for one download"""
+        with self._lock:
+            return self._url_locks.setdefault(image_url, threading.Lock())
+
+    def submit(self, isbn, image_url):
+        """Queue a download, returning a Future for the local path (or None)"""
+        return self._pool.submit(self.download, isbn, image_url)
+
+    def existing_image(self, isbn):
+        """Path of a valid image already saved for isbn, if any.
+
+        Placeholders saved before they were recognised (by an older run, or
+        before --placeholder named them) are deleted, so the cover is fetched
+        again instead.
+        """
+        for ext in IMAGE_EXTENSIONS:
+            filepath = os.path.join(self.folder, f"{isbn}{ext}")
+            if not os.path.exists(filepath):
+                continue
+            with open(filepath, "rb") as f:
+                data = f.read()
+            size = image_dimensions(data)
+            if size is None:
+                continue
+            if self.store.is_placeholder(content_hash(data)) or min(size) < MIN_COVER_PIXELS:
+                os.remove(filepath)
+                continue
+            return filepath
+        return None
+
+    def download(self, isbn, image_url):
+        """Download and save book image"""
+        with self.metrics.timer("image", isbn):
+            return self._download(isbn, image_url)
+
+    def _download(self, isbn, image_url):
+        try:
+            # A URL known to serve a placeholder never yields a cover, saved or not
+            entry = self.store.lookup_url(image_url)
+            if is_placeholder_url(image_url) or (entry is not None and entry[2]):
+                self._count("placeholders")
+                return None
+
+            filepath = self.existing_image(isbn)
+            if filepath is not None:
+                self._count("skipped_existing")
+                return display_path(filepath)
+
+            with self._url_lock(image_url):
+                try:
+                    entry = self.store.lookup_url(image_url)
+                    if entry is None:
+                        entry = self.fetch(isbn, image_url)
+                        if entry is None:
+                            return None
+                    else:
+                        self._count("reused")
+                finally:
+                    with self._lock:
+                        self._url_locks.pop(image_url, None)
+            sha256, ext, placeholder = entry
+            if placeholder:
+                self._count("placeholders")
+                return None
+
+            filepath = self.store.link(isbn, sha256, ext)
+            self.log(f"Saved image: {os.path.basename(filepath)}")
+            self.make_thumbnail(isbn, filepath)
+            return display_path(filepath)
+
+        except Exception as e:
+            self._count("failed")
+            self.log(f"Failed to download image for ISBN {isbn}: {str(e)}")
+            return None
+
+    def fetch(self, isbn, image_url):
+        """Download image_url into the store, returning (sha256, ext, is placeholder) or None"""
+        with self.http.get(image_url, stream=True) as response:
+            response.raise_for_status()
+            ext = image_extension(response.headers.get('content-type', ''), image_url)
+
+            buffer = io.BytesIO()
+            fd, temp_path = tempfile.mkstemp(dir=self.store.blob_folder, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        buffer.write(chunk)
+                data = buffer.getvalue()
+                self.metrics.add_bytes("image", len(data), isbn)
+                size = image_dimensions(data)
+                if size is None:
+                    self._count("failed")
+                    return None
+
+                sha256 = content_hash(data)
+                placeholder = (self.store.is_placeholder(sha256)
+                               or is_placeholder_url(image_url)
+                               or min(size) < MIN_COVER_PIXELS)
+                sha256, ext, created = self.store.add(image_url, sha256, ext, temp_path,
+                                                      placeholder=placeholder)
+                if created:
+                    self._count("downloaded")
+                elif not placeholder:
+                    self._count("deduplicated")
+                return sha256, ext, placeholder
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def make_thumbnail(self, isbn, filepath):
+        if self._thumbnails is None:
+            return
+        target = os.path.join(self.folder, THUMBNAIL_FOLDER, f"{isbn}.jpg")
+        future = self._thumbnails.submit(make_thumbnail, filepath, target, self.thumbnail_size)
+        future.add_done_callback(
+            lambda f: f.exception() and self.log(
+                f"Failed to create thumbnail for ISBN {isbn}: {f.exception()}"))
+
+    def stats(self):
+        return {
+            "downloaded": self.downloaded,
+            "reused": self.reused,
+            "deduplicated": self.deduplicated,
+            "skipped_existing": self.skipped_existing,
+            "placeholders": self.placeholders,
+            "failed": self.failed,
+            "store": self.store.stats(),
+        }
+
+    def close(self, wait=True):
+        self._pool.shutdown(wait=wait)
+        if self._thumbnails is not None:
+            self._thumbnails.shutdown(wait=wait)
+        self.store.close()
@@ -0,0 +1,190 @@
+"""Streaming, validating ISBN loader for CSV and Excel files"""
+import csv
+import os
+import re
+
+MAX_REJECTED_SAMPLES = 20
+
+_FLOAT_TEXT = re.compile(r"(\d+)\.0*")
+_SEPARATORS = re.compile(r"[\s\-]")
+
+
+def isbn10_is_valid(isbn):
+    """Check the mod-11 checksum of a 10 character ISBN (X allowed last)"""
+    if not re.fullmatch(r"\d{9}[\dX]", isbn):
+        return False
+    total = sum((10 - i) * int(c) for i, c in enumerate(isbn[:9]))
+    total += 10 if isbn[9] == "X" else int(isbn[9])
+    return total % 11 == 0
+
+
+def isbn13_check_digit(first12):
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def isbn13_is_valid(isbn):
+    """Check prefix and mod-10 checksum of a 13 digit ISBN"""
+    return (len(isbn) == 13 and isbn.isdigit() and isbn[:3] in ("978", "979")
+            and isbn13_check_digit(isbn[:12]) == isbn[12])
+
+
+def isbn10_to_isbn13(isbn):
+    first12 = "978" + isbn[:9]
+    return first12 + isbn13_check_digit(first12)
+
+
+def normalize_isbn(value):
+    """Return value as a checked ISBN-13 string, or None if it is not an ISBN.
+
+    Accepts hyphenated/spaced forms, ISBN-10 (converted to ISBN-13) and the
+    float renderings spreadsheets produce ("9780300186116.0", 300186118.0
+    for an ISBN-10 that lost its leading zero).
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if not value.is_integer():
+            return None
+        value = int(value)
+    if isinstance(value, int):
+        text = str(value)
+        if len(text) == 9:
+            text = text.zfill(10)
+    else:
+        text = _SEPARATORS.sub("", str(value)).upper()
+        match = _FLOAT_TEXT.fullmatch(text)
+        if match:
+            text = match.group(1)
+
+    if len(text) == 10 and isbn10_is_valid(text):
+        return isbn10_to_isbn13(text)
+    if isbn13_is_valid(text):
+        return text
+    return None
+
+
+class IsbnLoadReport:
+    """Counts of what the loader kept and rejected"""
+
+    def __init__(self):
+        self.rows = 0
+        self.valid = 0
+        self.blank = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.rejected_samples = []
+
+    @property
+    def rejected(self):
+        return self.invalid + self.duplicates
+
+    def describe(self):
+        return (f"{self.valid} ISBNs loaded from {self.rows} rows "
+                f"({self.duplicates} duplicates, {self.invalid} invalid, {self.blank} blank skipped)")
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "valid": self.valid,
+            "blank": self.blank,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "rejected_samples": self.rejected_samples,
+        }
+
+
+def _isbn_column(header):
+    """Index of the ISBN column (case insensitive), else the first column"""
+    for i, col in enumerate(header):
+        if col is not None and 'isbn' in str(col).lower():
+            return i
+    return 0
+
+
+def _iter_csv_column(file_path):
+    with open(file_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        col = _isbn_column(header)
+        for row in reader:
+            yield row[col] if col < len(row) else None
+
+
+def _iter_xlsx_column(file_path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        col = _isbn_column(header)
+        for row in rows:
+            yield row[col] if col < len(row) else None
+    finally:
+        workbook.close()
+
+
+def _iter_xls_column(file_path):
+    import xlrd
+
+    workbook = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        if sheet.nrows == 0:
+            return
+        col = _isbn_column(sheet.row_values(0))
+        for i in range(1, sheet.nrows):
+            yield sheet.cell_value(i, col) if col < sheet.ncols else None
+    finally:
+        workbook.release_resources()
+
+
+def iter_raw_values(file_path):
+    """Stream the raw ISBN column values of a CSV or Excel file"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".xls":
+        return _iter_xls_column(file_path)
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_xlsx_column(file_path)
+    return _iter_csv_column(file_path)
+
+
+def iter_isbn_file(file_path, report=None):
+    """Yield normalised, de-duplicated ISBN-13s from a file, streaming.
+
+    Blank, invalid and duplicate rows are dropped before any network work
+    and counted in `report` (an IsbnLoadReport) when one is given.
+    """
+    report = report if report is not None else IsbnLoadReport()
+    seen = set()
+    for value in iter_raw_values(file_path):
+        report.rows += 1
+        if value is None or not str(value).strip():
+            report.blank += 1
+            continue
+
+        isbn = normalize_isbn(value)
+        if isbn is None:
+            report.invalid += 1
+            if len(report.rejected_samples) < MAX_REJECTED_SAMPLES:
+                report.rejected_samples.append(str(value))
+            continue
+
+        key = int(isbn)  # ints keep the de-duplication set compact
+        if key in seen:
+            report.duplicates += 1
+            continue
+        seen.add(key)
+        report.valid += 1
+        yield isbn
+
+
+def read_isbn_file(file_path):
+    """Return (ISBNs, IsbnLoadReport) for a CSV or Excel file"""
+    report = IsbnLoadReport()
+    return list(iter_isbn_file(file_path, report)), report
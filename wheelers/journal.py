@@ -0,0 +1,123 @@
+"""Append-only JSONL journal of completed records, for crash-safe resumable runs"""
+import json
+import os
+import time
+
+FSYNC_EVERY = 50
+FSYNC_INTERVAL = 2.0
+
+
+def journal_path_for(input_path):
+    """Default journal location for an ISBN input file"""
+    return f"{input_path}.journal.jsonl"
+
+
+class RunJournal:
+    """Appends one line per completed ISBN and fsyncs in batches.
+
+    Each line is {"input": <requested ISBN>, "record": {...}}. The file is
+    only ever appended to, so a crash loses at most the records written
+    since the last fsync and can leave at most one torn final line, which
+    the readers below ignore.
+    """
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.written = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file = open(path, "a", encoding="utf-8")
+        if self._ends_mid_line(path):
+            # Terminate a torn line left by a crash so the next entry stays readable
+            self._file.write("\n")
+
+    @staticmethod
+    def _ends_mid_line(path):
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def append(self, isbn, record):
+        self._file.write(json.dumps({"input": isbn, "record": record}, ensure_ascii=False) + "\n")
+        self.written += 1
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """Flush buffered lines to disk"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def iter_entries(path):
+    """Yield (input ISBN, record) for every complete line in a journal"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn write from a crash
+            yield entry["input"], entry["record"]
+
+
+def completed_isbns(path):
+    """Input ISBNs that already have a successful record in the journal"""
+    done = set()
+    for isbn, record in iter_entries(path):
+        if 'error' in record:
+            done.discard(isbn)
+        else:
+            done.add(isbn)
+    return done
+
+
+def iter_latest(path, include_partial=False):
+    """Yield (input ISBN, record) for the latest full entry per ISBN, in journal order.
+
+    Re-scraped ISBNs appear more than once in an append-only journal; only
+    their last entry is returned. Partial records from a refresh (which
+    carry "refreshed_fields") are skipped unless include_partial is set, in
+    which case the latest partial record is yielded too, so applying the
+    records in order (e.g. as database upserts) gives the current data.
+    Two passes keep memory to one line number per ISBN instead of every
+    record.
+    """
+    latest = {}
+    for line_no, (isbn, record) in enumerate(iter_entries(path)):
+        partial = "refreshed_fields" in record
+        if include_partial or not partial:
+            latest[isbn, partial] = line_no
+    for line_no, (isbn, record) in enumerate(iter_entries(path)):
+        if latest.get((isbn, "refreshed_fields" in record)) == line_no:
+            yield isbn, record
+
+
+def iter_records(path):
+    """Yield the latest record per input ISBN, in journal order"""
+    for _, record in iter_latest(path):
+        yield record
+
+
+def skip_completed(isbns, done, counter):
+    """Filter out ISBNs in `done`, counting skips in counter["skipped"]"""
+    for isbn in isbns:
+        if isbn in done:
+            counter["skipped"] += 1
+            continue
+        yield isbn
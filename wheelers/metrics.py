@@ -0,0 +1,213 @@
+"""Per-stage timing, byte and event counters for a run, exportable as Prometheus text and JSON"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cached parse to a slow image download
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_HELP = {
+    "page_fetch": "HTTP fetch of a product or alternate-format page (cache hits included)",
+    "parse": "parsing of one product page",
+    "alternates": "alternate-format lookups for one ISBN",
+    "image": "cover image download and store for one ISBN",
+    "journal": "run journal append for one ISBN",
+    "db_flush": "database upsert of one batch",
+    "isbn": "metadata scrape of one ISBN, end to end",
+}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (not thread-safe; RunMetrics locks around it)"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class RunMetrics:
+    """Thread-safe per-stage latency histograms and counters for one run.
+
+    Stages are timed with `with metrics.timer("parse"):` from any thread.
+    While a worker thread is inside track(isbn), its timings, bytes and
+    events are also added to that ISBN's row, which finish_isbn() writes to
+    the optional per-ISBN JSONL log.
+    """
+
+    def __init__(self, isbn_log=None):
+        self.started = time.time()
+        self.stages = {}
+        self.bytes = {}
+        self.events = {}
+        self._rows = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._isbn_log = open(isbn_log, "w", encoding="utf-8") if isbn_log else None
+
+    def _row(self, isbn):
+        isbn = isbn or getattr(self._local, "isbn", None)
+        if isbn is None:
+            return None
+        return self._rows.setdefault(isbn, {"isbn": isbn, "stages": {}, "bytes": 0, "events": {}})
+
+    @contextmanager
+    def track(self, isbn):
+        """Attribute everything recorded on this thread to isbn"""
+        previous = getattr(self._local, "isbn", None)
+        self._local.isbn = isbn
+        try:
+            yield
+        finally:
+            self._local.isbn = previous
+
+    @contextmanager
+    def timer(self, stage, isbn=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, isbn)
+
+    def observe(self, stage, seconds, isbn=None):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+            row = self._row(isbn)
+            if row is not None:
+                row["stages"][stage] = round(row["stages"].get(stage, 0.0) + seconds, 6)
+
+    def add_bytes(self, kind, count, isbn=None):
+        with self._lock:
+            self.bytes[kind] = self.bytes.get(kind, 0) + count
+            row = self._row(isbn)
+            if row is not None:
+                row["bytes"] += count
+
+    def event(self, name, count=1, isbn=None):
+        with self._lock:
+            self.events[name] = self.events.get(name, 0) + count
+            row = self._row(isbn)
+            if row is not None:
+                row["events"][name] = row["events"].get(name, 0) + count
+
+    def finish_isbn(self, isbn, record):
+        """Close the ISBN's row and write it to the per-ISBN log"""
+        with self._lock:
+            row = self._rows.pop(isbn, None)
+            if row is None or self._isbn_log is None:
+                return
+            row["error"] = record.get("error")
+            self._isbn_log.write(json.dumps(row) + "\n")
+
+    def snapshot(self):
+        """JSON-friendly view of every histogram and counter"""
+        with self._lock:
+            return {
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "stages": {stage: h.as_dict() for stage, h in self.stages.items()},
+                "bytes": dict(self.bytes),
+                "events": dict(self.events),
+            }
+
+    def to_prometheus(self, summary=None):
+        """Prometheus text exposition of the metrics plus numeric run summary values"""
+        lines = [
+            "# HELP wheelers_stage_seconds Time spent per pipeline stage",
+            "# TYPE wheelers_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'wheelers_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'wheelers_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'wheelers_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'wheelers_stage_seconds_count{{stage="{stage}"}} {h.count}')
+            lines += ["# HELP wheelers_bytes_total Bytes received from the network",
+                      "# TYPE wheelers_bytes_total counter"]
+            lines += [f'wheelers_bytes_total{{kind="{kind}"}} {n}'
+                      for kind, n in sorted(self.bytes.items())]
+            lines += ["# HELP wheelers_events_total Requests, retries, cache hits and other events",
+                      "# TYPE wheelers_events_total counter"]
+            lines += [f'wheelers_events_total{{event="{name}"}} {n}'
+                      for name, n in sorted(self.events.items())]
+        if summary:
+            lines += ["# HELP wheelers_run Run summary values",
+                      "# TYPE wheelers_run gauge"]
+            lines += [f'wheelers_run{{name="{name}"}} {value}'
+                      for name, value in sorted(flatten(summary).items())]
+        return "\n".join(lines) + "\n"
+
+    def write(self, prefix, summary=None):
+        """Write PREFIX.prom and PREFIX.json, returning their paths"""
+        prom_path, json_path = f"{prefix}.prom", f"{prefix}.json"
+        with open(prom_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(summary))
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary or {}, "metrics": self.snapshot()}, f, indent=2)
+        return prom_path, json_path
+
+    def log_stages(self, log):
+        """Log count, mean and p90 for every stage"""
+        for stage, stats in self.snapshot()["stages"].items():
+            log(f"  {stage}: {stats['count']} x {stats['mean'] * 1000:.1f} ms mean, "
+                f"p90 {stats['p90'] * 1000:.1f} ms, total {stats['sum']:.1f} s")
+
+    def close(self):
+        with self._lock:
+            if self._isbn_log is not None:
+                self._isbn_log.close()
+                self._isbn_log = None
+
+
+def flatten(summary, prefix=""):
+    """Numeric leaves of a nested summary dict as {"a_b_c": value}"""
+    values = {}
+    for key, value in summary.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}_"))
+        elif isinstance(value, bool):
+            values[name] = int(value)
+        elif isinstance(value, (int, float)):
+            values[name] = value
+    return {name.replace(".", "_").replace(":", "_").replace("-", "_"): value
+            for name, value in values.items()}
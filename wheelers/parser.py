@@ -0,0 +1,215 @@
+"""Product page parsing: HTML in, plain book data out"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .fields import ALTERNATE_PRICE_SELECTORS, SPECS, compile_fields
+
+SITE_URL = "https://www.wheelersbooks.com.au"
+PRODUCT_URL = SITE_URL + "/product/"
+
+
+def default_html_parser():
+    """Prefer lxml for speed, falling back to the stdlib parser"""
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+HTML_PARSER = default_html_parser()
+
+LINK_STRAINER = SoupStrainer("a", href=True)
+ISBN_KEY = re.compile(r"\d{9}[\dX]|\d{13}")
+
+
+class LabelIndex:
+    """Label -> value index built from one walk over a product page.
+
+    Mirrors the old `div.row:has(label:contains(X)) span` and
+    `tr:has(th:contains(X)) td` selectors: a label matches when it contains
+    the requested text, the first matching row in document order wins, and
+    labelled rows are preferred over table rows.
+    """
+
+    def __init__(self, soup):
+        self.rows = self._collect(soup.find_all("div", class_="row"), "label", "span")
+        self.table_rows = self._collect(soup.find_all("tr"), "th", "td")
+        self._cache = {}
+
+    @staticmethod
+    def _collect(elements, label_tag, value_tag):
+        entries = []
+        for element in elements:
+            labels = [label.get_text() for label in element.find_all(label_tag)]
+            if not labels:
+                continue
+            value = element.find(value_tag)
+            if value is not None:
+                entries.append((labels, value.get_text(strip=True)))
+        return entries
+
+    @staticmethod
+    def _find(entries, label):
+        for labels, value in entries:
+            if any(label in text for text in labels):
+                return value
+        return None
+
+    def get(self, label):
+        """Value for the first row whose label contains `label`, or None"""
+        if label not in self._cache:
+            self._cache[label] = (self._find(self.rows, label)
+                                  or self._find(self.table_rows, label))
+        return self._cache[label]
+
+
+def product_key(url):
+    """Memo key for a product URL: its ISBN when the URL ends in one"""
+    path = urlsplit(url).path.rstrip("/")
+    last = path.rsplit("/", 1)[-1]
+    if ISBN_KEY.fullmatch(last.upper()):
+        return last.upper()
+    return urljoin(SITE_URL, path)
+
+
+def _is_plan_element(plan, name, attrs):
+    if name == "tr":
+        return plan.uses_labels
+    if attrs.get("id") == "allAltFormats":
+        return plan.alt_links
+    classes = attrs.get("class") or ""
+    if isinstance(classes, str):
+        classes = classes.split()
+    return not plan.classes.isdisjoint(classes)
+
+
+@lru_cache(maxsize=32)
+def plan_strainer(plan):
+    """SoupStrainer keeping only the elements a FieldPlan reads"""
+    return SoupStrainer(lambda name, attrs: _is_plan_element(plan, name, attrs))
+
+
+def _absolute_image_url(soup, selector, url):
+    img_el = soup.select_one(selector)
+    if not img_el or not img_el.get("src"):
+        return None
+    src = img_el["src"]
+    # make it absolute
+    if src.startswith("//"):
+        return "https:" + src
+    return urljoin(url, src)
+
+
+def parse_product_page(html, url, plan=None):
+    """Extract book fields and alternate-format links from a product page.
+
+    Only the fields of `plan` (a FieldPlan, every field by default) are
+    parsed. Returns plain data only ({"record": {...}, "alt_links": [...],
+    "category_links": [...]}, plus "alternate_price" when the plan fetches
+    alternates) so the result can be memoized and shared between ISBNs.
+    """
+    if plan is None:
+        plan = compile_fields(links=True)
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=plan_strainer(plan))
+    grab = LabelIndex(soup).get if plan.uses_labels else None
+
+    def safe_text(selector: str):
+        el = soup.select_one(selector)
+        return el.get_text(strip=True) if el else None
+
+    def text_field(labels, selectors):
+        value = None
+        for label in labels:
+            value = grab(label)
+            if value:
+                return value
+        for selector in selectors:
+            value = safe_text(selector)
+            if value:
+                return value
+        return value
+
+    category_links = None
+    if plan.category_links:
+        category_links = soup.select(SPECS["categories"].selectors[0])
+
+    record = {}
+    for spec in plan.page_specs:
+        value = None
+        if spec.extract is None:
+            value = text_field(spec.labels, spec.selectors)
+        elif spec.extract == "categories":
+            if category_links is None:
+                category_links = soup.select(spec.selectors[0])
+            categories = [a.get_text(strip=True) for a in category_links]
+            value = ", ".join(categories) if categories else None
+        elif spec.extract == "image_url":
+            value = _absolute_image_url(soup, spec.selectors[0], url)
+        elif spec.extract == "timestamp":
+            value = datetime.now().isoformat()
+        record[spec.name] = value
+
+    alt_links = []
+    if plan.alt_links:
+        own_key = product_key(url)
+        for link in soup.select('#allAltFormats ul li a[href*="/product/"]'):
+            href = link.get("href")
+            if not href:
+                continue
+            href = urljoin(url, href)
+            if product_key(href) != own_key and href not in alt_links:
+                alt_links.append(href)
+
+    category_urls = []
+    if plan.category_links:
+        for link in category_links:
+            href = urljoin(url, link.get("href", "")).split("#")[0]
+            if href not in category_urls:
+                category_urls.append(href)
+    page = {"record": record, "alt_links": alt_links, "category_links": category_urls}
+    if plan.alternates and "price" in record:
+        page["alternate_price"] = text_field(SPECS["price"].labels, ALTERNATE_PRICE_SELECTORS)
+    return page
+
+
+def parse_product_bytes(content, encoding, url, fields=None, links=True):
+    """parse_product_page for a raw response body (process pool task)"""
+    return parse_product_page(content.decode(encoding or "utf-8", errors="replace"), url,
+                              compile_fields(fields, links))
+
+
+def parse_listing_page(html, url):
+    """Product ISBNs and category links on a category page, in page order.
+
+    Only anchors are parsed. Pagination links are category links like any
+    other; the crawler tells them apart by their path.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=LINK_STRAINER)
+    products = []
+    categories = []
+    for link in soup.find_all("a", href=True):
+        href = urljoin(url, link["href"]).split("#")[0]
+        path = urlsplit(href).path
+        if "/product/" in path:
+            key = product_key(href)
+            if ISBN_KEY.fullmatch(key) and key not in products:
+                products.append(key)
+        elif "/category/" in path and href not in categories:
+            categories.append(href)
+    return {"products": products, "categories": categories}
+
+
+def alternate_fields(page):
+    """Flattened alternate_* columns describing another edition's parsed page"""
+    record = page["record"]
+    return {
+        "alternate_edition": record.get("edition"),
+        "alternate_isbn": record.get("isbn"),
+        "alternate_isbn_pub_date": record.get("published"),
+        "alternate_isbn_price": page.get("alternate_price", record.get("price")),
+    }
@@ -0,0 +1,105 @@
+"""Optional per-run profilers covering the scraper's worker threads"""
+import cProfile
+import collections
+import os
+import pstats
+import re
+import sys
+import threading
+
+SAMPLE_INTERVAL = 0.005
+POOL_THREAD_SUFFIX = re.compile(r"_\d+$")
+
+
+class SamplingProfiler:
+    """Samples the stack of every thread at a fixed interval.
+
+    Cheap enough to leave on for a whole run. write() produces collapsed
+    stacks ("thread;outer;...;inner count" per line), which flamegraph.pl,
+    speedscope and similar tools read directly.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Pool threads are named like "scraper_3"; merge them into one root
+                thread = POOL_THREAD_SUFFIX.sub("", names.get(ident, "thread"))
+                self._stacks[";".join([thread] + stack[::-1])] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ThreadedCProfile:
+    """cProfile for the calling thread and every thread started while it runs.
+
+    Before Python 3.12 each thread gets its own profiler (installed through
+    threading.setprofile); write() merges them into one pstats file for
+    snakeviz or pstats.
+    """
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _bootstrap(self, frame, event, arg):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._bootstrap)
+        # From 3.12 cProfile uses sys.monitoring: one profiler sees every thread
+        self._bootstrap(None, None, None)
+
+    def stop(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+        with self._lock:
+            for profile in self._profiles:
+                profile.disable()
+
+    def write(self, path):
+        with self._lock:
+            pstats.Stats(*self._profiles).dump_stats(path)
+
+
+def start_profiler(path):
+    """Start the profiler implied by path: cProfile for .prof/.pstats, else sampling"""
+    if os.path.splitext(path)[1] in (".prof", ".pstats"):
+        profiler = ThreadedCProfile()
+    else:
+        profiler = SamplingProfiler()
+    profiler.start()
+    return profiler
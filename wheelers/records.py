@@ -0,0 +1,205 @@
+"""Scraped record layout and a compact column-oriented store for many records"""
+from array import array
+from datetime import datetime, timedelta
+
+EMPTY_ALTERNATE = {
+    "alternate_edition": None,
+    "alternate_isbn": None,
+    "alternate_isbn_pub_date": None,
+    "alternate_isbn_price": None,
+}
+# Column order of a scraped record, as written to exports and the database
+BOOK_FIELDS = (
+    "isbn", "title", "author", "illustrator",
+    "publisher", "published", "published_imported", "replaced_by", "language", "series",
+    "interest_age", "ar_level", "premiers_reading_challenge", "imprint",
+    "publication_country", "edition",
+    "page_count", "dimensions", "weight", "dewey_code", "reading_age",
+    "library_of_congress", "nbs_text", "onix_text",
+    "price", "full_description", "categories", "image_url", "local_image_path", "scraped_at",
+)
+RECORD_FIELDS = BOOK_FIELDS + tuple(EMPTY_ALTERNATE) + ("all_alternates",)
+# Set on failed records instead of the book fields
+ERROR_FIELDS = ("error", "error_class")
+# Every key a stored record can have in a column; anything else goes to a side table
+STORE_FIELDS = RECORD_FIELDS + ERROR_FIELDS
+# Set on partial records from a field refresh, which carry no scraped_at
+REFRESH_FIELDS = ("refreshed_at", "refreshed_fields")
+TIMESTAMP_FIELDS = ("scraped_at",)
+
+# A column stops interning once it has more distinct values than this share of
+# its rows, checked from INTERN_CHECK_ROWS rows on
+INTERN_MAX_RATIO = 0.5
+INTERN_CHECK_ROWS = 1024
+_EPOCH = datetime(1970, 1, 1)
+_NO_TIME = -2 ** 63
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class _InternedColumn:
+    """One 4-byte code per row into a table of the distinct values"""
+
+    __slots__ = ("codes", "values", "index")
+
+    def __init__(self):
+        self.codes = array("I")
+        self.values = [None]
+        self.index = {(type(None), None): 0}
+
+    def append(self, value):
+        # Keyed by type too, so 1, 1.0 and True stay distinct
+        key = (type(value), value)
+        code = self.index.get(key)
+        if code is None:
+            code = self.index[key] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+    def worth_keeping(self):
+        rows = len(self.codes)
+        return rows < INTERN_CHECK_ROWS or len(self.values) <= rows * INTERN_MAX_RATIO
+
+
+class _TimestampColumn:
+    """ISO timestamps as int64 microseconds since 1970, turned back into the same strings"""
+
+    __slots__ = ("micros",)
+
+    def __init__(self):
+        self.micros = array("q")
+
+    @staticmethod
+    def encode(value):
+        """Microseconds for value, or None if it wouldn't round-trip exactly"""
+        if value is None:
+            return _NO_TIME
+        if not isinstance(value, str):
+            return None
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if moment.tzinfo is not None or moment.isoformat() != value:
+            return None
+        return (moment - _EPOCH) // _MICROSECOND
+
+    @staticmethod
+    def decode(micros):
+        if micros == _NO_TIME:
+            return None
+        return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+    def append(self, value):
+        micros = self.encode(value)
+        if micros is None:
+            raise ValueError(value)
+        self.micros.append(micros)
+
+    def __getitem__(self, row):
+        return self.decode(self.micros[row])
+
+    def __iter__(self):
+        return map(self.decode, self.micros)
+
+
+class RecordStore:
+    """Scraped records kept column by column, with the append/iterate API of a list.
+
+    A list of record dicts pays for a ~35-key dict per row plus a separate
+    string object for every repeated value. Here each field of STORE_FIELDS
+    is a column: low-cardinality text (publisher, language, price, ...) is
+    interned to 4-byte codes, scraped_at is kept as an int64, and columns
+    whose values are mostly distinct (titles, descriptions) fall back to
+    plain lists. A bitmask per row remembers which keys the record had, and
+    keys outside the schema go to a side table. Reading a row builds an
+    equal dict, so code written for lists of dicts keeps working, while
+    exporters can read tuples straight from the columns with iter_rows().
+    """
+
+    def __init__(self, records=()):
+        self.clear()
+        self.extend(records)
+
+    def clear(self):
+        self._columns = {field: (_TimestampColumn() if field in TIMESTAMP_FIELDS
+                                 else _InternedColumn())
+                         for field in STORE_FIELDS}
+        self._present = array("Q")
+        self._extras = {}
+        self._rows = 0
+
+    def append(self, record):
+        mask = 0
+        bit = 1
+        columns = self._columns
+        for field in STORE_FIELDS:
+            if field in record:
+                mask |= bit
+                value = record[field]
+            else:
+                value = None
+            bit <<= 1
+            try:
+                columns[field].append(value)
+            except (TypeError, ValueError):
+                # Unhashable or non-canonical value: keep this column as plain values
+                column = columns[field] = list(columns[field])
+                column.append(value)
+        self._present.append(mask)
+        extras = {key: value for key, value in record.items() if key not in self._columns}
+        if extras:
+            self._extras[self._rows] = extras
+        self._rows += 1
+        if self._rows % INTERN_CHECK_ROWS == 0:
+            self._drop_poor_interning()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def _drop_poor_interning(self):
+        for field, column in self._columns.items():
+            if isinstance(column, _InternedColumn) and not column.worth_keeping():
+                self._columns[field] = list(column)
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._rows
+        if not 0 <= row < self._rows:
+            raise IndexError("record index out of range")
+        mask = self._present[row]
+        record = {field: self._columns[field][row]
+                  for bit, field in enumerate(STORE_FIELDS) if mask >> bit & 1}
+        record.update(self._extras.get(row, ()))
+        return record
+
+    def __iter__(self):
+        for row in range(self._rows):
+            yield self[row]
+
+    def iter_rows(self, fields):
+        """Yield a tuple of `fields` per record (None where missing), without building dicts"""
+        columns = [iter(self._columns[field]) if field in self._columns
+                   else self._iter_extra(field) for field in fields]
+        return zip(*columns)
+
+    def _iter_extra(self, field):
+        for row in range(self._rows):
+            yield self._extras.get(row, {}).get(field)
+
+    def stats(self):
+        """How each column is stored, for diagnostics"""
+        return {field: (f"interned ({len(column.values)} values)"
+                        if isinstance(column, _InternedColumn)
+                        else "timestamps" if isinstance(column, _TimestampColumn)
+                        else "plain")
+                for field, column in self._columns.items()}
@@ -0,0 +1,137 @@
+"""Incremental refresh: only re-scrape ISBNs whose stored record is stale"""
+from datetime import datetime, timedelta
+from itertools import islice
+
+from .journal import iter_entries
+
+DEFAULT_MAX_AGE_HOURS = 24 * 30
+# Fields that change often enough to be refreshed on their own schedule
+VOLATILE_FIELDS = ("price",)
+LOOKUP_BATCH = 500
+
+FULL = "full"
+FIELDS = "fields"
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+
+class DatabaseTimestamps:
+    """Last scrape/refresh times per ISBN from the wheelers_books table"""
+
+    def __init__(self, db_config):
+        from .db import get_engine
+
+        self.engine = get_engine(db_config)
+        self.source = "database"
+
+    def lookup(self, isbns):
+        """{isbn: (scraped_at, refreshed_at)} for the ISBNs that have a row"""
+        from sqlalchemy import select
+
+        from .db import books_table
+
+        columns = books_table.c
+        query = (select(columns.isbn, columns.scraped_at, columns.refreshed_at)
+                 .where(columns.isbn.in_(list(isbns))))
+        with self.engine.connect() as conn:
+            return {isbn: (scraped_at, refreshed_at or scraped_at)
+                    for isbn, scraped_at, refreshed_at in conn.execute(query)}
+
+
+class JournalTimestamps:
+    """Last scrape/refresh times per ISBN from a run journal"""
+
+    def __init__(self, path):
+        self.source = path
+        self._times = {}
+        for isbn, record in iter_entries(path):
+            if 'error' in record:
+                continue
+            scraped_at, refreshed_at = self._times.get(isbn, (None, None))
+            if "refreshed_fields" in record:
+                refreshed_at = _timestamp(record.get("refreshed_at"))
+            else:
+                scraped_at = refreshed_at = _timestamp(record.get("scraped_at"))
+            self._times[isbn] = (scraped_at, refreshed_at)
+
+    def lookup(self, isbns):
+        return {isbn: self._times[isbn] for isbn in isbns if isbn in self._times}
+
+
+class RefreshPlan:
+    """Decides for each input ISBN whether it needs scraping.
+
+    An ISBN is scraped in full when it has never been scraped or its record
+    is older than max_age. When `fields` are given, a record younger than
+    that whose fields were last refreshed more than fields_max_age ago has
+    only those fields refreshed (the product page is fetched, alternates and
+    images are not). Everything else is skipped as fresh.
+    """
+
+    def __init__(self, timestamps, max_age_hours=DEFAULT_MAX_AGE_HOURS, fields=(),
+                 fields_max_age_hours=None, now=None):
+        self.timestamps = timestamps
+        self.max_age = timedelta(hours=max_age_hours)
+        self.fields = tuple(fields)
+        self.fields_max_age = (timedelta(hours=fields_max_age_hours)
+                               if fields_max_age_hours is not None else None)
+        self.now = now or datetime.now()
+        self.counts = {"new": 0, "full": 0, "fields": 0, "fresh": 0}
+        self._partial = set()
+
+    def decide(self, scraped_at, refreshed_at):
+        if scraped_at is None:
+            return FULL
+        if self.now - scraped_at > self.max_age:
+            return FULL
+        if (self.fields and self.fields_max_age is not None
+                and self.now - (refreshed_at or scraped_at) > self.fields_max_age):
+            return FIELDS
+        return None
+
+    def filter(self, isbns):
+        """Yield the ISBNs that need scraping, looking them up in batches"""
+        isbns = iter(isbns)
+        while True:
+            batch = list(islice(isbns, LOOKUP_BATCH))
+            if not batch:
+                return
+            known = self.timestamps.lookup(batch)
+            for isbn in batch:
+                if isbn not in known:
+                    self.counts["new"] += 1
+                    yield isbn
+                    continue
+                decision = self.decide(*known[isbn])
+                if decision is None:
+                    self.counts["fresh"] += 1
+                    continue
+                self.counts[decision] += 1
+                if decision == FIELDS:
+                    self._partial.add(isbn)
+                yield isbn
+
+    def fields_for(self, isbn):
+        """The fields to refresh for isbn, or None for a full scrape"""
+        if isbn in self._partial:
+            self._partial.discard(isbn)
+            return self.fields
+        return None
+
+    def describe(self):
+        counts = self.counts
+        text = (f"{counts['new']} new, {counts['full']} stale (full scrape), "
+                f"{counts['fresh']} fresh skipped")
+        if self.fields:
+            text += f", {counts['fields']} with only {', '.join(self.fields)} refreshed"
+        return f"Refresh from {self.timestamps.source}: {text}"
+
+    def as_dict(self):
+        return {"source": str(self.timestamps.source), **self.counts}
@@ -0,0 +1,172 @@
+"""Retry, adaptive concurrency and circuit breaking for requests to one host"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+DEFAULT_RETRIES = 3
+BASE_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+MAX_RETRY_AFTER = 300.0
+
+# Transient failures worth another attempt
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+# Responses that mean "slow down" rather than "broken"
+THROTTLE_STATUSES = frozenset({429, 503})
+
+BREAKER_FAILURE_THRESHOLD = 10
+BREAKER_RESET_TIMEOUT = 30.0
+BREAKER_MAX_OPEN = 600.0
+
+
+class CircuitOpenError(RuntimeError):
+    """The host has been failing for too long; requests are refused without being sent"""
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None"""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, overridden by the server's Retry-After"""
+
+    def __init__(self, retries=DEFAULT_RETRIES, base_delay=BASE_RETRY_DELAY,
+                 max_delay=MAX_RETRY_DELAY, max_retry_after=MAX_RETRY_AFTER):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up"""
+        if attempt > self.retries:
+            return None
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight to one host.
+
+    Every success raises the limit by 1/limit (about +1 per round trip of
+    `limit` requests). Throttling, server errors, timeouts and latency far
+    above the usual level halve it, at most once per cooldown so one burst
+    of failures counts as a single congestion event.
+    """
+
+    def __init__(self, maximum, minimum=1, decrease=0.5, latency_factor=3.0, cooldown=1.0):
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self.decreases = 0
+        self._baseline = None  # smoothed latency of healthy responses
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, congested):
+        with self._cond:
+            self.in_flight -= 1
+            slow = self._baseline is not None and latency > self.latency_factor * self._baseline
+            now = time.monotonic()
+            if congested or slow:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._baseline = (latency if self._baseline is None
+                                  else 0.9 * self._baseline + 0.1 * latency)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Stops sending requests to a host that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    callers wait; once `reset_timeout` has passed a single probe request is
+    let through. Success closes the circuit, failure opens it again. Once the
+    host has been down for `max_open` seconds callers get CircuitOpenError
+    instead of waiting, while a probe is still let through every
+    `reset_timeout` in case the host comes back.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT, max_open=BREAKER_MAX_OPEN):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_open = max_open
+        self.failures = 0
+        self.trips = 0
+        self._open_until = None
+        self._down_since = None
+        self._probing = False
+        self._cond = threading.Condition()
+
+    @property
+    def is_open(self):
+        return self._open_until is not None
+
+    def before_request(self, abort=None):
+        """Wait until a request may be sent, raising CircuitOpenError if the host stays down"""
+        with self._cond:
+            while self._open_until is not None:
+                now = time.monotonic()
+                if abort is not None and abort.is_set():
+                    raise CircuitOpenError("stopped while waiting for the host to recover")
+                if now >= self._open_until and not self._probing:
+                    self._probing = True  # half-open: this caller is the probe
+                    return
+                if now - self._down_since >= self.max_open:
+                    raise CircuitOpenError(
+                        f"host unreachable for {int(now - self._down_since)}s, giving up")
+                self._cond.wait(min(1.0, max(0.05, self._open_until - now)))
+
+    def record(self, ok):
+        with self._cond:
+            if ok:
+                self.failures = 0
+                self._open_until = None
+                self._down_since = None
+            else:
+                self.failures += 1
+                if self._probing or self.failures >= self.failure_threshold:
+                    now = time.monotonic()
+                    if self._open_until is None:
+                        self.trips += 1
+                        self._down_since = now
+                    self._open_until = now + self.reset_timeout
+            self._probing = False
+            self._cond.notify_all()
@@ -0,0 +1,68 @@
+"""Thread-safe hand-off of log lines and progress from worker threads to a UI loop"""
+import threading
+from collections import deque
+from datetime import datetime
+
+MAX_LOG_LINES = 5000
+FRAME_INTERVAL_MS = 100
+
+
+class UiBridge:
+    """Collects UI updates from any thread for the UI thread to apply once per frame.
+
+    Worker threads never touch widgets: log() queues a line, progress()
+    overwrites the pending progress state (so a burst of updates between two
+    frames costs one redraw) and call() queues any other UI action. The UI
+    loop calls drain() every FRAME_INTERVAL_MS. Only the newest
+    MAX_LOG_LINES lines are kept for display; every line also goes to the
+    optional log file.
+    """
+
+    def __init__(self, max_log_lines=MAX_LOG_LINES, log_file=None):
+        self.max_log_lines = max_log_lines
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=max_log_lines)
+        self._progress = {}
+        self._calls = deque()
+        self._log_file = None
+        self.set_log_file(log_file)
+
+    def set_log_file(self, path):
+        """Append every log line to path from now on (None to stop)"""
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+            self._log_file = open(path, "a", encoding="utf-8") if path else None
+
+    def log(self, message):
+        """Queue a timestamped log line"""
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n"
+        with self._lock:
+            self._lines.append(line)
+            if self._log_file is not None:
+                self._log_file.write(line)
+
+    def progress(self, value=None, maximum=None, text=None):
+        """Set the progress bar value/maximum and status text; unset arguments are kept"""
+        with self._lock:
+            for key, item in (("value", value), ("maximum", maximum), ("text", text)):
+                if item is not None:
+                    self._progress[key] = item
+
+    def call(self, func, *args):
+        """Run func(*args) on the UI thread at the next frame"""
+        with self._lock:
+            self._calls.append((func, args))
+
+    def drain(self):
+        """Take everything queued since the last frame: (lines, progress dict, calls)"""
+        with self._lock:
+            lines, self._lines = self._lines, deque(maxlen=self.max_log_lines)
+            progress, self._progress = self._progress, {}
+            calls, self._calls = self._calls, deque()
+            if self._log_file is not None:
+                self._log_file.flush()
+        return lines, progress, calls
+
+    def close(self):
+        self.set_log_file(None)
@@ -0,0 +1,385 @@
+"""Shared ISBN work queue with leases, so many headless workers can split one job.
+
+Jobs live in a table of the MySQL database from db_config.json or in a
+shared SQLite file. Workers claim batches of ISBNs under a lease, keep the
+lease alive with heartbeats while scraping and mark each result; a lease
+that is not renewed (the worker crashed or lost its connection) expires and
+the ISBN is claimed again by another worker.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    and_,
+    case,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+)
+
+from .db import get_engine
+from .defaults import (
+    DEFAULT_CLAIM_BATCH,
+    DEFAULT_LEASE_SECONDS,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_QUEUE,
+)
+from .failures import PERMANENT_CLASSES, error_class_of
+
+TABLE_NAME = "wheelers_jobs"
+RETRY_DELAY_SECONDS = 60
+POLL_INTERVAL = 10.0
+ADD_BATCH = 500
+MARK_BATCH = 20
+MARK_INTERVAL = 5.0
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+STATUSES = (PENDING, LEASED, DONE, FAILED)
+
+metadata = MetaData()
+
+jobs_table = Table(
+    TABLE_NAME,
+    metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True,
+           autoincrement=True),
+    Column("queue", String(64), nullable=False),
+    Column("isbn", String(32), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False, default=0),
+    # Worker holding the lease, and the claim that took it
+    Column("lease_owner", String(128)),
+    Column("lease_token", String(32)),
+    # When the lease runs out; for pending jobs, the earliest time of the next attempt
+    Column("lease_expires", DateTime),
+    Column("error", Text),
+    Column("updated_at", DateTime),
+    UniqueConstraint("queue", "isbn"),
+    Index("ix_wheelers_jobs_claim", "queue", "status", "lease_expires"),
+    Index("ix_wheelers_jobs_owner", "lease_owner"),
+    mysql_charset="utf8mb4",
+)
+
+
+def utcnow():
+    # Leases are compared across machines, so never use local time
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def worker_id():
+    """Name identifying this worker process in lease_owner"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def queue_db_config(value):
+    """db_config for --queue-db: a SQLAlchemy URL or a db_config.json path"""
+    if "://" in value:
+        return {"url": value}
+    with open(value) as f:
+        return json.load(f)
+
+
+class WorkQueue:
+    """ISBN jobs of one named queue in the wheelers_jobs table.
+
+    Every state change is a single conditional UPDATE, so concurrent
+    workers never claim the same job twice: a claim only takes rows that
+    are still claimable, and results are only recorded by the worker that
+    still holds the lease. Clocks of the worker machines must roughly agree
+    (NTP), since leases are compared against each worker's UTC time.
+    """
+
+    def __init__(self, db_config, name=DEFAULT_QUEUE, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=RETRY_DELAY_SECONDS):
+        self.engine = get_engine(db_config)
+        self.name = name
+        self.lease = timedelta(seconds=lease_seconds)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = timedelta(seconds=retry_delay)
+        metadata.create_all(self.engine, tables=[jobs_table])
+
+    def _claimable(self, now):
+        columns = jobs_table.c
+        return and_(columns.queue == self.name,
+                    columns.status.in_((PENDING, LEASED)),
+                    or_(columns.lease_expires.is_(None), columns.lease_expires < now))
+
+    def _owned(self, owner):
+        columns = jobs_table.c
+        return and_(columns.queue == self.name, columns.status == LEASED,
+                    columns.lease_owner == owner)
+
+    def add(self, isbns):
+        """Queue isbns as pending jobs, ignoring ones already queued; returns the number added"""
+        if self.engine.dialect.name == "mysql":
+            statement = insert(jobs_table).prefix_with("IGNORE")
+        else:
+            statement = insert(jobs_table).prefix_with("OR IGNORE")
+        added = 0
+        batch = []
+        for isbn in isbns:
+            batch.append({"queue": self.name, "isbn": isbn, "status": PENDING, "attempts": 0,
+                          "updated_at": utcnow()})
+            if len(batch) >= ADD_BATCH:
+                added += self._insert(statement, batch)
+                batch = []
+        if batch:
+            added += self._insert(statement, batch)
+        return added
+
+    def _insert(self, statement, rows):
+        with self.engine.begin() as conn:
+            return conn.execute(statement, rows).rowcount
+
+    def claim(self, owner, count):
+        """Lease up to count claimable ISBNs to owner, oldest first"""
+        columns = jobs_table.c
+        now = utcnow()
+        token = uuid.uuid4().hex
+        claimable = self._claimable(now)
+        values = {"status": LEASED, "lease_owner": owner, "lease_token": token,
+                  "lease_expires": now + self.lease, "attempts": columns.attempts + 1,
+                  "updated_at": now}
+        with self.engine.begin() as conn:
+            self._fail_exhausted(conn, now)
+            candidates = select(columns.id).where(claimable).order_by(columns.id).limit(count)
+            if self.engine.dialect.name == "sqlite":
+                # One write statement takes the database lock before reading
+                conn.execute(update(jobs_table)
+                             .where(columns.id.in_(candidates.scalar_subquery()))
+                             .values(values))
+            else:
+                # MySQL can't LIMIT a subquery on the updated table; another
+                # worker may take some candidates first, which the repeated
+                # condition skips
+                ids = list(conn.execute(candidates).scalars())
+                if not ids:
+                    return []
+                conn.execute(update(jobs_table).where(columns.id.in_(ids), claimable)
+                             .values(values))
+            return list(conn.execute(select(columns.isbn).where(columns.lease_token == token)
+                                     .order_by(columns.id)).scalars())
+
+    def _fail_exhausted(self, conn, now):
+        """Give up on jobs whose lease expired on their last attempt"""
+        columns = jobs_table.c
+        conn.execute(update(jobs_table)
+                     .where(columns.queue == self.name, columns.status == LEASED,
+                            columns.lease_expires < now,
+                            columns.attempts >= self.max_attempts)
+                     .values(status=FAILED, lease_owner=None, lease_token=None,
+                             lease_expires=None, updated_at=now,
+                             error="Lease expired on the last attempt"))
+
+    def heartbeat(self, owner):
+        """Extend every lease held by owner; returns the number of leases held"""
+        now = utcnow()
+        with self.engine.begin() as conn:
+            return conn.execute(update(jobs_table).where(self._owned(owner))
+                                .values(lease_expires=now + self.lease, updated_at=now)).rowcount
+
+    def finish(self, owner, results):
+        """Record (isbn, record) results of owner's leases.
+
+        Successful records are done; failed ones go back to pending after
+        retry_delay until max_attempts is reached, except permanent failures
+        (the product does not exist), which fail straight away. Returns the number of
+        results whose lease had already been lost to another worker.
+        """
+        columns = jobs_table.c
+        now = utcnow()
+        lost = 0
+        with self.engine.begin() as conn:
+            for isbn, record in results:
+                values = {"lease_owner": None, "lease_token": None, "updated_at": now}
+                if 'error' in record:
+                    values.update(
+                        status=(FAILED if error_class_of(record) in PERMANENT_CLASSES
+                                else case((columns.attempts >= self.max_attempts, FAILED),
+                                          else_=PENDING)),
+                        lease_expires=now + self.retry_delay,
+                        error=str(record["error"]))
+                else:
+                    values.update(status=DONE, lease_expires=None, error=None)
+                result = conn.execute(update(jobs_table)
+                                      .where(self._owned(owner), columns.isbn == isbn)
+                                      .values(values))
+                lost += result.rowcount == 0
+        return lost
+
+    def release(self, owner, isbns=None):
+        """Hand owner's unfinished leases back without counting the attempt"""
+        columns = jobs_table.c
+        condition = self._owned(owner)
+        if isbns is not None:
+            condition = and_(condition, columns.isbn.in_(list(isbns)))
+        with self.engine.begin() as conn:
+            return conn.execute(update(jobs_table).where(condition).values(
+                status=PENDING, lease_owner=None, lease_token=None, lease_expires=None,
+                attempts=columns.attempts - 1, updated_at=utcnow())).rowcount
+
+    def outstanding(self, exclude_owner=None):
+        """Pending or leased jobs, optionally not counting exclude_owner's leases"""
+        columns = jobs_table.c
+        condition = and_(columns.queue == self.name, columns.status.in_((PENDING, LEASED)))
+        if exclude_owner is not None:
+            condition = and_(condition, or_(columns.lease_owner.is_(None),
+                                            columns.lease_owner != exclude_owner))
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).where(condition)).scalar()
+
+    def retry_failed(self):
+        """Queue failed jobs again with a fresh attempt count"""
+        columns = jobs_table.c
+        with self.engine.begin() as conn:
+            return conn.execute(update(jobs_table)
+                                .where(columns.queue == self.name, columns.status == FAILED)
+                                .values(status=PENDING, attempts=0, lease_expires=None,
+                                        updated_at=utcnow())).rowcount
+
+    def stats(self):
+        """Job counts per status, plus leases that have expired"""
+        columns = jobs_table.c
+        counts = dict.fromkeys(STATUSES, 0)
+        with self.engine.connect() as conn:
+            query = (select(columns.status, func.count())
+                     .where(columns.queue == self.name).group_by(columns.status))
+            counts.update(dict(conn.execute(query).all()))
+            counts["expired_leases"] = conn.execute(
+                select(func.count()).where(columns.queue == self.name,
+                                           columns.status == LEASED,
+                                           columns.lease_expires < utcnow())).scalar()
+        return {"queue": self.name, **counts}
+
+
+class QueueWorker:
+    """Feeds ISBNs claimed from a WorkQueue to a scraper and reports the results.
+
+    isbns() claims batches lazily as the scraper asks for more work, a
+    heartbeat thread renews this worker's leases while it runs, and
+    record() marks results in small batches. ISBNs still held at close()
+    are released for other workers.
+    """
+
+    def __init__(self, work_queue, batch_size=DEFAULT_CLAIM_BATCH, wait=False,
+                 poll_interval=POLL_INTERVAL, log=None):
+        self.queue = work_queue
+        self.batch_size = batch_size
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.log = log or (lambda message: None)
+        self.owner = worker_id()
+        self.claimed = 0
+        self.done = 0
+        self.errors = 0
+        self.lost = 0
+        self._held = set()
+        self._results = []
+        self._last_mark = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._beat, name="queue-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                self.queue.heartbeat(self.owner)
+            except Exception as e:
+                self.log(f"Queue heartbeat failed: {e}")
+
+    def claim(self):
+        """Lease the next batch; empty when nothing is claimable right now"""
+        if self._stop.is_set():
+            return []
+        batch = self.queue.claim(self.owner, self.batch_size)
+        with self._lock:
+            self._held.update(batch)
+        self.claimed += len(batch)
+        return batch
+
+    def isbns(self, first_batch):
+        """first_batch, then further claims until the queue has nothing claimable"""
+        batch = first_batch
+        while batch:
+            yield from batch
+            batch = self.claim()
+
+    def record(self, isbn, record):
+        """Queue a result to be marked, flushing every MARK_BATCH results"""
+        with self._lock:
+            self._results.append((isbn, record))
+            self._held.discard(isbn)
+            due = (len(self._results) >= MARK_BATCH
+                   or time.monotonic() - self._last_mark >= MARK_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            results, self._results = self._results, []
+            self._last_mark = time.monotonic()
+        if not results:
+            return
+        lost = self.queue.finish(self.owner, results)
+        if lost:
+            self.log(f"{lost} results arrived after their lease had expired")
+        self.lost += lost
+        errors = sum('error' in record for _, record in results)
+        self.errors += errors
+        self.done += len(results) - errors
+
+    def idle(self):
+        """Wait for more work; False once the queue is finished (or stop() was called).
+
+        Keeps polling while other workers still hold leases or failed jobs
+        wait for their retry, since those may come back; with wait=True
+        keeps polling for newly added jobs too.
+        """
+        self.flush()
+        if self._stop.is_set():
+            return False
+        if not self.wait and not self.queue.outstanding(exclude_owner=self.owner):
+            return False
+        return not self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        """Mark outstanding results and release unfinished leases"""
+        self._stop.set()
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                held, self._held = self._held, set()
+            if held:
+                self.queue.release(self.owner, held)
+            self._heartbeat.join()
+
+    def stats(self):
+        return {"worker": self.owner, "claimed": self.claimed, "done": self.done,
+                "errors": self.errors, "lost_leases": self.lost}